@@ -0,0 +1,150 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ams2_lap_aggregator import DEFAULT_CHANNELS, LapAggregator
+from ams2_recorder import RecordingSummary, iter_lap_columns, list_recordings
+from ams2_tyre_analyzer import pressure_advice
+
+# Batch reprocessing of the recording archive.
+#
+#   python ams2_batch.py                 # all recordings in data/
+#   python ams2_batch.py --workers 8 --force
+#
+# Every recording is streamed lap by lap (never loaded whole) and its derived
+# data - lap table, best lap, tyre recommendation and summary - is written to
+# telemetry_X.derived.json. Outputs are replaced atomically and remember the
+# size/mtime of their source, so an interrupted run simply continues with the
+# recordings that are not up to date yet.
+
+DERIVED_VERSION = 1 # bump when the derived data changes, forces reprocessing
+
+TYRE_NAMES = ["FL", "FR", "RL", "RR"]
+
+def derived_path(filename):
+    return os.path.splitext(filename)[0] + ".derived.json"
+
+def _source_stamp(filename):
+    stat = os.stat(filename)
+    return {'source_size': stat.st_size, 'source_mtime': stat.st_mtime, 'version': DERIVED_VERSION}
+
+def is_up_to_date(filename):
+    path = derived_path(filename)
+    if not os.path.exists(path):
+        return False
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            derived = json.load(f)
+    except (OSError, ValueError):
+        return False
+    stamp = _source_stamp(filename)
+    return all(derived.get(k) == v for k, v in stamp.items())
+
+def tyre_recommendation(lap):
+    # Pressure advice from the tyre temperatures of one lap summary, with the
+    # same target window and wording as the live TyreAnalyzer
+    result = {}
+    for name in TYRE_NAMES:
+        temp = lap.get(f"TyreTemp_{name}_twmean")
+        if temp is None:
+            continue
+        status, action, _ = pressure_advice(temp)
+        result[name] = {'temp': round(temp, 1), 'status': status, 'action': action}
+    return result
+
+def process_recording(filename):
+    # Computes and writes the derived data of one recording; returns
+    # (filename, bytes processed)
+    stamp = _source_stamp(filename)
+    with open(filename, 'r', newline='') as f:
+        header = next(csv.reader(f), [])
+    channels = [c for c in DEFAULT_CHANNELS if c[0] in header]
+    names = [c[0] for c in channels]
+    time_column, time_scale = ("TimestampNs", 1e-9) if "TimestampNs" in header else ("Timestamp", 1.0)
+    wanted = [time_column, "LapInvalidated", "CurrentLapTime", "LastLapTime",
+              "TrackTemp", "AmbientTemp", "RainDensity"] + names
+
+    aggregator = LapAggregator(channels)
+    summary = RecordingSummary()
+    laps = []
+    for lap, columns in iter_lap_columns(filename, wanted):
+        rows = len(columns[time_column])
+        zeros = [0.0] * rows
+        get = lambda name: columns.get(name, zeros)
+        times = get(time_column)
+        invalid = columns.get("LapInvalidated", [False] * rows)
+        clock = get("CurrentLapTime")
+        values = [get(name) for name in names]
+        weather = (get("LastLapTime"), get("TrackTemp"), get("AmbientTemp"), get("RainDensity"))
+        for i in range(rows):
+            lap_summary = aggregator.add(lap, times[i] * time_scale, [v[i] for v in values], invalid[i], clock[i])
+            if lap_summary:
+                laps.append(lap_summary)
+            summary.add(lap, weather[0][i], weather[1][i], weather[2][i], weather[3][i])
+    last = aggregator.flush()
+    if last:
+        laps.append(last)
+
+    valid_laps = [l for l in laps if l['complete'] and l['valid'] and l['lap_time']]
+    best = min(valid_laps, key=lambda l: l['lap_time']) if valid_laps else None
+    derived = dict(stamp)
+    derived.update({
+        'file': os.path.basename(filename),
+        'summary': summary.to_dict(),
+        'best_lap': {'lap': best['lap'], 'lap_time': best['lap_time']} if best else None,
+        # Based on the last clean lap, when the tyres are up to temperature
+        'tyres': tyre_recommendation(valid_laps[-1]) if valid_laps else {},
+        'laps': laps,
+    })
+
+    path = derived_path(filename)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(derived, f)
+    os.replace(tmp_path, path)
+    return filename, stamp['source_size']
+
+def run_batch(directory="data", workers=None, force=False):
+    # Processes all recordings that have no up-to-date derived file. Returns
+    # the number of recordings processed.
+    files = list_recordings(directory)
+    todo = [f for f in files if force or not is_up_to_date(f)]
+    print(f"Batch: {len(files) - len(todo)} of {len(files)} recording(s) up to date, {len(todo)} to process")
+    if not todo:
+        return 0
+
+    start = time.perf_counter()
+    done = 0
+    processed_bytes = 0
+    # Biggest files first so one large recording does not finish last alone
+    todo.sort(key=os.path.getsize, reverse=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_recording, f): f for f in todo}
+        for future in as_completed(futures):
+            try:
+                _, size = future.result()
+                processed_bytes += size
+                done += 1
+            except Exception as e:
+                print(f"\nFailed to process {futures[future]}: {e}")
+            elapsed = time.perf_counter() - start
+            rate = processed_bytes / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+            print(f"Batch: {done}/{len(todo)} recordings, {rate:.1f} MB/s", end="\r")
+    print()
+    return done
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute derived data for all AMS2 recordings")
+    parser.add_argument("--dir", default="data")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per core)")
+    parser.add_argument("--force", action="store_true", help="Reprocess recordings that are up to date")
+    args = parser.parse_args(argv)
+    count = run_batch(args.dir, args.workers, args.force)
+    print(f"{count} recording(s) processed.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
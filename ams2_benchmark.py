@@ -0,0 +1,319 @@
+import argparse
+import contextlib
+import ctypes
+import datetime
+import json
+import mmap
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from ams2_structs import SharedMemory
+from ams2_reader import AMS2Reader
+from ams2_recorder import DataRecorder
+from ams2_tyre_analyzer import TyreAnalyzer
+from ams2_lap_manager import LapTimeManager
+from ams2_synthetic import SyntheticSession, SyntheticReader
+from ams2_changes import ChangeDetector
+from ams2_lap_buffer import BEST, LapBuffer
+from ams2_events import DrivingEventDetector
+from ams2_histograms import LapHistograms
+from ams2_lap_compare import LapTrace, compare as compare_laps
+from ams2_track_map import TrackMapBuilder
+
+# Offline benchmark suite for the capture, record and analysis hot paths.
+# Every benchmark runs on synthetic frames, so no game is needed.
+#
+#   python ams2_benchmark.py --output bench_new.json
+#   python ams2_benchmark.py --compare bench_old.json
+#
+# Each benchmark function does its own setup and returns the nanoseconds spent
+# in the measured loop only, so setup cost never leaks into the numbers.
+
+def bench_shared_memory_copy(n):
+    raw = SyntheticSession().frame_bytes()
+    start = time.perf_counter_ns()
+    for _ in range(n):
+        SharedMemory.from_buffer_copy(raw)
+    return time.perf_counter_ns() - start
+
+def bench_reader_read(n):
+    reader = AMS2Reader()
+    reader.mm = mmap.mmap(-1, ctypes.sizeof(SharedMemory))
+    reader.mm.write(SyntheticSession().frame_bytes())
+    try:
+        start = time.perf_counter_ns()
+        for _ in range(n):
+            reader.read()
+        return time.perf_counter_ns() - start
+    finally:
+        reader.close()
+
+def bench_recorder_record_frame(n):
+    session = SyntheticSession()
+    frames = [SharedMemory.from_buffer_copy(session.frame_bytes()) for _ in range(min(n, 1000))]
+    tmp_dir = tempfile.mkdtemp(prefix="ams2_bench_")
+    try:
+        with open(os.devnull, 'w') as sink, contextlib.redirect_stdout(sink):
+            recorder = DataRecorder(output_dir=tmp_dir)
+            recorder.start()
+            start = time.perf_counter_ns()
+            for i in range(n):
+                recorder.record_frame(frames[i % len(frames)])
+            # Includes draining the writer thread: row formatting and CSV I/O
+            recorder.stop()
+            return time.perf_counter_ns() - start
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def _fresh_analyzer():
+    analyzer = TyreAnalyzer()
+    # Sample on every call, so the benchmark measures the sampling path
+    analyzer.sample_rate = 1e9
+    return analyzer
+
+def bench_tyre_analyzer_update(n):
+    session = SyntheticSession()
+    data = session.advance()
+    analyzer = _fresh_analyzer()
+    start = time.perf_counter_ns()
+    for _ in range(n):
+        analyzer.update(data, 5)
+    return time.perf_counter_ns() - start
+
+def bench_tyre_analyzer_full_rate_update(n):
+    session = SyntheticSession()
+    frames = [SharedMemory.from_buffer_copy(session.advance()) for _ in range(64)]
+    analyzer = TyreAnalyzer(full_rate=True)
+    start = time.perf_counter_ns()
+    for i in range(n):
+        analyzer.update(frames[i & 63], 5, t=i / 60)
+    return time.perf_counter_ns() - start
+
+def bench_tyre_analyzer_get_analysis(n):
+    session = SyntheticSession()
+    analyzer = _fresh_analyzer()
+    # A full 30 s window at the default 1 Hz sample rate
+    for _ in range(30):
+        analyzer.update(session.advance(), 5)
+    analyzer.current_state = analyzer.STATE_STABLE
+    start = time.perf_counter_ns()
+    for _ in range(n):
+        analyzer.get_analysis()
+    return time.perf_counter_ns() - start
+
+def bench_lap_manager_save_best_lap(n, history=5000):
+    tmp_dir = tempfile.mkdtemp(prefix="ams2_bench_")
+    try:
+        manager = LapTimeManager(os.path.join(tmp_dir, "best_laps.csv"))
+        for i in range(history):
+            manager.best_laps[(f"Car {i % 100}", f"Track {i // 100}")] = (90.0 + i % 7, "2024-01-01 12:00:00")
+        lap_time = 89.0
+        start = time.perf_counter_ns()
+        for _ in range(n):
+            # Always a new record, so every call rewrites the file
+            lap_time -= 0.001
+            manager.save_best_lap("Car 0", "Track 0", lap_time)
+        return time.perf_counter_ns() - start
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def bench_change_detector_update(n):
+    session = SyntheticSession()
+    frames = [SharedMemory.from_buffer_copy(session.advance()) for _ in range(64)]
+    frames[32].mPitMode = 2 # one change, the rest is steady state
+    detector = ChangeDetector()
+    start = time.perf_counter_ns()
+    for i in range(n):
+        detector.update(frames[i & 63])
+    return time.perf_counter_ns() - start
+
+def bench_lap_buffer_update(n):
+    session = SyntheticSession()
+    buffer = LapBuffer()
+    start = time.perf_counter_ns()
+    for _ in range(n):
+        buffer.update(session.advance())
+    return time.perf_counter_ns() - start
+
+def bench_driving_events_update(n):
+    session = SyntheticSession()
+    frames = [SharedMemory.from_buffer_copy(session.advance()) for _ in range(64)]
+    detector = DrivingEventDetector()
+    start = time.perf_counter_ns()
+    for i in range(n):
+        detector.update(frames[i & 63], i)
+    return time.perf_counter_ns() - start
+
+def bench_lap_compare(n):
+    # A 4.3 km lap against the best lap at 2 m resolution, uncached
+    session = SyntheticSession(lap_time=30.0)
+    buffer = LapBuffer(laps=2)
+    for _ in range(int(2.2 * 30 * session.rate_hz)):
+        buffer.update(session.advance())
+    lap, best = LapTrace.from_lap_buffer(buffer, 2), LapTrace.from_lap_buffer(buffer, BEST)
+    start = time.perf_counter_ns()
+    for _ in range(n):
+        compare_laps(lap, best)
+    return time.perf_counter_ns() - start
+
+def bench_histograms_update(n):
+    session = SyntheticSession()
+    frames = [SharedMemory.from_buffer_copy(session.advance()) for _ in range(64)]
+    histograms = LapHistograms()
+    start = time.perf_counter_ns()
+    for i in range(n):
+        histograms.update(frames[i & 63])
+    return time.perf_counter_ns() - start
+
+def bench_track_map_locate(n):
+    session = SyntheticSession(lap_time=30.0)
+    builder = TrackMapBuilder(session.track_length)
+    positions = []
+    for _ in range(int(2.2 * 30 * session.rate_hz)): # two full laps
+        p = session.advance().mParticipantInfo[0]
+        builder.add(p.mCurrentLap, p.mCurrentLapDistance, *p.mWorldPosition)
+        positions.append(tuple(p.mWorldPosition))
+    track_map = builder.build()
+    start = time.perf_counter_ns()
+    for i in range(n):
+        track_map.locate(*positions[i % len(positions)])
+    return time.perf_counter_ns() - start
+
+def bench_console_loop(n):
+    # The console's per-frame work (ConsolePipeline) plus a redraw every frame
+    import console_app
+    from ams2_sector_tracker import SectorTracker
+    tmp_dir = tempfile.mkdtemp(prefix="ams2_bench_")
+    reader = SyntheticReader()
+    reader.connect()
+    pipeline = None
+    try:
+        pipeline = console_app.ConsolePipeline(
+            lap_manager=LapTimeManager(os.path.join(tmp_dir, "best_laps.csv")),
+            sector_tracker=SectorTracker(os.path.join(tmp_dir, "best_sectors.csv"),
+                                         os.path.join(tmp_dir, "sector_times.csv")))
+        with open(os.devnull, 'w') as sink, contextlib.redirect_stdout(sink):
+            start = time.perf_counter_ns()
+            for _ in range(n):
+                data = reader.read()
+                pipeline.process(data)
+                pipeline.render(data)
+            return time.perf_counter_ns() - start
+    finally:
+        if pipeline:
+            pipeline.close()
+        reader.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+# name -> (function, default iterations)
+BENCHMARKS = {
+    "shared_memory_from_buffer_copy": (bench_shared_memory_copy, 20000),
+    "reader_read": (bench_reader_read, 20000),
+    "recorder_record_frame": (bench_recorder_record_frame, 5000),
+    "tyre_analyzer_update": (bench_tyre_analyzer_update, 5000),
+    "tyre_analyzer_full_rate_update": (bench_tyre_analyzer_full_rate_update, 20000),
+    "tyre_analyzer_get_analysis": (bench_tyre_analyzer_get_analysis, 2000),
+    "lap_manager_save_best_lap": (bench_lap_manager_save_best_lap, 20),
+    "change_detector_update": (bench_change_detector_update, 20000),
+    "lap_buffer_update": (bench_lap_buffer_update, 20000),
+    "driving_events_update": (bench_driving_events_update, 20000),
+    "histograms_update": (bench_histograms_update, 20000),
+    "track_map_locate": (bench_track_map_locate, 20000),
+    "lap_compare": (bench_lap_compare, 200),
+    "console_loop_frame": (bench_console_loop, 500),
+}
+
+def run_benchmark(fn, iterations, repeat):
+    samples = [fn(iterations) / iterations for _ in range(repeat)]
+    median = statistics.median(samples)
+    return {
+        'iterations': iterations,
+        'repeat': repeat,
+        'best_ns_per_op': min(samples),
+        'median_ns_per_op': median,
+        'ops_per_sec': 1e9 / median if median > 0 else 0.0,
+    }
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+def run_all(names=None, scale=1.0, repeat=5):
+    results = {}
+    for name, (fn, iterations) in BENCHMARKS.items():
+        if names and not any(n in name for n in names):
+            continue
+        results[name] = run_benchmark(fn, max(1, int(iterations * scale)), repeat)
+    return {
+        'meta': {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+
+def compare(current, baseline, threshold=0.10):
+    # Returns a list of (name, old, new, ratio, regressed); ratio > 1 means slower
+    rows = []
+    for name, new in current['results'].items():
+        old = baseline.get('results', {}).get(name)
+        if not old:
+            continue
+        ratio = new['median_ns_per_op'] / old['median_ns_per_op'] if old['median_ns_per_op'] else float('inf')
+        rows.append((name, old['median_ns_per_op'], new['median_ns_per_op'], ratio, ratio > 1.0 + threshold))
+    return rows
+
+def print_results(report):
+    print(f"{'Benchmark':<34} | {'median ns/op':>14} | {'ops/s':>12}")
+    print("-" * 66)
+    for name, r in report['results'].items():
+        print(f"{name:<34} | {r['median_ns_per_op']:14.0f} | {r['ops_per_sec']:12.1f}")
+
+def print_comparison(rows):
+    print(f"\n{'Benchmark':<34} | {'old ns/op':>12} | {'new ns/op':>12} | {'ratio':>6}")
+    print("-" * 76)
+    for name, old, new, ratio, regressed in rows:
+        flag = "  <-- REGRESSION" if regressed else ""
+        print(f"{name:<34} | {old:12.0f} | {new:12.0f} | {ratio:6.2f}{flag}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AMS2 telemetry benchmark suite (synthetic frames)")
+    parser.add_argument("names", nargs="*", help="Only run benchmarks whose name contains one of these")
+    parser.add_argument("--output", help="Write machine-readable results (JSON) to this file")
+    parser.add_argument("--compare", help="Compare against a previous JSON result file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown counted as regression")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply default iteration counts")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    report = run_all(args.names, scale=args.scale, repeat=args.repeat)
+    print_results(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        print_comparison(rows)
+        if args.fail_on_regression and any(r[4] for r in rows):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+
+# Crash-safe recordings.
+#
+# In crash-safe mode (DataRecorder(crash_safe=True)) the CSV is written in
+# blocks: rows are collected in memory and committed together, either every
+# sync_interval seconds or every sync_bytes bytes, whichever comes first.
+# A commit writes the block, fsyncs it, then appends a frame for the block
+# (offset, length, CRC32) to a journal next to the recording and fsyncs that
+# too. The recording itself stays a plain CSV every other tool can read.
+#
+# After a crash, recover() checks the blocks in the journal from the end and
+# truncates the CSV after the last block whose checksum matches, so only the
+# tail of a multi-GB file is read. Files without a journal are cut after
+# their last complete line.
+#
+#   python ams2_blocks.py data/telemetry_20240101_120000.csv
+#   python ams2_blocks.py data --verify-all
+#
+# Durability vs throughput: at most sync_interval seconds of data are lost,
+# at the cost of two fsyncs per block. sync_interval=0 commits every row.
+
+JOURNAL_MAGIC = b"AMS2BLK1"
+BLOCK = struct.Struct("<QII") # offset, length, crc32 of the block
+FRAME = struct.Struct("<QIII") # block + crc32 of the block record itself
+
+DEFAULT_SYNC_INTERVAL = 1.0 # seconds
+DEFAULT_SYNC_BYTES = 1024**2
+
+SCAN_CHUNK = 64 * 1024
+
+def journal_path(filename):
+    return os.path.splitext(filename)[0] + ".blocks"
+
+class BlockWriter:
+    # File-like text sink for csv.writer that commits in checksummed blocks
+    def __init__(self, filename, sync_interval=DEFAULT_SYNC_INTERVAL, sync_bytes=DEFAULT_SYNC_BYTES):
+        self.filename = filename
+        self.sync_interval = sync_interval
+        self.sync_bytes = sync_bytes
+        self.handle = open(filename, 'wb')
+        self.journal = open(journal_path(filename), 'wb')
+        self.journal.write(JOURNAL_MAGIC)
+        self._sync(self.journal)
+        self.pending = []
+        self.pending_size = 0
+        self.committed = 0
+        self.blocks = 0
+        self.last_commit = time.monotonic()
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        self.pending.append(data)
+        self.pending_size += len(data)
+        if (self.pending_size >= self.sync_bytes
+                or time.monotonic() - self.last_commit >= self.sync_interval):
+            self.commit()
+        return len(text)
+
+    def commit_due(self):
+        # For idle writers: commit pending rows once the interval has passed
+        if self.pending and time.monotonic() - self.last_commit >= self.sync_interval:
+            self.commit()
+
+    def commit(self):
+        # Errors (e.g. a full disk) reach the caller; the rows stay pending and
+        # the next commit writes the block again from the last committed offset
+        self.last_commit = time.monotonic()
+        if not self.pending:
+            return
+        data = b"".join(self.pending)
+        self.handle.seek(self.committed)
+        self.handle.truncate()
+        self.handle.write(data)
+        self._sync(self.handle)
+        # The block is on disk before the journal says so
+        block = BLOCK.pack(self.committed, len(data), zlib.crc32(data))
+        self.journal.seek(len(JOURNAL_MAGIC) + self.blocks * FRAME.size)
+        self.journal.truncate()
+        self.journal.write(block + struct.pack("<I", zlib.crc32(block)))
+        self._sync(self.journal)
+        self.pending = []
+        self.pending_size = 0
+        self.committed += len(data)
+        self.blocks += 1
+
+    def _sync(self, handle):
+        handle.flush()
+        os.fsync(handle.fileno())
+
+    def tell(self):
+        return self.committed + self.pending_size
+
+    def flush(self):
+        self.commit()
+
+    def close(self):
+        if self.handle.closed:
+            return
+        try:
+            self.commit()
+        finally:
+            self.handle.close()
+            self.journal.close()
+
+def read_journal(path):
+    # Valid block records of a journal, stopping at the first torn or corrupt one
+    blocks = []
+    with open(path, 'rb') as f:
+        if f.read(len(JOURNAL_MAGIC)) != JOURNAL_MAGIC:
+            return None
+        data = f.read()
+    expected_offset = 0
+    for pos in range(0, len(data) - FRAME.size + 1, FRAME.size):
+        offset, length, crc, record_crc = FRAME.unpack_from(data, pos)
+        if record_crc != zlib.crc32(data[pos:pos + BLOCK.size]) or offset != expected_offset:
+            break
+        blocks.append((offset, length, crc))
+        expected_offset = offset + length
+    return blocks
+
+def _block_ok(f, offset, length, crc):
+    f.seek(offset)
+    data = f.read(length)
+    return len(data) == length and zlib.crc32(data) == crc
+
+def _last_line_end(f, size):
+    # Position after the last b"\n", scanning backwards in chunks
+    end = size
+    while end > 0:
+        start = max(0, end - SCAN_CHUNK)
+        f.seek(start)
+        chunk = f.read(end - start)
+        i = chunk.rfind(b"\n")
+        if i >= 0:
+            return start + i + 1
+        end = start
+    return 0
+
+def recover(filename, verify_all=False, dry_run=False):
+    # Truncates a damaged recording to its last valid block (or last complete
+    # line without a journal). Returns (bytes kept, bytes dropped).
+    size = os.path.getsize(filename)
+    journal = journal_path(filename)
+    blocks = read_journal(journal) if os.path.exists(journal) else None
+
+    with open(filename, 'rb') as f:
+        if blocks is None:
+            keep = _last_line_end(f, size)
+        else:
+            valid = len(blocks)
+            if verify_all:
+                for i, block in enumerate(blocks):
+                    if not _block_ok(f, *block):
+                        valid = i
+                        break
+            else:
+                # Blocks are fsynced in order, so only the tail can be damaged
+                while valid and not _block_ok(f, *blocks[valid - 1]):
+                    valid -= 1
+            blocks = blocks[:valid]
+            keep = blocks[-1][0] + blocks[-1][1] if blocks else 0
+
+    if not dry_run and keep != size:
+        with open(filename, 'r+b') as f:
+            f.truncate(keep)
+            f.flush()
+            os.fsync(f.fileno())
+    if not dry_run and blocks is not None:
+        with open(journal, 'r+b') as f:
+            f.truncate(len(JOURNAL_MAGIC) + len(blocks) * FRAME.size)
+    return keep, size - keep
+
+def _mark_recovered(filename, dropped):
+    # Notes the recovery in the metadata file (an unclean stop never closed it)
+    path = os.path.splitext(filename)[0] + ".json"
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        metadata['closed_by'] = metadata.get('closed_by') or "recovered"
+        metadata['recovered_bytes_dropped'] = dropped
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, indent=2)
+    except Exception as e:
+        print(f"Error updating metadata {path}: {e}")
+
+def main(argv=None):
+    from ams2_recorder import list_recordings
+    parser = argparse.ArgumentParser(description="Repair recordings after a crash")
+    parser.add_argument("paths", nargs="+", help="Recording CSVs or directories")
+    parser.add_argument("--verify-all", action="store_true", help="Check every block, not only the tail")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    files = []
+    for path in args.paths:
+        files += list_recordings(path) if os.path.isdir(path) else [path]
+    for filename in files:
+        start = time.perf_counter()
+        try:
+            kept, dropped = recover(filename, args.verify_all, args.dry_run)
+        except Exception as e:
+            print(f"Error recovering {filename}: {e}")
+            continue
+        if dropped and not args.dry_run:
+            _mark_recovered(filename, dropped)
+        status = f"dropped {dropped} bytes" if dropped else "ok"
+        print(f"{filename}: {status}, kept {kept} bytes ({time.perf_counter() - start:.3f}s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
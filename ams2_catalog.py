@@ -0,0 +1,210 @@
+import argparse
+import contextlib
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from ams2_recorder import RecordingSummary, iter_lap_columns, list_recordings, load_metadata
+
+# Catalog of all recordings in the archive, kept in a small SQLite database so
+# questions like "all Interlagos sessions in the GT3 car" do not need to open
+# a single recording.
+#
+# The recorder keeps a running summary of every file and stores it in the
+# metadata file, so adding a freshly closed recording only reads that JSON:
+#
+#   catalog = SessionCatalog()
+#   recorder.file_closed_callbacks.append(catalog.add_recording)
+#
+# Older recordings without a summary are scanned once; rebuild() does that in
+# parallel over all files that are new or changed since the last run.
+#
+#   python ams2_catalog.py rebuild
+#   python ams2_catalog.py query --track Interlagos --car-class GT3
+
+DEFAULT_DB = os.path.join("data", "catalog.sqlite")
+
+COLUMNS = [
+    ("file", "TEXT PRIMARY KEY"),
+    ("car", "TEXT"),
+    ("car_class", "TEXT"),
+    ("track", "TEXT"),
+    ("track_variation", "TEXT"),
+    ("session_state", "INTEGER"),
+    ("started", "TEXT"),
+    ("started_unix", "REAL"),
+    ("duration_s", "REAL"),
+    ("frames", "INTEGER"),
+    ("laps", "INTEGER"),
+    ("best_lap", "REAL"),
+    ("track_temp_avg", "REAL"),
+    ("ambient_temp_avg", "REAL"),
+    ("rain_max", "REAL"),
+    ("file_size", "INTEGER"),
+    ("file_mtime", "REAL"),
+]
+COLUMN_NAMES = [name for name, _ in COLUMNS]
+
+def summarize_recording(filename):
+    # Returns the catalog row (as dict) for one recording. Uses the summary in
+    # the metadata file when present, otherwise streams the CSV once.
+    metadata = load_metadata(filename)
+    row = {name: metadata.get(name) for name in COLUMN_NAMES}
+    row['file'] = os.path.abspath(filename)
+    stat = os.stat(filename)
+    row['file_size'] = stat.st_size
+    row['file_mtime'] = stat.st_mtime
+
+    if metadata.get('laps') is None:
+        summary = RecordingSummary()
+        wanted = ["Lap", "LastLapTime", "TrackTemp", "AmbientTemp", "RainDensity"]
+        for lap, columns in iter_lap_columns(filename, wanted):
+            zeros = [0.0] * len(next(iter(columns.values()), []))
+            for values in zip(*(columns.get(c, zeros) for c in wanted[1:])):
+                summary.add(lap, *values)
+        row.update(summary.to_dict())
+    if row['started_unix'] is None:
+        row['started_unix'] = stat.st_mtime
+    return row
+
+class SessionCatalog:
+    def __init__(self, db_path=DEFAULT_DB):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with self._connect() as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS recordings ({', '.join(f'{n} {t}' for n, t in COLUMNS)})")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_track_car ON recordings (track, track_variation, car)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_car_class ON recordings (car_class)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_started ON recordings (started_unix)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # One short-lived connection per call, so the catalog can be used from
+        # the recorder's writer thread and the UI thread alike
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn: # commits on success
+                yield conn
+        finally:
+            conn.close()
+
+    def _upsert(self, conn, rows):
+        placeholders = ", ".join("?" for _ in COLUMN_NAMES)
+        conn.executemany(f"INSERT OR REPLACE INTO recordings ({', '.join(COLUMN_NAMES)}) VALUES ({placeholders})",
+                         [[row.get(name) for name in COLUMN_NAMES] for row in rows])
+
+    def add_recording(self, filename):
+        try:
+            row = summarize_recording(filename)
+            with self._connect() as conn:
+                self._upsert(conn, [row])
+        except Exception as e:
+            print(f"Error adding {filename} to catalog: {e}")
+
+    def _known_files(self, conn):
+        return {r['file']: (r['file_size'], r['file_mtime'])
+                for r in conn.execute("SELECT file, file_size, file_mtime FROM recordings")}
+
+    def prune(self):
+        # Removes entries whose recording no longer exists (e.g. retention)
+        with self._connect() as conn:
+            missing = [f for f in self._known_files(conn) if not os.path.exists(f)]
+            conn.executemany("DELETE FROM recordings WHERE file = ?", [(f,) for f in missing])
+        return len(missing)
+
+    def rebuild(self, directory="data", workers=None, full=False):
+        # Summarizes new or changed recordings in parallel. Returns the number
+        # of recordings (re)indexed.
+        self.prune()
+        files = list_recordings(directory)
+        with self._connect() as conn:
+            known = {} if full else self._known_files(conn)
+        todo = []
+        for filename in files:
+            path = os.path.abspath(filename)
+            stat = os.stat(path)
+            if known.get(path) != (stat.st_size, stat.st_mtime):
+                todo.append(path)
+        if not todo:
+            return 0
+
+        rows = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for i, row in enumerate(pool.map(summarize_recording, todo, chunksize=4), 1):
+                rows.append(row)
+                if i % 50 == 0 or i == len(todo):
+                    print(f"Catalog: {i}/{len(todo)} recordings indexed", end="\r")
+        print()
+        with self._connect() as conn:
+            self._upsert(conn, rows)
+        return len(rows)
+
+    def query(self, car=None, car_class=None, track=None, track_variation=None,
+              since=None, until=None, min_laps=None, order_by="started_unix", limit=None):
+        # Exact match on the given fields; since/until are unix timestamps
+        conditions = []
+        params = []
+        for column, value in (("car", car), ("car_class", car_class), ("track", track),
+                              ("track_variation", track_variation)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("started_unix >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("started_unix < ?")
+            params.append(until)
+        if min_laps is not None:
+            conditions.append("laps >= ?")
+            params.append(min_laps)
+        if order_by not in COLUMN_NAMES:
+            raise ValueError(f"Unknown column '{order_by}'")
+
+        sql = "SELECT * FROM recordings"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY {order_by}"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self._connect() as conn:
+            return [dict(r) for r in conn.execute(sql, params)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Catalog of AMS2 recordings")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild = sub.add_parser("rebuild", help="Index new or changed recordings")
+    rebuild.add_argument("--dir", default="data")
+    rebuild.add_argument("--workers", type=int)
+    rebuild.add_argument("--full", action="store_true", help="Re-index every recording")
+    query = sub.add_parser("query", help="List recordings")
+    query.add_argument("--car")
+    query.add_argument("--car-class")
+    query.add_argument("--track")
+    query.add_argument("--variation")
+    query.add_argument("--min-laps", type=int)
+    args = parser.parse_args(argv)
+
+    catalog = SessionCatalog(args.db)
+    if args.command == "rebuild":
+        count = catalog.rebuild(args.dir, args.workers, args.full)
+        print(f"{count} recording(s) indexed.")
+        return 0
+
+    rows = catalog.query(car=args.car, car_class=args.car_class, track=args.track,
+                         track_variation=args.variation, min_laps=args.min_laps)
+    print(f"{'Started':<19} | {'Car':<20} | {'Track':<24} | {'Laps':>4} | {'Best':>8}")
+    print("-" * 86)
+    for r in rows:
+        best = f"{r['best_lap']:.3f}" if r['best_lap'] else "-"
+        track = f"{r['track'] or ''} {r['track_variation'] or ''}".strip()
+        print(f"{(r['started'] or '')[:19]:<19} | {(r['car'] or '')[:20]:<20} | {track[:24]:<24} | {r['laps'] or 0:>4} | {best:>8}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import ctypes
+import struct
+from collections import namedtuple
+from ams2_structs import SharedMemory, ParticipantInfo
+
+# Change detection on top of AMS2Reader.
+#
+# Most consumers only care about a few slowly changing values (flags, pit
+# mode, session state, ...), yet would re-check them on every frame. The
+# detector copies the bytes of all watched fields into one snapshot and
+# compares it with the previous one in a single bytes comparison; only when
+# that differs are the individual fields decoded and events emitted.
+#
+#   detector = ChangeDetector()
+#   detector.subscribe(PIT_MODE, lambda event: print(event.old, "->", event.new))
+#   while True:
+#       detector.update(reader.read())
+
+# Event kinds
+FLAG = "flag"
+PIT_MODE = "pit_mode"
+SESSION_STATE = "session_state"
+GAME_STATE = "game_state"
+TYRE_COMPOUND = "tyre_compound"
+DAMAGE = "damage"
+LAP_TIME = "lap_time" # mLastLapTime, settles shortly after the line
+LAP = "lap"           # lap number of the viewed car
+
+# kind -> watched SharedMemory fields. Events of kinds with one field carry
+# its value; DAMAGE carries a {field: value} dict.
+WATCHES = {
+    FLAG: ["mHighestFlagColour"],
+    PIT_MODE: ["mPitMode"],
+    SESSION_STATE: ["mSessionState"],
+    GAME_STATE: ["mGameState"],
+    TYRE_COMPOUND: ["mTyreCompound"],
+    DAMAGE: ["mCrashState", "mAeroDamage", "mEngineDamage", "mBrakeDamage", "mSuspensionDamage"],
+    LAP_TIME: ["mLastLapTime"],
+}
+
+# old is None for the first frame seen
+ChangeEvent = namedtuple("ChangeEvent", ["kind", "old", "new", "sequence"])
+
+_STRUCT_CODES = {
+    ctypes.c_uint: "I",
+    ctypes.c_int: "i",
+    ctypes.c_float: "f",
+    ctypes.c_bool: "?",
+}
+
+def _field_decoder(field_type):
+    # Returns a function (buffer, pos) -> python value for a ctypes field type
+    if field_type in _STRUCT_CODES:
+        fmt = struct.Struct("<" + _STRUCT_CODES[field_type])
+        return lambda buf, pos: fmt.unpack_from(buf, pos)[0]
+    element = getattr(field_type, "_type_", None)
+    if element in _STRUCT_CODES:
+        fmt = struct.Struct(f"<{field_type._length_}{_STRUCT_CODES[element]}")
+        return lambda buf, pos: fmt.unpack_from(buf, pos)
+    if element is not None and getattr(element, "_type_", None) is ctypes.c_char:
+        # Array of fixed-length strings, e.g. mTyreCompound
+        count, length = field_type._length_, element._length_
+        return lambda buf, pos: tuple(
+            bytes(buf[pos + i * length:pos + (i + 1) * length]).split(b"\0", 1)[0].decode('utf-8', errors='ignore')
+            for i in range(count))
+    raise TypeError(f"Unsupported field type {field_type}")
+
+_FIELD_TYPES = dict(SharedMemory._fields_)
+_VIEWED_INDEX = struct.Struct("<i")
+_LAP = struct.Struct("<I")
+
+class ChangeDetector:
+    def __init__(self, kinds=None):
+        self.kinds = list(kinds or WATCHES)
+        # Per kind: (start, end) in the snapshot and per field (name, pos, decoder)
+        self.ranges = []
+        self.layout = []
+        pos = 0
+        for kind in self.kinds:
+            kind_start = pos
+            fields = []
+            for name in WATCHES[kind]:
+                desc = getattr(SharedMemory, name)
+                self.ranges.append((desc.offset, desc.offset + desc.size))
+                fields.append((name, pos, _field_decoder(_FIELD_TYPES[name])))
+                pos += desc.size
+            self.layout.append((kind, kind_start, pos, fields))
+
+        self.snapshot = None
+        self.values = {}
+        self.lap = None
+        self.subscribers = {}
+
+    def subscribe(self, kind, callback):
+        # callback(event) for events of 'kind', or of every kind if kind is None
+        self.subscribers.setdefault(kind, []).append(callback)
+
+    def _decode(self, snapshot, fields):
+        if len(fields) == 1:
+            _, pos, decode = fields[0]
+            return decode(snapshot, pos)
+        return {name: decode(snapshot, pos) for name, pos, decode in fields}
+
+    def update(self, data):
+        # Compares 'data' with the previous frame; returns the emitted events
+        if data is None:
+            return []
+        raw = memoryview(data).cast('B')
+        snapshot = b"".join([raw[start:end] for start, end in self.ranges])
+        seq = data.mSequenceNumber
+        events = []
+
+        if snapshot != self.snapshot:
+            previous = self.snapshot
+            for kind, start, end, fields in self.layout:
+                if previous is not None and snapshot[start:end] == previous[start:end]:
+                    continue
+                value = self._decode(snapshot, fields)
+                events.append(ChangeEvent(kind, self.values.get(kind), value, seq))
+                self.values[kind] = value
+            self.snapshot = snapshot
+
+        # The viewed car's lap lives in the participant array, so its offset
+        # moves with mViewedParticipantIndex
+        idx = _VIEWED_INDEX.unpack_from(raw, SharedMemory.mViewedParticipantIndex.offset)[0]
+        if 0 <= idx < data.mNumParticipants:
+            offset = (SharedMemory.mParticipantInfo.offset + idx * ctypes.sizeof(ParticipantInfo)
+                      + ParticipantInfo.mCurrentLap.offset)
+            lap = _LAP.unpack_from(raw, offset)[0]
+            if lap != self.lap:
+                events.append(ChangeEvent(LAP, self.lap, lap, seq))
+                self.lap = lap
+
+        for event in events:
+            for callback in self.subscribers.get(event.kind, []) + self.subscribers.get(None, []):
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"Error in change event callback: {e}")
+        return events
+
+    def reset(self):
+        # Forget the previous frame, e.g. after reconnecting
+        self.snapshot = None
+        self.values = {}
+        self.lap = None
@@ -0,0 +1,107 @@
+import re
+from collections import namedtuple
+from ams2_structs import STORED_PARTICIPANTS_MAX
+
+# Channel specs: a compact way to name a value in a SharedMemory frame.
+#
+#   "mSpeed"                      top-level field
+#   "mTyreWear[2]"                array element (0=FL, 1=FR, 2=RL, 3=RR)
+#   "participant.mCurrentLap"     field of the viewed participant
+#   "participant.mWorldPosition[0]"
+#   "participants[3].mCurrentLap" field of participant 3
+#
+# A spec can also be any callable taking the frame, for derived values.
+#
+# Slices ("mTyreTemp[0:4]", "participants[0:8].mCurrentLap") stand for one
+# channel per element; expand_spec() splits them into single specs.
+#
+# Channels are declared as (name, spec, scale) tuples, see per_tyre().
+# Channel is the same tuple with an optional CSV number format and unit.
+
+TYRE_SUFFIXES = ["FL", "FR", "RL", "RR"]
+
+Channel = namedtuple("Channel", "name spec scale fmt unit", defaults=(1.0, None, None))
+
+_SPEC_RE = re.compile(r"^(?:(participant)\.|participants\[(\d+)(?::(\d+))?\]\.)?(m\w+)(?:\[(\d+)(?::(\d+))?\])?$")
+
+def _index(start, end):
+    if start is None:
+        return None
+    return range(int(start), int(end)) if end is not None else int(start)
+
+def parse_spec(spec):
+    # Returns (owner, field, index). owner is None for the frame itself,
+    # "participant" for the viewed car or a participant index; owner and
+    # index are ranges for slices.
+    match = _SPEC_RE.match(spec)
+    if not match:
+        raise ValueError(f"Invalid channel spec '{spec}'")
+    viewed, car_start, car_end, field, start, end = match.groups()
+    owner = "participant" if viewed else _index(car_start, car_end)
+    cars = owner if isinstance(owner, range) else [owner] if isinstance(owner, int) else []
+    if any(car >= STORED_PARTICIPANTS_MAX for car in cars):
+        raise ValueError(f"Participant index out of range in '{spec}'")
+    return owner, field, _index(start, end)
+
+def expand_spec(name, spec):
+    # [(name, spec)] with one single spec per element of a slice. Names of
+    # slices need a {tyre} (FL..RR) or {i} placeholder, e.g.
+    # ("TyreTemp_{tyre}", "mTyreTemp[0:4]") or ("Lap_{i}", "participants[0:8].mCurrentLap")
+    if callable(spec):
+        return [(name, spec)]
+    owner, field, index = parse_spec(spec)
+    if isinstance(owner, range) and isinstance(index, range):
+        raise ValueError(f"Only one slice per channel spec: '{spec}'")
+    if isinstance(owner, range):
+        element = f"[{index}]" if index is not None else ""
+        items = [(i, f"participants[{i}].{field}{element}") for i in owner]
+    elif isinstance(index, range):
+        prefix = {None: "", "participant": "participant."}.get(owner, f"participants[{owner}].")
+        items = [(i, f"{prefix}{field}[{i}]") for i in index]
+    else:
+        return [(name, spec)]
+    if "{tyre}" not in name and "{i}" not in name:
+        raise ValueError(f"Channel '{name}' of slice '{spec}' needs a {{tyre}} or {{i}} placeholder")
+    return [(name.format(i=i, tyre=TYRE_SUFFIXES[i] if i < len(TYRE_SUFFIXES) else str(i)), single)
+            for i, single in items]
+
+def viewed_participant(data):
+    idx = data.mViewedParticipantIndex
+    if 0 <= idx < data.mNumParticipants:
+        return data.mParticipantInfo[idx]
+    return None
+
+def channel_getter(spec, scale=1.0):
+    # Returns a function frame -> float for a channel spec
+    if callable(spec):
+        if scale == 1.0:
+            return spec
+        return lambda data: spec(data) * scale
+
+    owner, field, index = parse_spec(spec)
+    if isinstance(owner, range) or isinstance(index, range):
+        raise ValueError(f"Channel spec '{spec}' is a slice, see expand_spec")
+    if owner == "participant":
+        def getter(data):
+            p = viewed_participant(data)
+            if p is None:
+                return 0.0
+            value = getattr(p, field)
+            return (value[index] if index is not None else value) * scale
+        return getter
+    if owner is not None:
+        def getter(data):
+            value = getattr(data.mParticipantInfo[owner], field)
+            return (value[index] if index is not None else value) * scale
+        return getter
+    if index is not None:
+        if scale == 1.0:
+            return lambda data: getattr(data, field)[index]
+        return lambda data: getattr(data, field)[index] * scale
+    if scale == 1.0:
+        return lambda data: getattr(data, field)
+    return lambda data: getattr(data, field) * scale
+
+def per_tyre(name, field, scale=1.0):
+    # Four (name_FL, spec, scale) ... entries for a per-wheel field
+    return [(f"{name}_{suffix}", f"{field}[{i}]", scale) for i, suffix in enumerate(TYRE_SUFFIXES)]
@@ -0,0 +1,181 @@
+import math
+import time
+from collections import namedtuple
+from ams2_channels import viewed_participant
+from ams2_structs import (
+    TYRE_MAX,
+    TERRAIN_GRASS, TERRAIN_GRAVEL, TERRAIN_BUMPY_GRAVEL, TERRAIN_TYREWALLS,
+    TERRAIN_CEMENTWALLS, TERRAIN_GUARDRAILS, TERRAIN_SAND, TERRAIN_BUMPY_SAND,
+    TERRAIN_DIRT, TERRAIN_BUMPY_DIRT, TERRAIN_DIRT_BANK, TERRAIN_DRY_VERGE,
+    TERRAIN_LONG_GRASS, TERRAIN_SLOPE_GRASS,
+    TERRAIN_ROUGH_SAND_MEDIUM, TERRAIN_ROUGH_SAND_HEAVY, TERRAIN_SNOWWALLS,
+    TERRAIN_RUNOFF_ROAD, TERRAIN_ILLEGAL_STRIP, TERRAIN_PAINT_CONCRETE_ILLEGAL,
+)
+
+# Driving events of the viewed car, detected frame by frame at the full
+# publish rate:
+#
+#   LOCKUP     a wheel turns much slower than the car moves while braking
+#   WHEELSPIN  a wheel turns much faster than the car moves under throttle
+#   OFF_TRACK  most wheels are on grass, gravel, sand, ...
+#   IMPACT     a new collision with an opponent
+#
+# Every condition has separate enter/exit thresholds (hysteresis) so a wheel
+# hovering around a threshold gives one event, not dozens. Events are emitted
+# when they end, with their duration and peak value:
+#
+#   detector = DrivingEventDetector()
+#   for event in detector.update(data):   # every new frame
+#       recorder.record_event(event)
+#
+# The per-frame work is a fixed loop over the four wheels on plain floats
+# without allocations, so its cost is constant (see "driving_events_update"
+# in ams2_benchmark.py).
+
+LOCKUP = "lockup"
+WHEELSPIN = "wheelspin"
+OFF_TRACK = "off_track"
+IMPACT = "impact"
+
+DrivingEvent = namedtuple("DrivingEvent", "kind wheel time lap distance duration peak")
+
+WHEEL_NAMES = ["FL", "FR", "RL", "RR"]
+
+# Slip ratio (wheel surface speed - car speed) / car speed
+LOCKUP_ENTER = -0.25
+LOCKUP_EXIT = -0.12
+LOCKUP_MIN_BRAKE = 0.1
+WHEELSPIN_ENTER = 0.20
+WHEELSPIN_EXIT = 0.10
+WHEELSPIN_MIN_THROTTLE = 0.2
+MIN_SPEED = 5.0 # m/s; slip is meaningless when (almost) standing
+
+# Rolling radius per wheel, learned while the car rolls freely
+DEFAULT_RADIUS = 0.33 # metres
+RADIUS_ALPHA = 0.01
+RADIUS_MIN_SAMPLES = 60
+LEARN_MIN_SPEED = 10.0
+LEARN_MAX_STEERING = 0.2
+
+OFF_TRACK_TERRAIN = frozenset([
+    TERRAIN_GRASS, TERRAIN_GRAVEL, TERRAIN_BUMPY_GRAVEL, TERRAIN_TYREWALLS,
+    TERRAIN_CEMENTWALLS, TERRAIN_GUARDRAILS, TERRAIN_SAND, TERRAIN_BUMPY_SAND,
+    TERRAIN_DIRT, TERRAIN_BUMPY_DIRT, TERRAIN_DIRT_BANK, TERRAIN_DRY_VERGE,
+    TERRAIN_LONG_GRASS, TERRAIN_SLOPE_GRASS,
+    TERRAIN_ROUGH_SAND_MEDIUM, TERRAIN_ROUGH_SAND_HEAVY, TERRAIN_SNOWWALLS,
+    TERRAIN_RUNOFF_ROAD, TERRAIN_ILLEGAL_STRIP, TERRAIN_PAINT_CONCRETE_ILLEGAL,
+])
+OFF_TRACK_ENTER = 3 # wheels off
+OFF_TRACK_EXIT = 1
+
+IMPACT_MIN_MAGNITUDE = 100.0
+NO_COLLISION = (-1, 0.0) # (opponent index, magnitude)
+
+class _Active:
+    __slots__ = ("start", "lap", "distance", "peak")
+
+    def __init__(self, start, lap, distance, peak):
+        self.start = start
+        self.lap = lap
+        self.distance = distance
+        self.peak = peak
+
+class DrivingEventDetector:
+    def __init__(self):
+        self.radius = [DEFAULT_RADIUS] * TYRE_MAX
+        self.radius_samples = [0] * TYRE_MAX
+        self.lockups = [None] * TYRE_MAX
+        self.wheelspins = [None] * TYRE_MAX
+        self.off_track = None
+        self.last_collision = NO_COLLISION
+        self.recent = [] # last few events for the live display
+
+    def reset(self):
+        # Forget active events, e.g. after a restart; the learned radii and
+        # the last collision (already reported) stay
+        self.lockups = [None] * TYRE_MAX
+        self.wheelspins = [None] * TYRE_MAX
+        self.off_track = None
+
+    def update(self, data, t=None):
+        # Returns the events that ended in this frame
+        p = viewed_participant(data)
+        if p is None:
+            return []
+        if t is None:
+            t = time.time()
+        lap = p.mCurrentLap
+        distance = p.mCurrentLapDistance
+        events = []
+
+        speed = data.mSpeed
+        brake = data.mBrake
+        throttle = data.mThrottle
+        rps = data.mTyreRPS
+        learn = (speed > LEARN_MIN_SPEED and brake < 0.05 and throttle < 0.5
+                 and abs(data.mSteering) < LEARN_MAX_STEERING)
+        for w in range(TYRE_MAX):
+            wheel_speed = abs(rps[w]) * 2.0 * math.pi
+            if learn and wheel_speed > 0:
+                r = speed / wheel_speed
+                if self.radius_samples[w]:
+                    self.radius[w] += RADIUS_ALPHA * (r - self.radius[w])
+                else:
+                    self.radius[w] = r
+                self.radius_samples[w] += 1
+            if speed < MIN_SPEED or self.radius_samples[w] < RADIUS_MIN_SAMPLES:
+                slip = 0.0
+            else:
+                slip = (wheel_speed * self.radius[w] - speed) / speed
+
+            active = self.lockups[w]
+            if active is None:
+                if slip < LOCKUP_ENTER and brake > LOCKUP_MIN_BRAKE:
+                    self.lockups[w] = _Active(t, lap, distance, slip)
+            elif slip > LOCKUP_EXIT:
+                events.append(self._end(LOCKUP, w, active, t))
+                self.lockups[w] = None
+            elif slip < active.peak:
+                active.peak = slip
+
+            active = self.wheelspins[w]
+            if active is None:
+                if slip > WHEELSPIN_ENTER and throttle > WHEELSPIN_MIN_THROTTLE:
+                    self.wheelspins[w] = _Active(t, lap, distance, slip)
+            elif slip < WHEELSPIN_EXIT:
+                events.append(self._end(WHEELSPIN, w, active, t))
+                self.wheelspins[w] = None
+            elif slip > active.peak:
+                active.peak = slip
+
+        off = 0
+        for terrain in data.mTerrain:
+            if terrain in OFF_TRACK_TERRAIN:
+                off += 1
+        if self.off_track is None:
+            if off >= OFF_TRACK_ENTER:
+                self.off_track = _Active(t, lap, distance, off)
+        elif off <= OFF_TRACK_EXIT:
+            events.append(self._end(OFF_TRACK, None, self.off_track, t))
+            self.off_track = None
+        elif off > self.off_track.peak:
+            self.off_track.peak = off
+
+        # Opponent index and magnitude stay at the last collision's values until
+        # the next one; a collision is new when either of them changes
+        magnitude = data.mLastOpponentCollisionMagnitude
+        collision = (data.mLastOpponentCollisionIndex, magnitude)
+        if collision != self.last_collision:
+            if collision[0] >= 0 and magnitude >= IMPACT_MIN_MAGNITUDE:
+                events.append(self._end(IMPACT, None, _Active(t, lap, distance, magnitude), t))
+            self.last_collision = collision
+
+        return events
+
+    def _end(self, kind, wheel, active, t):
+        event = DrivingEvent(kind, WHEEL_NAMES[wheel] if wheel is not None else "",
+                             active.start, active.lap, round(active.distance, 1),
+                             round(t - active.start, 3), round(active.peak, 3))
+        self.recent.append(event)
+        del self.recent[:-5]
+        return event
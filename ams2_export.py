@@ -0,0 +1,162 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+from ams2_recorder import INT_COLUMNS, BOOL_COLUMNS, iter_lap_columns, list_recordings, load_metadata
+
+# Export of CSV recordings to Parquet or Arrow IPC for analytics.
+#
+#   python ams2_export.py                          # all data/telemetry_*.csv -> .parquet
+#   python ams2_export.py data/telemetry_X.csv --format arrow
+#
+# Columns are typed, car/track/compound are dictionary-encoded columns, every
+# lap becomes its own row group (Parquet) or record batch (Arrow IPC) and the
+# session metadata is stored in the schema. A whole season can then be read
+# column-wise with read_season().
+#
+# Requires pyarrow (pip install pyarrow); the rest of the tool works without it.
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+SESSION_METADATA_KEY = b"ams2.session"
+
+# (column name, metadata key) of the constant per-session string columns
+DICTIONARY_COLUMNS = [
+    ("Car", 'car'),
+    ("CarClass", 'car_class'),
+    ("Track", 'track'),
+    ("TrackVariation", 'track_variation'),
+    ("TyreCompound", 'tyre_compound'),
+]
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed. Install it with: pip install pyarrow")
+
+def _arrow_type(name):
+    if name == "Timestamp":
+        return pa.float64() # wall-clock seconds need double precision
+    if name in INT_COLUMNS:
+        return pa.int64()
+    if name in BOOL_COLUMNS:
+        return pa.bool_()
+    return pa.float32()
+
+def _read_header(filename):
+    with open(filename, 'r', newline='') as f:
+        return next(csv.reader(f), [])
+
+def _session_strings(metadata):
+    values = dict(metadata)
+    compounds = metadata.get('tyre_compounds') or []
+    values['tyre_compound'] = compounds[0] if compounds else ""
+    return {col: str(values.get(key) or "") for col, key in DICTIONARY_COLUMNS}
+
+def build_schema(header, metadata):
+    _require_pyarrow()
+    fields = [pa.field(name, _arrow_type(name)) for name in header]
+    fields += [pa.field(col, pa.dictionary(pa.int32(), pa.string())) for col, _ in DICTIONARY_COLUMNS]
+    return pa.schema(fields, metadata={SESSION_METADATA_KEY: json.dumps(metadata).encode('utf-8')})
+
+def _lap_batch(schema, header, columns, strings):
+    rows = len(columns[header[0]])
+    arrays = [pa.array(columns[name], type=schema.field(name).type) for name in header]
+    zeros = pa.array([0] * rows, type=pa.int32())
+    for col, _ in DICTIONARY_COLUMNS:
+        arrays.append(pa.DictionaryArray.from_arrays(zeros, pa.array([strings[col]], type=pa.string())))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def export_recording(filename, output=None, fmt="parquet", compression="zstd"):
+    # Converts one CSV recording; returns the output path
+    _require_pyarrow()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {', '.join(FORMATS)}")
+    if output is None:
+        output = os.path.splitext(filename)[0] + FORMATS[fmt]
+
+    header = _read_header(filename)
+    metadata = load_metadata(filename)
+    strings = _session_strings(metadata)
+    schema = build_schema(header, metadata)
+
+    tmp_output = output + ".tmp"
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(tmp_output, schema, compression=compression)
+    else:
+        options = pa.ipc.IpcWriteOptions(compression=compression if compression in ("zstd", "lz4") else None)
+        writer = pa.ipc.new_file(tmp_output, schema, options=options)
+    try:
+        for _lap, columns in iter_lap_columns(filename, header):
+            batch = _lap_batch(schema, header, columns, strings)
+            if fmt == "parquet":
+                # One row group per lap
+                writer.write_table(pa.Table.from_batches([batch]), row_group_size=batch.num_rows)
+            else:
+                writer.write_batch(batch)
+    finally:
+        writer.close()
+    os.replace(tmp_output, output)
+    return output
+
+def read_session_metadata(path):
+    # Session metadata stored in an exported file
+    _require_pyarrow()
+    if path.endswith(".arrow"):
+        with pa.memory_map(path) as source:
+            schema = pa.ipc.open_file(source).schema
+    else:
+        schema = pq.read_schema(path)
+    raw = (schema.metadata or {}).get(SESSION_METADATA_KEY)
+    return json.loads(raw) if raw else {}
+
+def read_season(directory="data", columns=None, filter=None):
+    # Reads many exported Parquet sessions as one table, touching only the
+    # requested columns, e.g.
+    #   read_season(columns=["Track", "Car", "Lap", "Speed_Kmh"],
+    #               filter=pyarrow.dataset.field("Track") == "Interlagos")
+    _require_pyarrow()
+    import pyarrow.dataset as ds
+    files = sorted(glob.glob(os.path.join(directory, "*.parquet")))
+    if not files:
+        return None
+    return ds.dataset(files, format="parquet").to_table(columns=columns, filter=filter)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export AMS2 CSV recordings to Parquet or Arrow IPC")
+    parser.add_argument("files", nargs="*", help="CSV recordings (default: data/telemetry_*.csv)")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--compression", default="zstd")
+    parser.add_argument("--output-dir", help="Write exports here instead of next to the CSV")
+    args = parser.parse_args(argv)
+
+    if pa is None:
+        print("pyarrow is not installed. Install it with: pip install pyarrow")
+        return 1
+
+    files = args.files or list_recordings("data")
+    if args.output_dir and not os.path.exists(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    for filename in files:
+        output = None
+        if args.output_dir:
+            base = os.path.splitext(os.path.basename(filename))[0]
+            output = os.path.join(args.output_dir, base + FORMATS[args.format])
+        try:
+            written = export_recording(filename, output, args.format, args.compression)
+            print(f"Exported {filename} -> {written}")
+        except Exception as e:
+            print(f"Failed to export {filename}: {e}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+import argparse
+import json
+import os
+import sys
+from array import array
+from ams2_channels import channel_getter, per_tyre, viewed_participant
+
+# Streaming histograms for setup work: distributions of suspension travel and
+# velocity, ride height and pedals per lap and per stint, without keeping any
+# samples. Every channel has preallocated fixed bins in one array; a frame
+# only increments one counter per channel. Values outside a channel's range
+# (also +-inf) are counted in its first/last bin, NaN is skipped.
+#
+#   histograms = LapHistograms()
+#   histograms.update(data)                   # every frame
+#   histograms.stint.percentile("RideHeight_FL", 0.05)
+#
+# DataRecorder(histograms=LapHistograms()) writes them to <base>.hist.json
+# next to the recording; compare two runs with
+#
+#   python ams2_histograms.py data/telemetry_A.csv data/telemetry_B.csv
+
+HIST_VERSION = 1
+
+def _per_wheel(name, field, scale, low, high, bins):
+    return [channel + (low, high, bins) for channel in per_tyre(name, field, scale)]
+
+# (name, spec, scale, low, high, bins); lengths in mm, velocities in mm/s
+HISTOGRAM_CHANNELS = _per_wheel("SuspensionTravel", "mSuspensionTravel", 1000.0, 0.0, 200.0, 100) \
+    + _per_wheel("SuspensionVelocity", "mSuspensionVelocity", 1000.0, -500.0, 500.0, 100) \
+    + _per_wheel("RideHeight", "mRideHeight", 1000.0, 0.0, 150.0, 75) \
+    + [("Throttle", "mThrottle", 1.0, 0.0, 1.0, 20),
+       ("Brake", "mBrake", 1.0, 0.0, 1.0, 20)]
+
+class HistogramSet:
+    def __init__(self, channels=None):
+        self.channels = channels or HISTOGRAM_CHANNELS
+        self.names = [c[0] for c in self.channels]
+        self.getters = [channel_getter(spec, scale) for _, spec, scale, _, _, _ in self.channels]
+        self.lows = [low for _, _, _, low, _, _ in self.channels]
+        self.factors = [bins / (high - low) for _, _, _, low, high, bins in self.channels]
+        self.sizes = [bins for _, _, _, _, _, bins in self.channels]
+        self.offsets = []
+        total = 0
+        for bins in self.sizes:
+            self.offsets.append(total)
+            total += bins
+        self.blank = array('I', bytes(4 * total))
+        self.counts = array('I', self.blank)
+        self.samples = 0
+        # Per channel: (getter, low, bins per unit, last bin, offset)
+        self._plan = list(zip(self.getters, self.lows, self.factors,
+                              [bins - 1 for bins in self.sizes], self.offsets))
+
+    def update(self, data):
+        counts = self.counts
+        for get, low, factor, last, offset in self._plan:
+            x = (get(data) - low) * factor
+            if x < 0:
+                b = 0
+            elif x < last:
+                b = int(x)
+            elif x >= last:
+                b = last # includes inf
+            else:
+                continue # NaN is not counted
+            counts[offset + b] += 1
+        self.samples += 1
+
+    def merge(self, other):
+        counts = other.counts
+        for i in range(len(self.counts)):
+            self.counts[i] += counts[i]
+        self.samples += other.samples
+
+    def clear(self):
+        self.counts[:] = self.blank
+        self.samples = 0
+
+    def copy(self):
+        other = HistogramSet(self.channels)
+        other.merge(self)
+        return other
+
+    def channel(self, name):
+        # Counts of one channel as a zero-copy view
+        i = self.names.index(name)
+        return memoryview(self.counts)[self.offsets[i]:self.offsets[i] + self.sizes[i]]
+
+    def edges(self, name):
+        _, _, _, low, high, bins = self.channels[self.names.index(name)]
+        return [low + (high - low) * b / bins for b in range(bins + 1)]
+
+    def percentile(self, name, q):
+        # Value below which a fraction q of the samples lie (bin interpolated)
+        counts = self.channel(name)
+        total = sum(counts)
+        if not total:
+            return None
+        edges = self.edges(name)
+        target = q * total
+        seen = 0
+        for b, count in enumerate(counts):
+            if count and seen + count >= target:
+                return edges[b] + (edges[b + 1] - edges[b]) * (target - seen) / count
+            seen += count
+        return edges[-1]
+
+    def to_dict(self):
+        return {name: list(self.channel(name)) for name in self.names}
+
+    def load_counts(self, counts):
+        for name, values in counts.items():
+            if name in self.names and len(values) == self.sizes[self.names.index(name)]:
+                self.channel(name)[:] = array('I', values)
+        self.samples = max((sum(values) for values in counts.values()), default=0)
+
+class LapHistograms:
+    # One HistogramSet per lap of the viewed car plus the stint total
+    def __init__(self, channels=None):
+        self.channels = channels or HISTOGRAM_CHANNELS
+        self.current = HistogramSet(self.channels)
+        self.stint = HistogramSet(self.channels)
+        self.laps = {}
+        self.lap = None
+
+    def update(self, data):
+        p = viewed_participant(data)
+        if p is None:
+            return
+        if p.mCurrentLap != self.lap:
+            self._finish_lap()
+            self.lap = p.mCurrentLap
+        self.current.update(data)
+
+    def _finish_lap(self):
+        if self.lap is not None and self.current.samples:
+            if self.lap in self.laps:
+                self.laps[self.lap].merge(self.current)
+            else:
+                self.laps[self.lap] = self.current.copy()
+            self.stint.merge(self.current)
+        self.current.clear()
+
+    def flush(self):
+        # Everything so far as a dict for <base>.hist.json; starts a new stint
+        self._finish_lap()
+        self.lap = None
+        result = self.to_dict()
+        self.laps = {}
+        self.stint.clear()
+        return result
+
+    def to_dict(self):
+        return {
+            'version': HIST_VERSION,
+            'channels': [{'name': name, 'low': low, 'high': high, 'bins': bins}
+                         for name, _, _, low, high, bins in self.channels],
+            'stint': self.stint.to_dict(),
+            'laps': {str(lap): h.to_dict() for lap, h in sorted(self.laps.items())},
+        }
+
+def histogram_path(filename):
+    return os.path.splitext(filename)[0] + ".hist.json"
+
+def load_histograms(filename):
+    # (stint HistogramSet, {lap: HistogramSet}) of a recording, or None
+    path = histogram_path(filename)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"Error loading histograms {path}: {e}")
+        return None
+    # Channel ranges come from the file, the specs are not needed for reading
+    channels = [(c['name'], lambda d: 0.0, 1.0, c['low'], c['high'], c['bins']) for c in data['channels']]
+    stint = HistogramSet(channels)
+    stint.load_counts(data['stint'])
+    laps = {}
+    for lap, counts in data['laps'].items():
+        laps[int(lap)] = HistogramSet(channels)
+        laps[int(lap)].load_counts(counts)
+    return stint, laps
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare channel distributions of recordings")
+    parser.add_argument("recordings", nargs="+")
+    parser.add_argument("--lap", type=int, help="Compare one lap instead of the whole stint")
+    args = parser.parse_args(argv)
+
+    runs = []
+    for filename in args.recordings:
+        loaded = load_histograms(filename)
+        if loaded is None:
+            print(f"{filename}: no histograms")
+            continue
+        stint, laps = loaded
+        histograms = laps.get(args.lap) if args.lap is not None else stint
+        if histograms is None:
+            print(f"{filename}: no lap {args.lap}")
+            continue
+        runs.append((os.path.splitext(os.path.basename(filename))[0], histograms))
+    if not runs:
+        return 1
+
+    # p5 / median / p95 per channel, one column per run
+    print(f"{'Channel':<22}" + "".join(f" | {name[:26]:<26}" for name, _ in runs))
+    for channel in runs[0][1].names:
+        cells = []
+        for _, histograms in runs:
+            if channel not in histograms.names:
+                cells.append(f"{'--':<26}")
+                continue
+            p = [histograms.percentile(channel, q) for q in (0.05, 0.5, 0.95)]
+            cells.append(f"{'--':<26}" if p[0] is None else f"{p[0]:7.1f} {p[1]:7.1f} {p[2]:7.1f}   ")
+        print(f"{channel:<22}" + "".join(f" | {c}" for c in cells))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+import argparse
+import asyncio
+import ctypes
+import os
+import re
+import struct
+import sys
+import time
+from ams2_recorder import DataRecorder
+from ams2_structs import SharedMemory
+
+# Multi-rig ingest for team events: every sim rig streams its raw frames over
+# TCP to one service, which writes them per rig in the normal recording format
+# (<dir>/<rig>/telemetry_*.csv, high-rate mode).
+#
+#   python ams2_ingest.py serve --dir rigs             # on the team PC
+#   python ams2_ingest.py rig --host 10.0.0.5 --name car1   # on every rig
+#   python ams2_ingest.py simulate --rigs 8            # localhost throughput test
+#
+# Protocol: a hello (MAGIC, u16 name length, name, u32 frame size) followed
+# by frames (u32 length, raw SharedMemory bytes). A rig keeps its recorder
+# across reconnects, so a dropped connection does not split its recording.
+#
+# Backpressure: when a rig's recorder falls behind, the service stops reading
+# that rig's socket; TCP then blocks the rig's drain(), and the rig skips
+# frames instead of buffering them (the game itself never waits).
+
+MAGIC = b"AMS2ING1"
+FRAME_SIZE = ctypes.sizeof(SharedMemory)
+DEFAULT_PORT = 7490
+LENGTH = struct.Struct("<I")
+HELLO = struct.Struct("<8sH")
+
+def rig_directory(directory, name):
+    # Rig names come from the network: no separators, and no "." or ".." that
+    # would point at or above the rigs directory
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", name).strip(".")
+    return os.path.join(directory, safe or "rig")
+
+class RigState:
+    def __init__(self, name, recorder):
+        self.name = name
+        self.recorder = recorder
+        self.writer = None # transport of the current connection
+        self.connections = 0
+        self.frames = 0
+        self.bytes = 0
+
+class IngestServer:
+    def __init__(self, directory="rigs", host="0.0.0.0", port=DEFAULT_PORT, max_backlog=5000, max_rigs=32):
+        self.directory = directory
+        self.host = host
+        self.port = port
+        self.max_backlog = max_backlog # queued rows per rig before we stop reading
+        self.max_rigs = max_rigs # every rig has its own recorder thread and files
+        self.rigs = {}
+        self.server = None
+        self.started = None
+        self.cpu_started = None
+        self.backpressure_waits = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+        print(f"Ingest listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        for rig in self.rigs.values():
+            if rig.writer:
+                rig.writer.close()
+        # Recorders join their writer threads
+        for rig in self.rigs.values():
+            await asyncio.to_thread(rig.recorder.stop)
+
+    def disconnect(self, name):
+        # Drops the connection of a rig (it will reconnect)
+        rig = self.rigs.get(name)
+        if rig and rig.writer:
+            rig.writer.transport.abort()
+
+    def _rig(self, name):
+        rig = self.rigs.get(name)
+        if rig is None:
+            recorder = DataRecorder(rig_directory(self.directory, name), high_rate=True)
+            recorder.start()
+            rig = self.rigs[name] = RigState(name, recorder)
+        return rig
+
+    async def _handle(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        try:
+            magic, name_length = HELLO.unpack(await reader.readexactly(HELLO.size))
+            name = (await reader.readexactly(name_length)).decode("utf-8", errors="replace")
+            frame_size, = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        if magic != MAGIC or frame_size != FRAME_SIZE:
+            print(f"Rejected {peer}: wrong protocol or shared memory version")
+            writer.close()
+            return
+        if name not in self.rigs and len(self.rigs) >= self.max_rigs:
+            print(f"Rejected {peer}: already {self.max_rigs} rigs")
+            writer.close()
+            return
+
+        rig = self._rig(name)
+        if rig.writer:
+            # A new connection of the same rig replaces a stale one
+            rig.writer.transport.abort()
+        rig.writer = writer
+        rig.connections += 1
+        print(f"Rig '{name}' connected from {peer} (connection {rig.connections})")
+
+        recorder = rig.recorder
+        try:
+            while True:
+                length, = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+                if length != FRAME_SIZE:
+                    # Checked before reading, so a bad length cannot make us buffer it
+                    print(f"Rejected rig '{name}': frame of {length} bytes")
+                    break
+                payload = await reader.readexactly(length)
+                recorder.record_frame(SharedMemory.from_buffer_copy(payload))
+                rig.frames += 1
+                rig.bytes += length + LENGTH.size
+                if recorder.backlog > self.max_backlog:
+                    # Stop reading until the writer thread caught up
+                    self.backpressure_waits += 1
+                    while recorder.backlog > self.max_backlog // 2:
+                        await asyncio.sleep(0.005)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if rig.writer is writer:
+                rig.writer = None
+            writer.close()
+            print(f"Rig '{name}' disconnected")
+
+    def stats(self):
+        wall = time.perf_counter() - self.started if self.started else 0.0
+        cpu = time.process_time() - self.cpu_started if self.cpu_started is not None else 0.0
+        frames = sum(rig.frames for rig in self.rigs.values())
+        return {
+            'rigs': {name: {'frames': rig.frames, 'bytes': rig.bytes, 'connections': rig.connections,
+                            'connected': rig.writer is not None}
+                     for name, rig in self.rigs.items()},
+            'frames': frames,
+            'bytes': sum(rig.bytes for rig in self.rigs.values()),
+            'wall_seconds': round(wall, 3),
+            'frames_per_second': round(frames / wall, 1) if wall else 0.0,
+            # Frames per CPU second of the whole process (socket reads, decoding,
+            # recorder threads); in simulate() the rigs run in the same process,
+            # so the figure is on the low side there
+            'cpu_seconds': round(cpu, 3),
+            'frames_per_core_second': round(frames / cpu, 1) if cpu else 0.0,
+            'backpressure_waits': self.backpressure_waits,
+        }
+
+class RigClient:
+    # Streams the frames of one AMS2Reader (or SyntheticReader) to the service.
+    # With a poller, new frames are sent as the game publishes them; without
+    # one, every read() is sent (simulated rigs).
+    def __init__(self, name, host="127.0.0.1", port=DEFAULT_PORT, reader=None, poller=None,
+                 retry_interval=0.5, max_retry_interval=5.0):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.reader = reader
+        self.poller = poller
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.frames_sent = 0
+        self.connections = 0
+
+    def _hello(self):
+        name = self.name.encode("utf-8")
+        return HELLO.pack(MAGIC, len(name)) + name + LENGTH.pack(FRAME_SIZE)
+
+    async def _next_frame(self):
+        read = getattr(self.reader, "read_consistent", self.reader.read)
+        while True:
+            if self.poller:
+                await asyncio.sleep(max(0.0, self.poller.next_read_time() - self.poller.clock()))
+            data = read()
+            if self.poller is None:
+                if data is not None:
+                    return data
+                await asyncio.sleep(0.1)
+            elif self.poller.observe(data):
+                return data
+
+    async def run(self, max_frames=None, stop=None):
+        # Sends until max_frames were sent or the stop event is set;
+        # reconnects with a growing delay whenever the connection drops
+        delay = self.retry_interval
+        while max_frames is None or self.frames_sent < max_frames:
+            if stop and stop.is_set():
+                return
+            try:
+                _, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError as e:
+                print(f"Error connecting rig '{self.name}': {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2.0, self.max_retry_interval)
+                continue
+            self.connections += 1
+            delay = self.retry_interval
+            try:
+                writer.write(self._hello())
+                while max_frames is None or self.frames_sent < max_frames:
+                    if stop and stop.is_set():
+                        break
+                    data = await self._next_frame()
+                    writer.write(LENGTH.pack(FRAME_SIZE) + bytes(data))
+                    # Blocks while the service applies backpressure; frames
+                    # published meanwhile are skipped, not queued
+                    await writer.drain()
+                    self.frames_sent += 1
+                writer.close()
+                await writer.wait_closed()
+                return
+            except (ConnectionError, OSError) as e:
+                print(f"Rig '{self.name}' lost connection: {e}")
+                writer.close()
+                await asyncio.sleep(delay)
+
+async def simulate(rigs=4, frames=2000, directory="rigs_simulated", max_backlog=5000):
+    # Simulated rigs on localhost; returns the service statistics
+    from ams2_synthetic import SyntheticReader, SyntheticSession
+    server = IngestServer(directory, host="127.0.0.1", port=0, max_backlog=max_backlog)
+    await server.start()
+    clients = []
+    for i in range(rigs):
+        reader = SyntheticReader(SyntheticSession(lap_time=80.0 + i))
+        reader.connect()
+        clients.append(RigClient(f"rig{i + 1}", port=server.port, reader=reader))
+    try:
+        await asyncio.gather(*(client.run(max_frames=frames) for client in clients))
+        # Wait for the service to read what is still in flight
+        deadline = time.perf_counter() + 10.0
+        while server.stats()['frames'] < rigs * frames and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+        return server.stats()
+    finally:
+        await server.stop()
+        for client in clients:
+            client.reader.close()
+
+async def _run_rig(args):
+    from ams2_reader import AMS2Reader
+    from ams2_poller import AdaptivePoller
+    reader = AMS2Reader()
+    while not reader.connect():
+        await asyncio.sleep(2)
+    try:
+        await RigClient(args.name, args.host, args.port, reader, AdaptivePoller()).run()
+    finally:
+        reader.close()
+
+async def _serve(args):
+    server = IngestServer(args.dir, args.host, args.port, max_rigs=args.max_rigs)
+    await server.start()
+    try:
+        while True:
+            await asyncio.sleep(10)
+            stats = server.stats()
+            print(f"{len(stats['rigs'])} rig(s), {stats['frames']} frames, "
+                  f"{stats['frames_per_second']:.0f} frames/s, {stats['frames_per_core_second']:.0f} frames/s per core")
+    finally:
+        await server.stop()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-rig telemetry ingest")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="Run the ingest service")
+    serve.add_argument("--dir", default="rigs")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--max-rigs", type=int, default=32)
+    rig = commands.add_parser("rig", help="Stream this PC's shared memory to the service")
+    rig.add_argument("--name", required=True)
+    rig.add_argument("--host", required=True)
+    rig.add_argument("--port", type=int, default=DEFAULT_PORT)
+    sim = commands.add_parser("simulate", help="Measure ingest throughput with simulated rigs")
+    sim.add_argument("--rigs", type=int, default=4)
+    sim.add_argument("--frames", type=int, default=2000)
+    sim.add_argument("--dir", default="rigs_simulated")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "serve":
+            asyncio.run(_serve(args))
+        elif args.command == "rig":
+            asyncio.run(_run_rig(args))
+        else:
+            stats = asyncio.run(simulate(args.rigs, args.frames, args.dir))
+            print(f"{stats['frames']} frames from {len(stats['rigs'])} rigs in {stats['wall_seconds']:.2f}s: "
+                  f"{stats['frames_per_second']:.0f} frames/s, {stats['frames_per_core_second']:.0f} frames/s per core "
+                  f"({stats['bytes'] / stats['wall_seconds'] / 1024**2:.1f} MB/s)")
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import time
+from ams2_channels import channel_getter, per_tyre, viewed_participant
+
+# Online per-lap aggregation: fed one frame at a time, keeps a handful of
+# numbers per channel (constant memory, no sample history) and emits a compact
+# summary record whenever the viewed car starts a new lap.
+
+def fuel_liters(data):
+    return data.mFuelLevel * data.mFuelCapacity
+
+# (name, spec, scale); see ams2_channels for the spec syntax
+DEFAULT_CHANNELS = [
+    ("Speed_Kmh", "mSpeed", 3.6),
+    ("RPM", "mRpm", 1.0),
+    ("Throttle", "mThrottle", 1.0),
+    ("Brake", "mBrake", 1.0),
+    ("Steering", "mSteering", 1.0),
+    ("Fuel", fuel_liters, 1.0),
+    ("TrackTemp", "mTrackTemperature", 1.0),
+] + per_tyre("TyreTemp", "mTyreTemp") \
+  + per_tyre("TyreWear", "mTyreWear") \
+  + per_tyre("BrakeTemp", "mBrakeTempCelsius")
+
+STAT_NAMES = ["min", "max", "mean", "sum", "twmean", "delta"]
+
+class ChannelStats:
+    __slots__ = ("count", "sum", "min", "max", "first", "last", "weighted_sum", "weighted_time")
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = 0.0
+        self.max = 0.0
+        self.first = 0.0
+        self.last = 0.0
+        self.weighted_sum = 0.0
+        self.weighted_time = 0.0
+
+    def add(self, value, dt):
+        if self.count == 0:
+            self.min = self.max = self.first = value
+        else:
+            if value < self.min:
+                self.min = value
+            elif value > self.max:
+                self.max = value
+            # The previous value held for dt seconds
+            self.weighted_sum += self.last * dt
+            self.weighted_time += dt
+        self.count += 1
+        self.sum += value
+        self.last = value
+
+    def merge(self, other):
+        # Combines two consecutive stretches (e.g. chunks of the same lap)
+        if other.count == 0:
+            return
+        if self.count == 0:
+            for name in self.__slots__:
+                setattr(self, name, getattr(other, name))
+            return
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sum += other.sum
+        self.count += other.count
+        self.weighted_sum += other.weighted_sum
+        self.weighted_time += other.weighted_time
+        self.last = other.last
+
+    def values(self):
+        # min, max, mean, sum, time-weighted mean, delta (last - first)
+        if self.count == 0:
+            return [0.0] * len(STAT_NAMES)
+        mean = self.sum / self.count
+        twmean = self.weighted_sum / self.weighted_time if self.weighted_time > 0 else mean
+        return [self.min, self.max, mean, self.sum, twmean, self.last - self.first]
+
+class LapAggregator:
+    def __init__(self, channels=None):
+        channels = channels or DEFAULT_CHANNELS
+        self.names = [name for name, _, _ in channels]
+        self.getters = [channel_getter(spec, scale) for _, spec, scale in channels]
+        self.fields = ["lap", "complete", "valid", "lap_time", "samples", "duration_s"] + \
+                      [f"{name}_{stat}" for name in self.names for stat in STAT_NAMES]
+        self._start_lap(None, None)
+        self.started_at_lap_start = False
+
+    def _start_lap(self, lap, t):
+        self.lap = lap
+        self.stats = [ChannelStats() for _ in self.names]
+        self.lap_start_time = t
+        self.last_time = t
+        self.samples = 0
+        self.valid = True
+        self.last_lap_clock = 0.0
+
+    def add(self, lap, t, values, invalidated=False, lap_clock=0.0):
+        # Generic entry point: 'values' in channel order, 't' in seconds,
+        # 'lap_clock' the game's current lap time. Returns the summary of the
+        # previous lap when 'lap' starts a new one, else None.
+        summary = None
+        if lap != self.lap:
+            if self.lap is not None and self.samples:
+                summary = self._summary(complete=self.started_at_lap_start and lap > self.lap)
+            # A lap counts as complete only if we saw it from its start
+            self.started_at_lap_start = self.lap is not None
+            self._start_lap(lap, t)
+
+        dt = t - self.last_time if self.samples else 0.0
+        for stats, value in zip(self.stats, values):
+            stats.add(value, dt)
+        self.samples += 1
+        self.last_time = t
+        if invalidated:
+            self.valid = False
+        self.last_lap_clock = lap_clock
+        return summary
+
+    def update(self, data, t=None):
+        # Live entry point for a SharedMemory frame
+        p = viewed_participant(data)
+        if p is None:
+            return None
+        if t is None:
+            t = time.perf_counter()
+        values = [get(data) for get in self.getters]
+        return self.add(p.mCurrentLap, t, values, data.mLapInvalidated, data.mCurrentTime)
+
+    def flush(self):
+        # Summary of the lap in progress (marked incomplete), e.g. at stop
+        if self.lap is None or not self.samples:
+            return None
+        summary = self._summary(complete=False)
+        self._start_lap(None, None)
+        self.started_at_lap_start = False
+        return summary
+
+    def _summary(self, complete):
+        record = {
+            'lap': self.lap,
+            'complete': complete,
+            'valid': self.valid,
+            # Last reading of the game's lap clock before the line: within one
+            # frame of the official lap time
+            'lap_time': round(self.last_lap_clock, 3) if complete else None,
+            'samples': self.samples,
+            'duration_s': round(self.last_time - self.lap_start_time, 3),
+        }
+        for name, stats in zip(self.names, self.stats):
+            for stat, value in zip(STAT_NAMES, stats.values()):
+                record[f"{name}_{stat}"] = round(value, 4)
+        return record
@@ -0,0 +1,187 @@
+import math
+from array import array
+from ams2_channels import channel_getter, viewed_participant
+
+# In-memory buffer of the last N laps for instant overlays ("this lap vs last
+# lap vs best lap") without recording anything to disk.
+#
+# Every lap is stored as fixed distance bins (default every 2 m) per channel
+# in a preallocated array('f'). The slots are allocated once per track and
+# recycled round-robin; the best complete, valid lap is copied into its own
+# slot so it never gets overwritten.
+#
+#   buffer = LapBuffer(laps=5)
+#   buffer.update(data)                       # every frame
+#   speeds = buffer.get(12, "Speed_Kmh")      # lap 12, one value per bin
+#   best = buffer.get(BEST, "Speed_Kmh")
+#   delta = buffer.time_delta(distance)       # current lap vs best, seconds
+
+BEST = "best"
+
+# (name, spec, scale); the lap clock is always stored as channel "Time"
+LAP_BUFFER_CHANNELS = [
+    ("Speed_Kmh", "mSpeed", 3.6),
+    ("Throttle", "mThrottle", 1.0),
+    ("Brake", "mBrake", 1.0),
+    ("Steering", "mSteering", 1.0),
+    ("Gear", "mGear", 1.0),
+    ("RPM", "mRpm", 1.0),
+]
+
+START_WINDOW = 50.0 # metres; a lap first seen later than this is incomplete
+MAX_FILL_GAP = 100.0 # metres; longer jumps (teleports, resets) are not filled
+
+class LapBuffer:
+    def __init__(self, laps=5, channels=None, resolution=2.0):
+        channels = channels or LAP_BUFFER_CHANNELS
+        self.max_laps = laps
+        self.resolution = resolution
+        self.names = ["Time"] + [name for name, _, _ in channels]
+        self.getters = [channel_getter(spec, scale) for _, spec, scale in channels]
+        self.track_length = None
+        self.bins = 0
+        self.slots = []
+        self.best = None
+        self.best_info = None
+        self._reset_laps()
+
+    def allocate(self, track_length):
+        self.track_length = track_length
+        self.bins = int(track_length / self.resolution) + 1
+        self.blank = array('f', [math.nan]) * (self.bins * len(self.names))
+        # One slot for the lap in progress plus max_laps finished ones
+        self.slots = [array('f', self.blank) for _ in range(self.max_laps + 1)]
+        self.best = array('f', self.blank)
+        self.best_info = None
+        self._reset_laps()
+
+    def _reset_laps(self):
+        self.info = [None] * len(self.slots)
+        self.finished = [] # slot indices, oldest first
+        self.current = 0
+        self.lap = None
+        self.last_bin = None
+
+    def clear(self):
+        # Forget all laps including the best, e.g. for a new session
+        if self.best is not None:
+            self.best[:] = self.blank
+        self.best_info = None
+        self._reset_laps()
+
+    def update(self, data):
+        # Live entry point. Returns the info of a lap finished by this frame.
+        p = viewed_participant(data)
+        if p is None or data.mTrackLength <= 0:
+            return None
+        if self.track_length != data.mTrackLength:
+            self.allocate(data.mTrackLength)
+        values = [get(data) for get in self.getters]
+        return self.add(p.mCurrentLap, p.mCurrentLapDistance, values,
+                        data.mLapInvalidated, data.mCurrentTime)
+
+    def add(self, lap, distance, values, invalidated=False, lap_clock=0.0):
+        # Generic entry point; 'values' in channel order without "Time"
+        if not self.slots:
+            raise RuntimeError("LapBuffer has no track length yet, call allocate() first")
+        finished = None
+        if lap != self.lap:
+            if self.lap is not None:
+                finished = self._finish_lap()
+                if lap < self.lap:
+                    self._reset_laps() # session restart
+            self._start_lap(lap, distance)
+
+        if distance < 0 or distance > self.track_length:
+            return finished # behind the line before the start, or noise
+        b = min(int(distance / self.resolution), self.bins - 1)
+        slot = self.slots[self.current]
+        bins = self.bins
+        first = b
+        if self.last_bin is not None and self.last_bin < b - 1 and (b - self.last_bin) * self.resolution <= MAX_FILL_GAP:
+            first = self.last_bin + 1 # fill bins skipped at low frame rates
+        for i in range(first, b + 1):
+            slot[i] = lap_clock
+            for c, value in enumerate(values, 1):
+                slot[c * bins + i] = value
+        self.last_bin = b
+
+        info = self.info[self.current]
+        info['lap_time'] = lap_clock
+        if invalidated:
+            info['valid'] = False
+        return finished
+
+    def _start_lap(self, lap, distance):
+        self.lap = lap
+        self.last_bin = None
+        self.slots[self.current][:] = self.blank
+        self.info[self.current] = {'lap': lap, 'lap_time': 0.0, 'valid': True,
+                                   'complete': 0 <= distance <= START_WINDOW}
+
+    def _finish_lap(self):
+        info = self.info[self.current]
+        self.finished.append(self.current)
+        if info['complete'] and info['valid'] and info['lap_time'] > 0:
+            if self.best_info is None or info['lap_time'] < self.best_info['lap_time']:
+                self.best[:] = self.slots[self.current]
+                self.best_info = dict(info)
+
+        # Next slot: an unused one, otherwise recycle the oldest lap
+        unused = [i for i in range(len(self.slots)) if i not in self.finished]
+        self.current = unused[0] if unused else self.finished.pop(0)
+        return info
+
+    def laps(self):
+        # Finished laps held in the buffer, most recent first
+        return [self.info[i]['lap'] for i in reversed(self.finished)]
+
+    def lap_info(self, lap):
+        if lap == BEST:
+            return self.best_info
+        slot = self._slot(lap)
+        return self.info[slot] if slot is not None else None
+
+    def _slot(self, lap):
+        if lap == self.lap:
+            return self.current
+        for i in self.finished:
+            if self.info[i]['lap'] == lap:
+                return i
+        return None
+
+    def get(self, lap, channel):
+        # One value per distance bin (NaN where the lap has no data) as a
+        # zero-copy view; valid until the slot is recycled. None if the lap is
+        # not in the buffer.
+        if lap == BEST:
+            if self.best_info is None:
+                return None
+            data = self.best
+        else:
+            slot = self._slot(lap)
+            if slot is None:
+                return None
+            data = self.slots[slot]
+        c = self.names.index(channel)
+        return memoryview(data)[c * self.bins:(c + 1) * self.bins]
+
+    def value_at(self, lap, channel, distance):
+        values = self.get(lap, channel)
+        if values is None or not 0 <= distance <= self.track_length:
+            return None
+        value = values[min(int(distance / self.resolution), self.bins - 1)]
+        return None if math.isnan(value) else value
+
+    def time_delta(self, distance, lap=None, reference=BEST):
+        # Seconds the lap (default: the current one) is behind the reference at
+        # 'distance'; negative when it is ahead
+        current = self.value_at(self.lap if lap is None else lap, "Time", distance)
+        ref = self.value_at(reference, "Time", distance)
+        if current is None or ref is None:
+            return None
+        return current - ref
+
+    def distance_axis(self):
+        # Start distance of every bin
+        return [i * self.resolution for i in range(self.bins)]
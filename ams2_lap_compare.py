@@ -0,0 +1,202 @@
+import math
+import operator
+import os
+from array import array
+from collections import OrderedDict
+from ams2_lap_buffer import BEST, MAX_FILL_GAP
+from ams2_recorder import iter_lap_columns, load_metadata
+
+# Lap comparison: where is time lost?
+#
+# Both laps are put on the same lap distance grid (LapTrace, one value per
+# bin and channel, like LapBuffer), then one pass over the arrays gives the
+# cumulative delta, the channel differences and per segment the time lost
+# and the average speed/throttle/brake/gear difference:
+#
+#   comparator = LapComparator(segments=track_map.segments)
+#   comparator.add_from_buffer("live", lap_buffer, 12)
+#   comparator.add_from_buffer("best", lap_buffer, BEST)
+#   result = comparator.compare("live", "best")
+#   worst = max(result['segments'], key=lambda s: s['time_loss'])
+#
+# Results are cached by (lap id, reference id) in a small LRU cache; adding a
+# lap again under the same id invalidates its entries.
+
+COMPARE_CHANNELS = ["Speed_Kmh", "Throttle", "Brake", "Gear"]
+DEFAULT_SEGMENT_LENGTH = 200.0 # metres, without a track map
+NAN = float('nan')
+
+class LapTrace:
+    # One lap on a fixed distance grid: channel -> array('f'), "Time" is the lap clock
+    def __init__(self, bins, resolution=2.0, names=None):
+        self.bins = bins
+        self.resolution = resolution
+        self.names = ["Time"] + list(names or COMPARE_CHANNELS)
+        blank = array('f', [NAN]) * bins
+        self.channels = {name: array('f', blank) for name in self.names}
+        self.last_bin = None
+
+    @classmethod
+    def from_lap_buffer(cls, buffer, lap):
+        # Copy of a lap of a LapBuffer (its views are recycled with the slot)
+        if buffer.get(lap, "Time") is None:
+            return None
+        names = [n for n in buffer.names if n != "Time"]
+        trace = cls(buffer.bins, buffer.resolution, names)
+        for name in trace.names:
+            trace.channels[name] = array('f', buffer.get(lap, name))
+        return trace
+
+    def add_samples(self, distances, columns):
+        # Samples in driving order; columns: {name: values} incl. "Time".
+        # Bins skipped between two samples get the later sample's values.
+        arrays = [(self.channels[name], values) for name, values in columns.items() if name in self.channels]
+        last = self.last_bin
+        limit = int(MAX_FILL_GAP / self.resolution)
+        for i, distance in enumerate(distances):
+            if distance < 0:
+                continue
+            b = min(int(distance / self.resolution), self.bins - 1)
+            first = last + 1 if last is not None and last < b - 1 and b - last <= limit else b
+            for target, values in arrays:
+                value = values[i]
+                for j in range(first, b + 1):
+                    target[j] = value
+            last = b
+        self.last_bin = last
+
+    def lap_time(self):
+        times = self.channels["Time"]
+        for value in reversed(times):
+            if not math.isnan(value):
+                return value
+        return None
+
+def load_laps(filename, resolution=2.0, track_length=None):
+    # {lap: LapTrace} of a recording
+    track_length = track_length or load_metadata(filename).get('track_length')
+    columns = ["Lap", "LapDistance", "CurrentLapTime"] + COMPARE_CHANNELS
+    laps = {}
+    for lap, chunk in iter_lap_columns(filename, columns):
+        if "LapDistance" not in chunk:
+            break # recorded before lap distance was added
+        if not track_length:
+            track_length = max(chunk["LapDistance"]) or 1.0
+        trace = laps.get(lap)
+        if trace is None:
+            trace = laps[lap] = LapTrace(int(track_length / resolution) + 1, resolution)
+        values = {name: chunk[name] for name in COMPARE_CHANNELS if name in chunk}
+        values["Time"] = chunk["CurrentLapTime"]
+        trace.add_samples(chunk["LapDistance"], values)
+    return laps
+
+def fixed_segments(track_length, length=DEFAULT_SEGMENT_LENGTH):
+    # Same layout as TrackMap.segments, for tracks without a map
+    segments = []
+    start = 0.0
+    while start < track_length:
+        segments.append({'start': start, 'end': min(start + length, track_length), 'corner': None})
+        start += length
+    return segments
+
+def _finite_mean(values):
+    finite = [v for v in values if v == v]
+    return sum(finite) / len(finite) if finite else None
+
+def _value_near(values, b, lo, hi):
+    # First non-NaN value from bin b towards the inside of [lo, hi)
+    step = 1 if b <= lo else -1
+    while lo <= b < hi:
+        if values[b] == values[b]:
+            return values[b]
+        b += step
+    return None
+
+def compare(lap, reference, segments=None):
+    # Lap vs reference on their shared grid; differences are lap - reference
+    if lap.bins != reference.bins or lap.resolution != reference.resolution:
+        raise ValueError("Laps are on different distance grids")
+    bins = lap.bins
+    names = [n for n in lap.names if n in reference.names]
+    diff = {name: array('f', map(operator.sub, lap.channels[name], reference.channels[name])) for name in names}
+    delta = diff.pop("Time")
+
+    if segments is None:
+        segments = fixed_segments((bins - 1) * lap.resolution)
+    rows = []
+    for i, segment in enumerate(segments):
+        lo = min(int(segment['start'] / lap.resolution), bins - 1)
+        hi = max(lo + 1, min(int(segment['end'] / lap.resolution), bins))
+        # From the end of the previous segment, so the losses add up to the total
+        start_delta = _value_near(delta, lo - 1, 0, lo) if lo else 0.0
+        end_delta = _value_near(delta, hi - 1, lo, hi)
+        row = {
+            'index': i,
+            'start': segment['start'],
+            'end': segment['end'],
+            'corner': segment.get('corner'),
+            'time_loss': end_delta - start_delta if None not in (start_delta, end_delta) else None,
+        }
+        for name, values in diff.items():
+            row[name] = _finite_mean(values[lo:hi])
+        rows.append(row)
+
+    return {
+        'resolution': lap.resolution,
+        'delta': delta,
+        'diff': diff,
+        'segments': rows,
+        'total': _value_near(delta, bins - 1, 0, bins),
+    }
+
+def biggest_losses(result, count=3):
+    # Segments with the most time lost, worst first
+    segments = [s for s in result['segments'] if s['time_loss'] is not None and s['time_loss'] > 0]
+    return sorted(segments, key=lambda s: s['time_loss'], reverse=True)[:count]
+
+class LapComparator:
+    def __init__(self, segments=None, cache_size=32):
+        self.segments = segments
+        self.cache_size = cache_size
+        self.laps = {} # lap id -> LapTrace
+        self.cache = OrderedDict() # (lap id, reference id) -> comparison
+
+    def add(self, lap_id, trace):
+        self.laps[lap_id] = trace
+        for key in [k for k in self.cache if lap_id in k]:
+            del self.cache[key]
+
+    def add_from_buffer(self, lap_id, buffer, lap=BEST):
+        trace = LapTrace.from_lap_buffer(buffer, lap)
+        if trace is not None:
+            self.add(lap_id, trace)
+        return trace
+
+    def add_recording(self, filename, resolution=2.0):
+        # Adds every lap of a recording as (basename, lap); returns the ids
+        base = os.path.basename(filename)
+        ids = []
+        for lap, trace in load_laps(filename, resolution).items():
+            self.add((base, lap), trace)
+            ids.append((base, lap))
+        return ids
+
+    def set_segments(self, segments):
+        self.segments = segments
+        self.cache.clear()
+
+    def compare(self, lap_id, reference_id):
+        key = (lap_id, reference_id)
+        result = self.cache.get(key)
+        if result is not None:
+            self.cache.move_to_end(key)
+            return result
+        segments = self.segments
+        if segments is None:
+            lap = self.laps[lap_id]
+            segments = fixed_segments((lap.bins - 1) * lap.resolution)
+        result = compare(self.laps[lap_id], self.laps[reference_id], segments)
+        self.cache[key] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return result
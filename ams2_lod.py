@@ -0,0 +1,323 @@
+import argparse
+import bisect
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+# Level-of-detail pyramid for plotting long recordings.
+#
+# Next to telemetry_X.csv a telemetry_X.lod file stores selected channels at
+# several resolutions: every sample (1x) and min/max/mean over buckets of 16
+# and 256 samples. A plot of a whole endurance stint then reads a few thousand
+# buckets instead of millions of CSV rows:
+#
+#   with LodFile("data/telemetry_X.lod") as lod:
+#       series = lod.query("Speed_Kmh", t_start=0, t_end=3600, pixels=1200)
+#
+# The file is built while recording (DataRecorder(lod=True)) or afterwards:
+#
+#   python ams2_lod.py data/telemetry_X.csv
+#
+# Layout: magic, header length, JSON header, then little-endian arrays aligned
+# to 8 bytes. Times are float64 seconds since the first sample, values float32.
+
+LOD_MAGIC = b"AMS2LOD1"
+LOD_FACTORS = (1, 16, 256)
+LOD_CHANNELS = [
+    "Speed_Kmh", "RPM", "Gear", "Throttle", "Brake", "Steering",
+    "TyreTemp_FL", "TyreTemp_FR", "TyreTemp_RL", "TyreTemp_RR",
+    "BrakeTemp_FL", "BrakeTemp_FR", "BrakeTemp_RL", "BrakeTemp_RR",
+    "TyreWear_FL", "TyreWear_FR", "TyreWear_RL", "TyreWear_RR",
+    "RideHeight_FL", "RideHeight_FR", "RideHeight_RL", "RideHeight_RR",
+]
+SPILL_SAMPLES = 4096 # full-resolution samples buffered before going to disk
+
+def lod_path(filename):
+    return os.path.splitext(filename)[0] + ".lod"
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+class _Level:
+    # Buckets of one coarse level, built from the buckets of the level below
+    def __init__(self, factor, ratio, channels):
+        self.factor = factor
+        self.ratio = ratio # buckets of the finer level per bucket here
+        self.times = array('d')
+        self.mins = [array('f') for _ in channels]
+        self.maxs = [array('f') for _ in channels]
+        self.means = [array('f') for _ in channels]
+        self._reset(len(channels))
+
+    def _reset(self, n):
+        self.count = 0
+        self.samples = 0
+        self.start = 0.0
+        self.lo = [0.0] * n
+        self.hi = [0.0] * n
+        self.sums = [0.0] * n
+
+    def add(self, t, lo, hi, sums, samples):
+        # Adds one bucket of the finer level (a single sample at 1x). Returns
+        # True when this level completed a bucket.
+        if self.count == 0:
+            self.start = t
+            self.lo = list(lo)
+            self.hi = list(hi)
+            self.sums = list(sums)
+        else:
+            for i in range(len(lo)):
+                if lo[i] < self.lo[i]:
+                    self.lo[i] = lo[i]
+                if hi[i] > self.hi[i]:
+                    self.hi[i] = hi[i]
+                self.sums[i] += sums[i]
+        self.count += 1
+        self.samples += samples
+        if self.count == self.ratio:
+            self.emit()
+            return True
+        return False
+
+    def emit(self):
+        if self.count == 0:
+            return
+        self.times.append(self.start)
+        for i in range(len(self.lo)):
+            self.mins[i].append(self.lo[i])
+            self.maxs[i].append(self.hi[i])
+            self.means[i].append(self.sums[i] / self.samples)
+        self._reset(len(self.lo))
+
+class LodBuilder:
+    # Fed one sample at a time. Full-resolution samples are spilled to temp
+    # files, only the coarse levels stay in memory.
+    def __init__(self, path, channels=None, factors=LOD_FACTORS):
+        if factors[0] != 1 or list(factors) != sorted(factors):
+            raise ValueError("LOD factors must start at 1 and increase")
+        self.path = path
+        self.channels = list(channels or LOD_CHANNELS)
+        self.factors = list(factors)
+        self.levels = [_Level(f, f // prev, self.channels) for prev, f in zip(factors, factors[1:])]
+        self.t0 = None
+        self.count = 0
+
+        directory = os.path.dirname(path) or "."
+        self.spill = [tempfile.TemporaryFile(dir=directory) for _ in range(len(self.channels) + 1)]
+        self.buffers = [array('d')] + [array('f') for _ in self.channels]
+
+    def add(self, t, values):
+        # t in seconds (any origin), values in channel order
+        if self.t0 is None:
+            self.t0 = t
+        t -= self.t0
+        self.buffers[0].append(t)
+        for buf, value in zip(self.buffers[1:], values):
+            buf.append(value)
+        self.count += 1
+        if len(self.buffers[0]) >= SPILL_SAMPLES:
+            self._spill()
+
+        self._propagate(0, t, values, values, values, 1)
+
+    def _propagate(self, k, t, lo, hi, sums, samples):
+        # A completed bucket feeds the next coarser level
+        for level in self.levels[k:]:
+            if not level.add(t, lo, hi, sums, samples):
+                return
+            i = len(level.times) - 1
+            t = level.times[i]
+            lo = [m[i] for m in level.mins]
+            hi = [m[i] for m in level.maxs]
+            samples = level.factor
+            sums = [m[i] * samples for m in level.means]
+
+    def _spill(self):
+        for f, buf in zip(self.spill, self.buffers):
+            buf.tofile(f)
+            del buf[:]
+
+    def close(self):
+        # Writes the .lod file (via a temp file, so readers never see half of it)
+        self._spill()
+        # Partial buckets at the end, finest level first so they propagate
+        for k, level in enumerate(self.levels):
+            if level.count:
+                samples = level.samples
+                level.emit()
+                i = len(level.times) - 1
+                self._propagate(k + 1, level.times[i], [m[i] for m in level.mins],
+                                [m[i] for m in level.maxs], [m[i] * samples for m in level.means], samples)
+
+        header = {
+            'channels': self.channels,
+            't0': self.t0 or 0.0,
+            'levels': [],
+        }
+        # Offsets are relative to the start of the data section
+        offset = 0
+        layout = []
+        sizes = [self.count] + [len(level.times) for level in self.levels]
+        for factor, n in zip(self.factors, sizes):
+            entry = {'factor': factor, 'count': n, 'time': offset, 'channels': {}}
+            offset = _align(offset + 8 * n)
+            stats = ("mean",) if factor == 1 else ("min", "max", "mean")
+            for name in self.channels:
+                entry['channels'][name] = {}
+                for stat in stats:
+                    entry['channels'][name][stat] = offset
+                    offset = _align(offset + 4 * n)
+            layout.append(entry)
+        header['levels'] = layout
+
+        raw_header = json.dumps(header).encode('utf-8')
+        data_start = _align(len(LOD_MAGIC) + 4 + len(raw_header))
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'wb') as out:
+            out.write(LOD_MAGIC)
+            out.write(struct.pack("<I", len(raw_header)))
+            out.write(raw_header)
+
+            def write_at(relative, data):
+                out.seek(data_start + relative)
+                out.write(data)
+
+            # Full resolution from the spill files, in chunks
+            entry = layout[0]
+            targets = [entry['time']] + [entry['channels'][name]['mean'] for name in self.channels]
+            for f, target in zip(self.spill, targets):
+                f.seek(0)
+                out.seek(data_start + target)
+                while True:
+                    chunk = f.read(1 << 20)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                f.close()
+
+            for entry, level in zip(layout[1:], self.levels):
+                write_at(entry['time'], level.times.tobytes())
+                for i, name in enumerate(self.channels):
+                    write_at(entry['channels'][name]['min'], level.mins[i].tobytes())
+                    write_at(entry['channels'][name]['max'], level.maxs[i].tobytes())
+                    write_at(entry['channels'][name]['mean'], level.means[i].tobytes())
+            out.truncate(data_start + offset)
+        os.replace(tmp_path, self.path)
+        return self.path
+
+class LodFile:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(LOD_MAGIC)] != LOD_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a LOD file")
+        (length,) = struct.unpack_from("<I", self.map, len(LOD_MAGIC))
+        start = len(LOD_MAGIC) + 4
+        self.header = json.loads(self.map[start:start + length].decode('utf-8'))
+        self.data_start = _align(start + length)
+        self.channels = self.header['channels']
+        self.levels = self.header['levels']
+        self.t0 = self.header['t0']
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def _array(self, relative, count, typecode):
+        # Copy of one stored array; the mmap is only touched for these bytes
+        start = self.data_start + relative
+        values = array(typecode)
+        values.frombytes(self.map[start:start + count * array(typecode).itemsize])
+        return values
+
+    def _time_range(self, level, t_start, t_end):
+        # Index range of the buckets overlapping [t_start, t_end]
+        count = level['count']
+        start = self.data_start + level['time']
+        with memoryview(self.map) as raw, raw[start:start + 8 * count] as view, view.cast('d') as times:
+            lo = 0 if t_start is None else max(bisect.bisect_right(times, t_start) - 1, 0)
+            hi = count if t_end is None else bisect.bisect_right(times, t_end)
+        return lo, hi
+
+    def choose_level(self, t_start=None, t_end=None, pixels=1000):
+        # Coarsest level that still has at least one bucket per pixel
+        for level in reversed(self.levels):
+            lo, hi = self._time_range(level, t_start, t_end)
+            if hi - lo >= pixels:
+                return level
+        return self.levels[0]
+
+    def query(self, channel, t_start=None, t_end=None, pixels=1000):
+        # Returns {'factor', 'time', 'min', 'max', 'mean'} for the time range
+        # (seconds since the first sample) at the right level for 'pixels'
+        if channel not in self.channels:
+            raise KeyError(f"Channel '{channel}' not in {self.path}")
+        level = self.choose_level(t_start, t_end, pixels)
+        lo, hi = self._time_range(level, t_start, t_end)
+        n = hi - lo
+        result = {'factor': level['factor'],
+                  'time': self._array(level['time'] + 8 * lo, n, 'd')}
+        offsets = level['channels'][channel]
+        for stat in ("min", "max", "mean"):
+            if stat in offsets:
+                result[stat] = self._array(offsets[stat] + 4 * lo, n, 'f')
+        # At full resolution min, max and mean are the sample itself
+        result.setdefault('min', result['mean'])
+        result.setdefault('max', result['mean'])
+        return result
+
+def _time_parser(header):
+    # Seconds from the recording's time column
+    if "TimestampNs" in header:
+        return header.index("TimestampNs"), 1e-9
+    return header.index("Timestamp"), 1.0
+
+def build_lod(filename, channels=None, output=None):
+    # Builds the pyramid for an existing CSV recording in one streaming pass
+    output = output or lod_path(filename)
+    with open(filename, 'r', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            raise ValueError(f"{filename} is empty")
+        channels = [c for c in (channels or LOD_CHANNELS) if c in header]
+        indices = [header.index(c) for c in channels]
+        time_idx, time_scale = _time_parser(header)
+        builder = LodBuilder(output, channels)
+        for row in reader:
+            if len(row) != len(header):
+                continue
+            try:
+                builder.add(float(row[time_idx]) * time_scale, [float(row[i]) for i in indices])
+            except ValueError:
+                continue
+    return builder.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build level-of-detail files for AMS2 recordings")
+    parser.add_argument("files", nargs="+", help="CSV recordings")
+    args = parser.parse_args(argv)
+    for filename in args.files:
+        try:
+            print(f"Built {build_lod(filename)}")
+        except Exception as e:
+            print(f"Failed to build LOD for {filename}: {e}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
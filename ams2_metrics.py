@@ -0,0 +1,167 @@
+import json
+import time
+from ams2_reader import SEQUENCE_STEP
+
+# Loop health metrics: per-stage latency histograms and frame counters.
+#
+# Usage in a loop:
+#   t = time.perf_counter_ns()
+#   data = reader.read()
+#   t = metrics.lap("read", t)
+#   ...
+#   t = metrics.lap("render", t)
+#
+# Recording a sample is an index computation and two additions, so it can stay
+# enabled all the time.
+
+SUB_BUCKET_BITS = 3
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+LINEAR_LIMIT = SUB_BUCKETS * 2 # values below this get their own bucket
+BUCKET_COUNT = 320 # covers up to ~2^40 ns (about 18 minutes)
+
+class LatencyHistogram:
+    # Log-linear histogram (HDR style) over nanoseconds. Each power of two is
+    # split into 8 sub-buckets, so reported percentiles are within 12.5%.
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @staticmethod
+    def bucket_index(ns):
+        if ns < LINEAR_LIMIT:
+            return ns if ns > 0 else 0
+        shift = ns.bit_length() - (SUB_BUCKET_BITS + 1)
+        index = shift * SUB_BUCKETS + (ns >> shift)
+        return index if index < BUCKET_COUNT else BUCKET_COUNT - 1
+
+    @staticmethod
+    def bucket_upper_bound(index):
+        if index < LINEAR_LIMIT:
+            return index
+        shift = index // SUB_BUCKETS - 1
+        mantissa = index % SUB_BUCKETS + SUB_BUCKETS
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, ns):
+        self.counts[self.bucket_index(ns)] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, p):
+        if self.count == 0:
+            return 0
+        rank = max(1, int(round(self.count * p / 100.0)))
+        seen = 0
+        for index, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                # Never report more than the largest value actually seen
+                return min(self.bucket_upper_bound(index), self.max)
+        return self.max
+
+    def merge(self, other):
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def summary(self):
+        # Values in microseconds
+        return {
+            'count': self.count,
+            'mean_us': (self.total / self.count / 1000.0) if self.count else 0.0,
+            'p50_us': self.percentile(50) / 1000.0,
+            'p95_us': self.percentile(95) / 1000.0,
+            'p99_us': self.percentile(99) / 1000.0,
+            'max_us': self.max / 1000.0,
+        }
+
+class LoopMetrics:
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {
+            'frames_read': 0,       # reads that returned data
+            'frames_new': 0,        # reads that saw a new mSequenceNumber
+            'frames_duplicate': 0,  # same frame read again
+            'frames_skipped': 0,    # published frames we never saw
+            'frames_torn': 0,       # read while the game was writing (odd sequence)
+        }
+        self.gauges = {'recorder_backlog': 0}
+        self.last_sequence = None
+        self.started = time.time()
+
+    def record(self, stage, ns):
+        hist = self.histograms.get(stage)
+        if hist is None:
+            hist = self.histograms[stage] = LatencyHistogram()
+        hist.record(ns)
+
+    def lap(self, stage, since_ns):
+        # Records the time since 'since_ns' for a stage and returns "now",
+        # so consecutive stages can be chained without extra clock reads.
+        now = time.perf_counter_ns()
+        self.record(stage, now - since_ns)
+        return now
+
+    def observe_frame(self, data):
+        self.counters['frames_read'] += 1
+        seq = data.mSequenceNumber
+        if seq & 1:
+            self.counters['frames_torn'] += 1
+        last = self.last_sequence
+        if last is None or seq < last:
+            # First frame or the game restarted its counter
+            self.last_sequence = seq
+            self.counters['frames_new'] += 1
+            return
+        delta = seq - last
+        if delta == 0:
+            self.counters['frames_duplicate'] += 1
+            return
+        self.last_sequence = seq
+        self.counters['frames_new'] += 1
+        published = (delta + SEQUENCE_STEP - 1) // SEQUENCE_STEP
+        if published > 1:
+            self.counters['frames_skipped'] += published - 1
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def summary(self):
+        return {
+            'uptime_s': time.time() - self.started,
+            'stages': {name: h.summary() for name, h in self.histograms.items()},
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
+        }
+
+    def format_lines(self):
+        s = self.summary()
+        lines = [
+            f"{'Stage':<10} | {'count':>8} | {'p50 us':>9} | {'p95 us':>9} | {'p99 us':>9} | {'max us':>9}",
+            "-" * 68,
+        ]
+        for name, st in s['stages'].items():
+            lines.append(f"{name:<10} | {st['count']:>8} | {st['p50_us']:9.1f} | {st['p95_us']:9.1f} | {st['p99_us']:9.1f} | {st['max_us']:9.1f}")
+        lines.append("")
+        for name, value in s['counters'].items():
+            lines.append(f"{name:<18} {value}")
+        for name, value in s['gauges'].items():
+            lines.append(f"{name:<18} {value}")
+        return lines
+
+    def dump(self, filename=None):
+        if filename is None:
+            filename = time.strftime("metrics_%Y%m%d_%H%M%S.json")
+        try:
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(self.summary(), f, indent=2)
+            return filename
+        except Exception as e:
+            print(f"Error dumping metrics: {e}")
+            return None
@@ -0,0 +1,139 @@
+import time
+from ams2_reader import SEQUENCE_STEP
+from ams2_structs import GAME_INGAME_PLAYING, GAME_INGAME_INMENU_TIME_TICKING
+
+# Adaptive polling of the shared memory.
+#
+# The game publishes a new frame at its own rate. Instead of a fixed sleep we
+# estimate that rate from mSequenceNumber changes and schedule the next read
+# just after the next update is expected. Sleeping is coarse (on Windows often
+# 1-15 ms), so the last stretch before the target can be spent spinning, but
+# only as long as spinning stays within a CPU budget. In menus, in pause or when
+# the sequence stops moving we back off to slow polling.
+#
+#   poller = AdaptivePoller()
+#   while True:
+#       poller.wait()
+#       data = reader.read()
+#       if poller.observe(data):
+#           ... new frame ...
+
+ACTIVE_GAME_STATES = (GAME_INGAME_PLAYING, GAME_INGAME_INMENU_TIME_TICKING)
+
+class AdaptivePoller:
+    def __init__(self, min_interval=0.001, max_interval=0.1, idle_interval=0.5,
+                 read_margin=0.0005, spin_window=0.002, cpu_budget=0.05,
+                 clock=time.perf_counter, sleep=time.sleep):
+        self.min_interval = min_interval     # never read more often than this
+        self.max_interval = max_interval     # polling interval until a rate is known
+        self.idle_interval = idle_interval   # longest back-off interval
+        self.read_margin = read_margin       # read this long after the expected update
+        self.spin_window = spin_window       # spin instead of sleeping for the last part
+        self.cpu_budget = cpu_budget         # max fraction of wall time spent spinning
+        self.clock = clock
+        self.sleep = sleep
+
+        self.publish_interval = None # EWMA of seconds between published frames
+        self.smoothing = 0.1
+        self.last_sequence = None
+        self.last_change = None # clock() when a new frame was last seen
+        self.last_read = None
+        self.backoff = 0.0 # current back-off interval, 0 while active
+
+        # CPU budget accounting over a rolling one second window
+        self.spin_time = 0.0
+        self.budget_window_start = clock()
+
+    def publish_rate(self):
+        if not self.publish_interval:
+            return 0.0
+        return 1.0 / self.publish_interval
+
+    def observe(self, data):
+        # Call after every read. Returns True if 'data' is a frame we have not
+        # seen before, False for duplicates, torn reads and no data.
+        now = self.clock()
+        self.last_read = now
+        if data is None:
+            self._back_off()
+            return False
+
+        seq = data.mSequenceNumber
+        if seq & 1:
+            # The game was writing while we copied; re-read soon
+            return False
+
+        is_new = seq != self.last_sequence
+        if is_new:
+            if self.last_sequence is not None and seq > self.last_sequence and self.last_change is not None:
+                frames = max(1, (seq - self.last_sequence) // SEQUENCE_STEP)
+                interval = (now - self.last_change) / frames
+                interval = min(max(interval, self.min_interval), self.idle_interval)
+                if self.publish_interval is None:
+                    self.publish_interval = interval
+                else:
+                    self.publish_interval += self.smoothing * (interval - self.publish_interval)
+            self.last_sequence = seq
+            self.last_change = now
+
+        if data.mGameState not in ACTIVE_GAME_STATES or self._stalled(now):
+            self._back_off()
+        else:
+            self.backoff = 0.0
+        return is_new
+
+    def _stalled(self, now):
+        if self.last_change is None:
+            return False
+        expected = self.publish_interval or self.max_interval
+        return now - self.last_change > max(10.0 * expected, 0.25)
+
+    def _back_off(self):
+        if self.backoff == 0.0:
+            self.backoff = self.max_interval
+        else:
+            self.backoff = min(self.backoff * 2.0, self.idle_interval)
+
+    def next_read_time(self):
+        # Absolute clock() time of the next read
+        if self.last_read is None:
+            return self.clock()
+        if self.backoff:
+            return self.last_read + self.backoff
+        if self.publish_interval is None or self.last_change is None:
+            return self.last_read + min(self.max_interval, 0.01)
+
+        target = self.last_change + self.publish_interval + self.read_margin
+        earliest = self.last_read + self.min_interval
+        if target < earliest:
+            # We are late for the expected update: catch up at the minimum interval
+            target = earliest
+        return target
+
+    def _can_spin(self, now):
+        elapsed = now - self.budget_window_start
+        if elapsed >= 1.0:
+            self.spin_time = 0.0
+            self.budget_window_start = now
+            return True
+        return self.spin_time < self.cpu_budget * max(elapsed, self.spin_window)
+
+    def wait(self):
+        target = self.next_read_time()
+        now = self.clock()
+        remaining = target - now
+        if remaining <= 0:
+            return
+
+        if self.backoff or not self._can_spin(now):
+            self.sleep(remaining)
+            return
+
+        if remaining > self.spin_window:
+            self.sleep(remaining - self.spin_window)
+
+        spin_start = self.clock()
+        now = spin_start
+        while now < target:
+            now = self.clock()
+        self.spin_time += now - spin_start
@@ -1,9 +1,12 @@
 import mmap
 import ctypes
+import struct
 import time
 from ams2_structs import SharedMemory
 
 SHARED_MEMORY_NAME = "$pcars2$"
+SEQUENCE_STEP = 2 # mSequenceNumber is incremented at start and end of each write
+SEQUENCE_OFFSET = SharedMemory.mSequenceNumber.offset
 
 class AMS2Reader:
     def __init__(self):
@@ -30,6 +33,26 @@ class AMS2Reader:
         # Create a copy of the data from the shared memory buffer
         return SharedMemory.from_buffer_copy(self.mm)
 
+    def read_sequence(self):
+        # Reads only mSequenceNumber, without copying the whole structure
+        if not self.mm:
+            return None
+        return struct.unpack_from("<I", self.mm, SEQUENCE_OFFSET)[0]
+
+    def read_consistent(self, max_retries=3):
+        # Like read(), but only returns a copy the game was not writing to
+        # while we copied it: the sequence number must be even and unchanged.
+        if not self.mm:
+            return None
+        data = None
+        for _ in range(max_retries + 1):
+            before = self.read_sequence()
+            data = SharedMemory.from_buffer_copy(self.mm)
+            if not (before & 1) and data.mSequenceNumber == before:
+                return data
+        # Give up and hand out the last copy; callers can check the odd sequence
+        return data
+
     def close(self):
         if self.mm:
             self.mm.close()
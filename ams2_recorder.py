@@ -1,10 +1,214 @@
 import csv
+import glob
+import json
+import queue
+import threading
 import time
 import os
 from datetime import datetime
+from ams2_lod import LOD_CHANNELS, LodBuilder, lod_path
+from ams2_blocks import DEFAULT_SYNC_BYTES, DEFAULT_SYNC_INTERVAL, BlockWriter
+from ams2_channels import Channel
+from ams2_schema import compile_schema, schema_columns, schema_units
+
+def metadata_path(filename):
+    # Session metadata lives next to the recording: telemetry_X.csv -> telemetry_X.json
+    return os.path.splitext(filename)[0] + ".json"
+
+def load_metadata(filename):
+    path = metadata_path(filename)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error loading metadata {path}: {e}")
+        return {}
+
+def recording_base(filename):
+    # telemetry_X.csv, telemetry_X.json, ... all share the base telemetry_X
+    return os.path.basename(filename).split(".", 1)[0]
+
+def list_recordings(directory):
+    # Recording CSVs in a directory, without sidecars like telemetry_X.laps.csv
+    paths = glob.glob(os.path.join(directory, "telemetry_*.csv"))
+    return sorted(p for p in paths if os.path.basename(p).count(".") == 1)
+
+def decode_string(raw):
+    return raw.decode('utf-8', errors='ignore').strip()
+
+# Column types of the CSV recordings; everything not listed is a float
+INT_COLUMNS = {"TimestampNs", "FrameIdentifier", "SessionState", "GameState", "Gear", "Lap"}
+BOOL_COLUMNS = {"LapInvalidated"}
+
+def _parse_bool(value):
+    return value in ("True", "true", "1")
+
+def _parse_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return float('nan')
+
+def _parse_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return 0
+
+def column_parser(name):
+    if name in INT_COLUMNS:
+        return _parse_int
+    if name in BOOL_COLUMNS:
+        return _parse_bool
+    return _parse_float
+
+def iter_lap_columns(filename, columns=None, max_rows=100000):
+    # Streams a CSV recording lap by lap. Yields (lap, {column: [values]}) with
+    # typed values; only the requested columns are parsed. Recordings without a
+    # Lap column are split where CurrentLapTime jumps back. A lap longer than
+    # max_rows is yielded in several chunks with the same lap number.
+    with open(filename, 'r', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            return
+        names = [c for c in (columns or header) if c in header]
+        indices = [header.index(c) for c in names]
+        parsers = [column_parser(c) for c in names]
+        lap_idx = header.index("Lap") if "Lap" in header else None
+        lap_time_idx = header.index("CurrentLapTime") if "CurrentLapTime" in header else None
+
+        lap = None
+        last_lap_time = None
+        chunk = {c: [] for c in names}
+        rows = 0
+        for row in reader:
+            if len(row) != len(header):
+                continue # partial row, e.g. from an interrupted recording
+            if lap_idx is not None:
+                row_lap = _parse_int(row[lap_idx])
+            else:
+                lap_time = _parse_float(row[lap_time_idx]) if lap_time_idx is not None else 0.0
+                row_lap = lap if lap is not None else 0
+                if last_lap_time is not None and lap_time < last_lap_time - 1.0:
+                    row_lap += 1
+                last_lap_time = lap_time
+
+            if lap is not None and (row_lap != lap or rows >= max_rows) and rows:
+                yield lap, chunk
+                chunk = {c: [] for c in names}
+                rows = 0
+            lap = row_lap
+            for c, i, parse in zip(names, indices, parsers):
+                chunk[c].append(parse(row[i]))
+            rows += 1
+        if rows:
+            yield lap, chunk
+
+class RecordingSummary:
+    # Running summary of a recording (laps, best lap, weather), fed row by row
+    # so it costs nothing extra when the file is closed.
+    def __init__(self):
+        self.frames = 0
+        self.first_lap = None
+        self.current_lap = None
+        self.laps_completed = 0
+        self.best_lap = None
+        self.last_lap_time = 0.0
+        self.track_temp_sum = 0.0
+        self.ambient_temp_sum = 0.0
+        self.rain_max = 0.0
+
+    def add(self, lap, last_lap_time, track_temp, ambient_temp, rain):
+        self.frames += 1
+        if self.current_lap is None:
+            self.first_lap = lap
+        elif lap != self.current_lap:
+            if lap > self.current_lap:
+                self.laps_completed += 1
+            self._consider_lap_time()
+        self.current_lap = lap
+        self.last_lap_time = last_lap_time
+        self.track_temp_sum += track_temp
+        self.ambient_temp_sum += ambient_temp
+        if rain > self.rain_max:
+            self.rain_max = rain
+
+    def _consider_lap_time(self):
+        # mLastLapTime at the end of a lap is the settled time of the lap before
+        # it. Skipped for the first lap, which may have started before recording.
+        if self.current_lap == self.first_lap or self.last_lap_time <= 0:
+            return
+        if self.best_lap is None or self.last_lap_time < self.best_lap:
+            self.best_lap = self.last_lap_time
+
+    def to_dict(self):
+        if self.current_lap is not None:
+            self._consider_lap_time()
+        n = self.frames or 1
+        return {
+            'frames': self.frames,
+            'laps': self.laps_completed,
+            'best_lap': self.best_lap,
+            'track_temp_avg': round(self.track_temp_sum / n, 1),
+            'ambient_temp_avg': round(self.ambient_temp_sum / n, 1),
+            'rain_max': round(self.rain_max, 2),
+        }
+
+# Default recording schema (see ams2_schema); the first column is always the
+# timestamp (Timestamp, or TimestampNs in high-rate mode)
+RECORDING_SCHEMA = [
+    Channel("SessionTime", "mCurrentTime", fmt=".3f", unit="s"),
+    Channel("FrameIdentifier", "mSequenceNumber"),
+    Channel("SessionState", "mSessionState"),
+    Channel("GameState", "mGameState"),
+    Channel("Speed_Kmh", "mSpeed", 3.6, ".2f", "km/h"),
+    Channel("RPM", "mRpm", fmt=".0f", unit="rpm"),
+    Channel("Gear", "mGear"),
+    Channel("Throttle", "mThrottle", fmt=".3f"),
+    Channel("Brake", "mBrake", fmt=".3f"),
+    Channel("Clutch", "mClutch", fmt=".3f"),
+    Channel("Steering", "mSteering", fmt=".3f"),
+    Channel("LapInvalidated", "mLapInvalidated"),
+    Channel("CurrentLapTime", "mCurrentTime", fmt=".3f", unit="s"),
+    Channel("LastLapTime", "mLastLapTime", fmt=".3f", unit="s"),
+    Channel("BestLapTime", "mBestLapTime", fmt=".3f", unit="s"),
+    Channel("TrackTemp", "mTrackTemperature", fmt=".1f", unit="C"),
+    Channel("AmbientTemp", "mAmbientTemperature", fmt=".1f", unit="C"),
+    Channel("RainDensity", "mRainDensity", fmt=".2f"),
+    Channel("TyreTemp_{tyre}", "mTyreTemp[0:4]", fmt=".0f", unit="C"),
+    Channel("TyreWear_{tyre}", "mTyreWear[0:4]", fmt=".3f"),
+    Channel("BrakeTemp_{tyre}", "mBrakeTempCelsius[0:4]", fmt=".0f", unit="C"),
+    Channel("RideHeight_{tyre}", "mRideHeight[0:4]", fmt=".3f", unit="m"),
+    Channel("SuspensionTravel_{tyre}", "mSuspensionTravel[0:4]", fmt=".3f", unit="m"),
+    Channel("PosX", "participant.mWorldPosition[0]", fmt=".2f", unit="m"),
+    Channel("PosY", "participant.mWorldPosition[1]", fmt=".2f", unit="m"),
+    Channel("PosZ", "participant.mWorldPosition[2]", fmt=".2f", unit="m"),
+    Channel("Lap", "participant.mCurrentLap"),
+    Channel("LapDistance", "participant.mCurrentLapDistance", fmt=".1f", unit="m"),
+]
+
+HEADER = ["Timestamp"] + schema_columns(RECORDING_SCHEMA)
+
+# Columns RecordingSummary is fed from; without them a recording has no summary
+SUMMARY_COLUMNS = ("Lap", "LastLapTime", "TrackTemp", "AmbientTemp", "RainDensity")
+
+SIZE_CHECK_ROWS = 256 # check the file size every N rows
+
+EVENT_FIELDS = ["kind", "wheel", "time", "lap", "distance", "duration", "peak"]
 
 class DataRecorder:
-    def __init__(self, output_dir="data"):
+    # Rows are formatted in the sampling loop and handed to a writer thread
+    # through a queue, so file I/O, rotation and metadata writes never block
+    # the loop. A second thread enforces the retention policy.
+    def __init__(self, output_dir="data", high_rate=False,
+                 max_file_bytes=None, max_file_seconds=None, rotate_on_session_change=True,
+                 max_total_bytes=None, max_age_days=None, retention_interval=60.0,
+                 lap_aggregator=None, lod=False, histograms=None,
+                 crash_safe=False, sync_interval=DEFAULT_SYNC_INTERVAL, sync_bytes=DEFAULT_SYNC_BYTES,
+                 schema=None):
         self.output_dir = output_dir
         self.recording = False
         self.file_handle = None
@@ -12,6 +216,70 @@ class DataRecorder:
         self.start_time = 0
         self.filename = ""
 
+        # High-rate capture: one row per published frame (duplicates and torn
+        # reads are dropped), stamped with time.perf_counter_ns() instead of
+        # wall-clock seconds. Takes effect on the next start(); the mode of the
+        # running recording is recording_high_rate.
+        self.high_rate = high_rate
+        self.recording_high_rate = high_rate
+        self.last_sequence = None
+
+        # Rotation: start a new file when the session, car or track changes,
+        # when a file grows beyond max_file_bytes or is older than max_file_seconds
+        self.max_file_bytes = max_file_bytes
+        self.max_file_seconds = max_file_seconds
+        self.rotate_on_session_change = rotate_on_session_change
+        self.session_key = None
+
+        # Retention: oldest recordings are deleted once the directory holds more
+        # than max_total_bytes or recordings are older than max_age_days
+        self.max_total_bytes = max_total_bytes
+        self.max_age_days = max_age_days
+        self.retention_interval = retention_interval
+
+        # Optional LapAggregator: per-lap summaries are computed on the fly and
+        # written to <base>.laps.csv next to the recording
+        self.lap_aggregator = lap_aggregator
+
+        # Optional LapHistograms: distributions of suspension, ride height and
+        # pedals per lap, written to <base>.hist.json when the file is closed
+        self.histograms = histograms
+
+        # Side files of the current recording (laps, events): suffix -> (handle, writer)
+        self.sidecars = {}
+
+        # Level-of-detail pyramid (<base>.lod) built by the writer thread for
+        # fast plotting of long recordings, see ams2_lod
+        self.lod = lod
+        self.lod_builder = None
+
+        # Crash-safe mode: rows are committed in fsynced, checksummed blocks
+        # every sync_interval seconds / sync_bytes bytes (see ams2_blocks)
+        self.crash_safe = crash_safe
+        self.sync_interval = sync_interval
+        self.sync_bytes = sync_bytes
+
+        self.metadata = {}
+        self.session_info = {}
+        self.frames_written = 0
+        self.summary = RecordingSummary()
+
+        # Called with the filename from the writer thread whenever a recording
+        # file is closed (stop or rotation), e.g. SessionCatalog.add_recording
+        self.file_closed_callbacks = []
+        self.file_start_time = 0
+        self.header = []
+
+        # Channels to record (see ams2_schema); the row function is generated
+        # for the schema at start(). Takes effect on the next start().
+        self.schema = schema or RECORDING_SCHEMA
+        self.extract = None
+
+        self.queue = queue.Queue()
+        self.writer_thread = None
+        self.retention_thread = None
+        self.retention_stop = threading.Event()
+
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
 
@@ -19,78 +287,309 @@ class DataRecorder:
         if self.recording:
             return
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.filename = os.path.join(self.output_dir, f"telemetry_{timestamp}.csv")
-        
         try:
-            self.file_handle = open(self.filename, 'w', newline='')
-            self.writer = csv.writer(self.file_handle)
-            
-            # Write Header
-            header = [
-                "Timestamp", "SessionTime", "FrameIdentifier",
-                "SessionState", "GameState",
-                "Speed_Kmh", "RPM", "Gear",
-                "Throttle", "Brake", "Clutch", "Steering",
-                "LapInvalidated", "CurrentLapTime", "LastLapTime", "BestLapTime",
-                "TrackTemp", "AmbientTemp", "RainDensity",
-                "TyreTemp_FL", "TyreTemp_FR", "TyreTemp_RL", "TyreTemp_RR",
-                "TyreWear_FL", "TyreWear_FR", "TyreWear_RL", "TyreWear_RR",
-                "BrakeTemp_FL", "BrakeTemp_FR", "BrakeTemp_RL", "BrakeTemp_RR",
-                "RideHeight_FL", "RideHeight_FR", "RideHeight_RL", "RideHeight_RR",
-                "SuspensionTravel_FL", "SuspensionTravel_FR", "SuspensionTravel_RL", "SuspensionTravel_RR",
-                "PosX", "PosY", "PosZ"
-            ]
-            self.writer.writerow(header)
+            self.recording_high_rate = self.high_rate
+            self.header = ["TimestampNs" if self.recording_high_rate else "Timestamp"] + schema_columns(self.schema)
+            self.extract = compile_schema(self.schema)
+
+            self._open_file("start")
             
             self.recording = True
             self.start_time = time.time()
-            print(f"Recording started: {self.filename}")
+            self.last_sequence = None
+            self.session_key = None
+            self.session_info = {}
+
+            self.writer_thread = threading.Thread(target=self._writer_loop, name="RecorderWriter", daemon=True)
+            self.writer_thread.start()
+            if self.max_total_bytes or self.max_age_days:
+                self.retention_stop.clear()
+                self.retention_thread = threading.Thread(target=self._retention_loop, name="RecorderRetention", daemon=True)
+                self.retention_thread.start()
+
+            mode = " (high-rate)" if self.recording_high_rate else ""
+            print(f"Recording started{mode}: {self.filename}")
         except Exception as e:
             print(f"Failed to start recording: {e}")
 
+    @property
+    def backlog(self):
+        # Rows accepted but not yet written by the writer thread
+        return self.queue.qsize()
+
     def stop(self):
         if not self.recording:
             return
 
-        if self.file_handle:
-            self.file_handle.close()
-            self.file_handle = None
-            self.writer = None
-        
         self.recording = False
+        self._flush_lap()
+        # The writer drains everything queued before the stop marker
+        self.queue.put(('stop', None))
+        if self.writer_thread:
+            self.writer_thread.join()
+            self.writer_thread = None
+        if self.retention_thread:
+            self.retention_stop.set()
+            self.retention_thread.join()
+            self.retention_thread = None
         print(f"Recording stopped: {self.filename}")
 
     def record_frame(self, data):
         if not self.recording or not data:
             return
 
-        current_time = time.time()
-        
-        # Extract Tyre Temps (convert to list if needed, ctypes array is iterable)
-        tyre_temps = [t for t in data.mTyreTemp]
-        tyre_wear = [w for w in data.mTyreWear]
-        brake_temps = [b for b in data.mBrakeTempCelsius]
-        ride_height = [h for h in data.mRideHeight]
-        susp_travel = [s for s in data.mSuspensionTravel]
-        # pos = [p for p in data.mPosition] # mPosition not in SharedMemory struct
-
-        row = [
-            f"{current_time:.3f}", f"{data.mCurrentTime:.3f}", "0", # FrameNum placeholder
-            data.mSessionState, data.mGameState,
-            f"{data.mSpeed * 3.6:.2f}", f"{data.mRpm:.0f}", data.mGear,
-            f"{data.mThrottle:.3f}", f"{data.mBrake:.3f}", f"{data.mClutch:.3f}", f"{data.mSteering:.3f}",
-            data.mLapInvalidated, f"{data.mCurrentTime:.3f}", f"{data.mLastLapTime:.3f}", f"{data.mBestLapTime:.3f}",
-            f"{data.mTrackTemperature:.1f}", f"{data.mAmbientTemperature:.1f}", f"{data.mRainDensity:.2f}",
-            f"{tyre_temps[0]:.0f}", f"{tyre_temps[1]:.0f}", f"{tyre_temps[2]:.0f}", f"{tyre_temps[3]:.0f}",
-            f"{tyre_wear[0]:.3f}", f"{tyre_wear[1]:.3f}", f"{tyre_wear[2]:.3f}", f"{tyre_wear[3]:.3f}",
-            f"{brake_temps[0]:.0f}", f"{brake_temps[1]:.0f}", f"{brake_temps[2]:.0f}", f"{brake_temps[3]:.0f}",
-            f"{ride_height[0]:.3f}", f"{ride_height[1]:.3f}", f"{ride_height[2]:.3f}", f"{ride_height[3]:.3f}",
-            f"{susp_travel[0]:.3f}", f"{susp_travel[1]:.3f}", f"{susp_travel[2]:.3f}", f"{susp_travel[3]:.3f}",
-            "0.00", "0.00", "0.00" # PosX, PosY, PosZ placeholders
-        ]
+        seq = data.mSequenceNumber
+        if self.recording_high_rate:
+            # Skip frames we already have and frames read mid-write
+            if seq == self.last_sequence or seq & 1:
+                return
+            self.last_sequence = seq
+            timestamp = str(time.perf_counter_ns())
+        else:
+            timestamp = f"{time.time():.3f}"
+
+        # A new session, car or track starts a new file
+        key = (data.mSessionState, data.mCarName, data.mTrackLocation, data.mTrackVariation)
+        if key != self.session_key:
+            if self.session_key is not None and self.rotate_on_session_change:
+                self._flush_lap()
+                self.queue.put(('rotate', 'session'))
+            self.session_key = key
+            self.queue.put(('session', self._session_info(data)))
+
+        row = self.extract(data, timestamp)
+        self.queue.put(('row', row))
+
+        if self.lap_aggregator:
+            lap_summary = self.lap_aggregator.update(data)
+            if lap_summary:
+                self.queue.put(('lap', lap_summary))
+        if self.histograms:
+            self.histograms.update(data)
+
+    def record_event(self, event):
+        # Driving events (see ams2_events) go to <base>.events.csv
+        if self.recording:
+            self.queue.put(('event', event._asdict()))
+
+    def _flush_lap(self):
+        # The lap in progress goes into the file it was recorded in
+        if self.lap_aggregator:
+            lap_summary = self.lap_aggregator.flush()
+            if lap_summary:
+                self.queue.put(('lap', lap_summary))
+        if self.histograms:
+            self.queue.put(('histograms', self.histograms.flush()))
+
+    def _session_info(self, data):
+        # Car, track and conditions are constant for a session; store them once
+        # in the metadata file instead of repeating them in every row.
+        return {
+            'car': decode_string(data.mCarName),
+            'car_class': decode_string(data.mCarClassName),
+            'track': decode_string(data.mTrackLocation),
+            'track_variation': decode_string(data.mTrackVariation),
+            'track_length': round(data.mTrackLength, 1),
+            'tyre_compounds': [decode_string(c.value) for c in data.mTyreCompound],
+            'session_state': data.mSessionState,
+        }
+
+    # --- Writer thread -------------------------------------------------------
+
+    def _writer_loop(self):
+        # In crash-safe mode the writer wakes up to commit rows of an idle recording
+        timeout = max(self.sync_interval, 0.01) if self.crash_safe else None
+        while True:
+            try:
+                kind, payload = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                kind, payload = 'idle', None
+            try:
+                if kind == 'idle':
+                    if self.file_handle:
+                        self.file_handle.commit_due()
+                elif kind == 'row':
+                    self._write_row(payload)
+                elif kind == 'lap':
+                    self._write_sidecar(".laps.csv", self.lap_aggregator.fields, payload)
+                elif kind == 'histograms':
+                    self._write_json(".hist.json", payload)
+                elif kind == 'event':
+                    self._write_sidecar(".events.csv", EVENT_FIELDS, payload)
+                elif kind == 'session':
+                    self.session_info = payload
+                    self.metadata.update(payload)
+                    self._write_metadata()
+                elif kind == 'rotate':
+                    if self.frames_written:
+                        self._rotate(payload)
+                elif kind == 'stop':
+                    self._close_file("stop")
+                    return
+            except Exception as e:
+                print(f"Error writing frame: {e}")
+
+    def _write_row(self, row):
+        self.writer.writerow(row)
+        self.frames_written += 1
+        i = self.summary_columns
+        if i:
+            self.summary.add(row[i[0]], float(row[i[1]]), float(row[i[2]]), float(row[i[3]]), float(row[i[4]]))
+        if self.lod_builder:
+            self.lod_builder.add(float(row[0]) * self.lod_time_scale, [float(row[j]) for j in self.lod_columns])
+        if self.max_file_seconds and time.time() - self.file_start_time >= self.max_file_seconds:
+            self._rotate("time")
+        elif (self.max_file_bytes and self.frames_written % SIZE_CHECK_ROWS == 0
+                and self.file_handle.tell() >= self.max_file_bytes):
+            self._rotate("size")
+
+    def _write_sidecar(self, suffix, fields, record):
+        # Rare, small records next to the recording; opened on first use
+        if suffix not in self.sidecars:
+            handle = open(os.path.splitext(self.filename)[0] + suffix, 'w', newline='')
+            writer = csv.DictWriter(handle, fieldnames=fields, extrasaction='ignore')
+            writer.writeheader()
+            self.sidecars[suffix] = (handle, writer)
+        handle, writer = self.sidecars[suffix]
+        writer.writerow(record)
+        handle.flush()
+
+    def _write_json(self, suffix, payload):
+        path = os.path.splitext(self.filename)[0] + suffix
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        os.replace(path + ".tmp", path)
+
+    def _rotate(self, reason):
+        self._close_file(reason)
+        self._open_file(reason)
+        print(f"Recording rotated ({reason}): {self.filename}")
+
+    def _new_filename(self):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = os.path.join(self.output_dir, f"telemetry_{timestamp}.csv")
+        part = 1
+        while os.path.exists(filename):
+            part += 1
+            filename = os.path.join(self.output_dir, f"telemetry_{timestamp}_{part}.csv")
+        return filename
+
+    def _open_file(self, reason):
+        self.filename = self._new_filename()
+        if self.crash_safe:
+            self.file_handle = BlockWriter(self.filename, self.sync_interval, self.sync_bytes)
+        else:
+            self.file_handle = open(self.filename, 'w', newline='')
+        self.writer = csv.writer(self.file_handle)
         
+        # Write Header
+        self.writer.writerow(self.header)
+
+        self.frames_written = 0
+        self.summary = RecordingSummary()
+        self.summary_columns = None
+        if all(c in self.header for c in SUMMARY_COLUMNS):
+            self.summary_columns = [self.header.index(c) for c in SUMMARY_COLUMNS]
+        if self.lod:
+            channels = [c for c in LOD_CHANNELS if c in self.header]
+            self.lod_columns = [self.header.index(c) for c in channels]
+            self.lod_time_scale = 1e-9 if self.recording_high_rate else 1.0
+            self.lod_builder = LodBuilder(lod_path(self.filename), channels)
+        self.file_start_time = time.time()
+        self.metadata = {
+            'file': os.path.basename(self.filename),
+            'started': datetime.fromtimestamp(self.file_start_time).isoformat(timespec='seconds'),
+            'started_unix': self.file_start_time,
+            # Anchor to convert TimestampNs of high-rate recordings to wall time
+            'perf_counter_ns_at_start': time.perf_counter_ns(),
+            'high_rate': self.recording_high_rate,
+            'opened_by': reason,
+            'columns': self.header,
+            'units': schema_units(self.schema),
+        }
+        self.metadata.update(self.session_info)
+        self._write_metadata()
+
+    def _close_file(self, reason):
+        if not self.file_handle:
+            return
+        self.file_handle.close()
+        self.file_handle = None
+        self.writer = None
+        for handle, _ in self.sidecars.values():
+            handle.close()
+        self.sidecars = {}
+        if self.lod_builder:
+            try:
+                self.lod_builder.close()
+            except Exception as e:
+                print(f"Error writing LOD file: {e}")
+            self.lod_builder = None
+
+        stopped = time.time()
+        self.metadata['stopped'] = datetime.fromtimestamp(stopped).isoformat(timespec='seconds')
+        self.metadata['duration_s'] = round(stopped - self.file_start_time, 3)
+        if self.summary_columns:
+            self.metadata.update(self.summary.to_dict())
+        else:
+            self.metadata['frames'] = self.frames_written
+        self.metadata['closed_by'] = reason
+        self._write_metadata()
+
+        for callback in self.file_closed_callbacks:
+            try:
+                callback(self.filename)
+            except Exception as e:
+                print(f"Error in file closed callback: {e}")
+
+    def _write_metadata(self):
         try:
-            self.writer.writerow(row)
+            with open(metadata_path(self.filename), 'w', encoding='utf-8') as f:
+                json.dump(self.metadata, f, indent=2)
         except Exception as e:
-            print(f"Error writing frame: {e}")
+            print(f"Error writing metadata: {e}")
+
+    # --- Retention -----------------------------------------------------------
+
+    def _retention_loop(self):
+        while True:
+            self.enforce_retention()
+            if self.retention_stop.wait(self.retention_interval):
+                return
+
+    def enforce_retention(self):
+        # Deletes whole recordings (CSV plus all files sharing its base name),
+        # oldest first. The file currently being written is never touched.
+        # Returns the list of deleted base names.
+        recordings = {}
+        for path in glob.glob(os.path.join(self.output_dir, "telemetry_*")):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entry = recordings.setdefault(recording_base(path), {'paths': [], 'bytes': 0, 'mtime': 0.0})
+            entry['paths'].append(path)
+            entry['bytes'] += stat.st_size
+            entry['mtime'] = max(entry['mtime'], stat.st_mtime)
+
+        current = recording_base(self.filename) if self.filename else None
+        total = sum(e['bytes'] for e in recordings.values())
+        now = time.time()
+        deleted = []
+        for base, entry in sorted(recordings.items(), key=lambda item: item[1]['mtime']):
+            if base == current:
+                continue
+            too_old = self.max_age_days is not None and now - entry['mtime'] > self.max_age_days * 86400
+            too_big = self.max_total_bytes is not None and total > self.max_total_bytes
+            if not (too_old or too_big):
+                continue
+            for path in entry['paths']:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"Error deleting {path}: {e}")
+            total -= entry['bytes']
+            deleted.append(base)
+        if deleted:
+            print(f"Retention: deleted {len(deleted)} old recording(s)")
+        return deleted
@@ -0,0 +1,77 @@
+from ams2_channels import Channel, expand_spec, parse_spec
+from ams2_structs import ParticipantInfo
+
+# Recording schemas: which channels DataRecorder writes, declared once.
+#
+# A schema is a list of channels: (name, spec, scale) tuples as built by
+# per_tyre(), or Channel entries that add a CSV number format and a unit.
+# Slice specs expand to one column per element (see ams2_channels):
+#
+#   Channel("Speed_Kmh", "mSpeed", 3.6, ".2f", "km/h")
+#   Channel("TyreTemp_{tyre}", "mTyreTemp[0:4]", fmt=".0f")   # 4 columns, FL..RR
+#   Channel("PosX", "participant.mWorldPosition[0]", fmt=".2f") # viewed car
+#   Channel("Lap_{i}", "participants[0:8].mCurrentLap")        # cars 0..7
+#
+# compile_schema() generates the source of one function for the schema
+# (data, timestamp) -> row and compiles it, so a frame costs one attribute
+# lookup and one format per column, without loops or per-frame lists.
+
+# Viewed car when there is none: all fields zero
+_EMPTY_PARTICIPANT = ParticipantInfo()
+
+def _columns(schema):
+    # (channel, column name, single spec) for every column of a schema
+    for entry in schema:
+        channel = Channel(*entry)
+        for name, spec in expand_spec(channel.name, channel.spec):
+            yield channel, name, spec
+
+def _expression(spec):
+    owner, field, index = parse_spec(spec)
+    if owner is None:
+        expr = f"data.{field}"
+    elif owner == "participant":
+        expr = f"p.{field}"
+    else:
+        expr = f"data.mParticipantInfo[{owner}].{field}"
+    return expr if index is None else f"{expr}[{index}]"
+
+def schema_columns(schema):
+    return [name for _, name, _ in _columns(schema)]
+
+def schema_units(schema):
+    return {name: channel.unit for channel, name, _ in _columns(schema) if channel.unit}
+
+def schema_source(schema, name="extract"):
+    # Python source of the row function, plus the callables it refers to
+    namespace = {'_EMPTY_PARTICIPANT': _EMPTY_PARTICIPANT}
+    values = ["timestamp"]
+    viewed = False
+    for channel, _, spec in _columns(schema):
+        if callable(spec):
+            key = f"_derived{len(namespace)}"
+            namespace[key] = spec
+            expr = f"{key}(data)"
+        else:
+            expr = _expression(spec)
+            viewed = viewed or expr.startswith("p.")
+        if channel.scale != 1.0:
+            expr = f"{expr} * {channel.scale!r}"
+        values.append(f'f"{{{expr}:{channel.fmt}}}"' if channel.fmt else expr)
+
+    lines = [f"def {name}(data, timestamp):"]
+    if viewed:
+        lines += [
+            "    idx = data.mViewedParticipantIndex",
+            "    p = data.mParticipantInfo[idx] if 0 <= idx < data.mNumParticipants else _EMPTY_PARTICIPANT",
+        ]
+    lines.append("    return [")
+    lines += [f"        {value}," for value in values]
+    lines.append("    ]")
+    return "\n".join(lines) + "\n", namespace
+
+def compile_schema(schema):
+    # Function (data, timestamp) -> list of CSV values for the schema
+    source, namespace = schema_source(schema)
+    exec(compile(source, "<recording schema>", "exec"), namespace)
+    return namespace["extract"]
@@ -0,0 +1,183 @@
+import csv
+import os
+import datetime
+import queue
+import threading
+from ams2_channels import viewed_participant
+from ams2_recorder import decode_string
+
+SECTORS = 3
+START_CLOCK = 0.5 # seconds; a lap first seen earlier than this is seen from the line
+
+LOG_FIELDS = ['Date', 'Car', 'Track', 'Sector', 'Time', 'Valid']
+
+class SectorTracker:
+    # Sector times per car/track: every sector is appended to a log, personal
+    # best sectors and the theoretical best (sum of the best sectors) are kept
+    # in memory and the best sectors file is only rewritten on an improvement.
+    # Log rows are written by a background thread (like the recorder's rows),
+    # call close() to write the rest before exiting.
+    def __init__(self, best_file="best_sectors.csv", log_file="sector_times.csv"):
+        self.best_file = best_file
+        self.log_file = log_file
+        self.log_queue = queue.Queue()
+        self.log_thread = None
+        self.best_sectors = {} # Key: (car, track), Value: [time or None] * SECTORS
+        self.best_dates = {}
+        self._load_best()
+
+        # Live state of the viewed car's current lap
+        self.sector = None
+        self.sector_seen_from_start = False
+        self.lap_sectors = [None] * SECTORS
+        self.lap_deltas = [None] * SECTORS
+        self.lap_valid = True
+        self.last_clock = 0.0
+
+    def _load_best(self):
+        if not os.path.exists(self.best_file):
+            return
+        try:
+            with open(self.best_file, mode='r', newline='', encoding='utf-8') as csvfile:
+                for row in csv.DictReader(csvfile):
+                    times = []
+                    for i in range(SECTORS):
+                        try:
+                            times.append(float(row[f'Sector{i + 1}']))
+                        except (ValueError, KeyError):
+                            times.append(None)
+                    self.best_sectors[(row['Car'], row['Track'])] = times
+                    self.best_dates[(row['Car'], row['Track'])] = row.get('Date', "")
+        except Exception as e:
+            print(f"Error loading sectors: {e}")
+
+    def _write_best(self):
+        try:
+            tmp_file = self.best_file + ".tmp"
+            with open(tmp_file, mode='w', newline='', encoding='utf-8') as csvfile:
+                fieldnames = ['Car', 'Track', 'Date'] + [f'Sector{i + 1}' for i in range(SECTORS)]
+                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+                writer.writeheader()
+                for (car, track), times in self.best_sectors.items():
+                    row = {'Car': car, 'Track': track, 'Date': self.best_dates.get((car, track), "")}
+                    for i, t in enumerate(times):
+                        row[f'Sector{i + 1}'] = f"{t:.3f}" if t is not None else ""
+                    writer.writerow(row)
+            os.replace(tmp_file, self.best_file)
+        except Exception as e:
+            print(f"Error saving sectors: {e}")
+
+    def _append_log(self, car, track, sector, sector_time, valid):
+        if self.log_thread is None:
+            self.log_thread = threading.Thread(target=self._log_loop, name="SectorLog", daemon=True)
+            self.log_thread.start()
+        date_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.log_queue.put([date_str, car, track, sector + 1, f"{sector_time:.3f}", valid])
+
+    def _log_loop(self):
+        # Keeps the log open and flushes whenever the queue runs empty
+        handle = None
+        while True:
+            row = self.log_queue.get()
+            if row is None:
+                break
+            try:
+                if handle is None:
+                    new_file = not os.path.exists(self.log_file)
+                    handle = open(self.log_file, mode='a', newline='', encoding='utf-8')
+                    writer = csv.writer(handle)
+                    if new_file:
+                        writer.writerow(LOG_FIELDS)
+                writer.writerow(row)
+                if self.log_queue.empty():
+                    handle.flush()
+            except Exception as e:
+                print(f"Error logging sector: {e}")
+        if handle:
+            handle.close()
+
+    def close(self):
+        # Writes the queued log rows and stops the log thread
+        if self.log_thread:
+            self.log_queue.put(None)
+            self.log_thread.join()
+            self.log_thread = None
+
+    def get_best_sectors(self, car, track):
+        return self.best_sectors.get((car, track))
+
+    def get_theoretical_best(self, car, track):
+        times = self.best_sectors.get((car, track))
+        if not times or None in times:
+            return None
+        return sum(times)
+
+    def record_sector(self, car, track, sector, sector_time, valid=True):
+        # Logs one sector time (sector is 0-based). Returns (delta to the
+        # previous best or None, True if it is a new personal best).
+        if sector_time <= 0:
+            return None, False
+        self._append_log(car, track, sector, sector_time, valid)
+        times = self.best_sectors.setdefault((car, track), [None] * SECTORS)
+        best = times[sector]
+        delta = sector_time - best if best is not None else None
+        if valid and (best is None or sector_time < best):
+            times[sector] = sector_time
+            self.best_dates[(car, track)] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self._write_best()
+            return delta, True
+        return delta, False
+
+    def update(self, data):
+        # Detects completed sectors of the viewed car. Returns a list of
+        # (sector, time, delta, is_best) for sectors completed in this frame.
+        p = viewed_participant(data)
+        if p is None:
+            return []
+        sector = p.mCurrentSector
+        completed = []
+        if data.mLapInvalidated:
+            self.lap_valid = False
+
+        if sector != self.sector:
+            previous = self.sector
+            if previous is not None and 0 <= previous < SECTORS and sector == (previous + 1) % SECTORS:
+                if self.sector_seen_from_start:
+                    sector_time = self._sector_time(data, previous)
+                    if sector_time:
+                        car = decode_string(data.mCarName)
+                        track = decode_string(data.mTrackLocation)
+                        delta, is_best = self.record_sector(car, track, previous, sector_time, self.lap_valid)
+                        self.lap_sectors[previous] = sector_time
+                        self.lap_deltas[previous] = delta
+                        completed.append((previous, sector_time, delta, is_best))
+                self.sector_seen_from_start = True
+            else:
+                # Joined mid-lap or jumped; a lap joined right at the line still counts
+                self.sector_seen_from_start = previous is None and sector == 0 and data.mCurrentTime < START_CLOCK
+            if sector == 0:
+                self.lap_sectors = [None] * SECTORS
+                self.lap_deltas = [None] * SECTORS
+                self.lap_valid = not data.mLapInvalidated
+            self.sector = sector
+
+        self.last_clock = data.mCurrentTime
+        return completed
+
+    def _sector_time(self, data, sector):
+        # The game's sector time when it has one, otherwise from the lap clock.
+        # The last sector ends on the line, where the fields already belong to
+        # the new lap, so it is always taken from the clock of the last frame.
+        if sector < SECTORS - 1:
+            game_time = (data.mCurrentSector1Time, data.mCurrentSector2Time)[sector]
+            if game_time > 0:
+                return game_time
+        if None in self.lap_sectors[:sector]:
+            return None
+        done = sum(self.lap_sectors[:sector])
+        clock = data.mCurrentTime if sector < SECTORS - 1 else self.last_clock
+        return clock - done
+
+    def current_lap(self):
+        # [(time, delta)] per sector of the lap in progress, None where open
+        return [(t, d) if t is not None else None for t, d in zip(self.lap_sectors, self.lap_deltas)]
@@ -7,6 +7,107 @@ STORED_PARTICIPANTS_MAX = 64
 TYRE_MAX = 4
 VEC_MAX = 3
 
+# Game States (enum Type#1, mGameState)
+GAME_EXITED = 0
+GAME_FRONT_END = 1
+GAME_INGAME_PLAYING = 2
+GAME_INGAME_PAUSED = 3
+GAME_INGAME_INMENU_TIME_TICKING = 4
+GAME_INGAME_RESTARTING = 5
+GAME_INGAME_REPLAY = 6
+GAME_FRONT_END_REPLAY = 7
+
+# Session States (mSessionState)
+SESSION_INVALID = 0
+SESSION_PRACTICE = 1
+SESSION_TEST = 2
+SESSION_QUALIFY = 3
+SESSION_FORMATION_LAP = 4
+SESSION_RACE = 5
+SESSION_TIME_ATTACK = 6
+
+# Flag Colours (mHighestFlagColour)
+FLAG_COLOUR_NONE = 0
+FLAG_COLOUR_GREEN = 1
+FLAG_COLOUR_BLUE = 2
+FLAG_COLOUR_WHITE_SLOW_CAR = 3
+FLAG_COLOUR_WHITE_FINAL_LAP = 4
+FLAG_COLOUR_RED = 5
+FLAG_COLOUR_YELLOW = 6
+FLAG_COLOUR_DOUBLE_YELLOW = 7
+FLAG_COLOUR_BLACK_AND_WHITE = 8
+FLAG_COLOUR_BLACK_ORANGE_CIRCLE = 9
+FLAG_COLOUR_BLACK = 10
+FLAG_COLOUR_CHEQUERED = 11
+
+# Pit Mode (mPitMode)
+PIT_MODE_NONE = 0
+PIT_MODE_DRIVING_INTO_PITS = 1
+PIT_MODE_IN_PIT = 2
+PIT_MODE_DRIVING_OUT_OF_PITS = 3
+PIT_MODE_IN_GARAGE = 4
+PIT_MODE_DRIVING_OUT_OF_GARAGE = 5
+
+# Crash Damage State (mCrashState)
+CRASH_DAMAGE_NONE = 0
+CRASH_DAMAGE_OFFTRACK = 1
+CRASH_DAMAGE_LARGE_PROP = 2
+CRASH_DAMAGE_SPINNING = 3
+CRASH_DAMAGE_ROLLING = 4
+
+# Terrain Materials (mTerrain)
+TERRAIN_ROAD = 0
+TERRAIN_LOW_GRIP_ROAD = 1
+TERRAIN_BUMPY_ROAD1 = 2
+TERRAIN_BUMPY_ROAD2 = 3
+TERRAIN_BUMPY_ROAD3 = 4
+TERRAIN_MARBLES = 5
+TERRAIN_GRASSY_BERMS = 6
+TERRAIN_GRASS = 7
+TERRAIN_GRAVEL = 8
+TERRAIN_BUMPY_GRAVEL = 9
+TERRAIN_RUMBLE_STRIPS = 10
+TERRAIN_DRAINS = 11
+TERRAIN_TYREWALLS = 12
+TERRAIN_CEMENTWALLS = 13
+TERRAIN_GUARDRAILS = 14
+TERRAIN_SAND = 15
+TERRAIN_BUMPY_SAND = 16
+TERRAIN_DIRT = 17
+TERRAIN_BUMPY_DIRT = 18
+TERRAIN_DIRT_ROAD = 19
+TERRAIN_BUMPY_DIRT_ROAD = 20
+TERRAIN_PAVEMENT = 21
+TERRAIN_DIRT_BANK = 22
+TERRAIN_WOOD = 23
+TERRAIN_DRY_VERGE = 24
+TERRAIN_EXIT_RUMBLE_STRIPS = 25
+TERRAIN_GRASSCRETE = 26
+TERRAIN_LONG_GRASS = 27
+TERRAIN_SLOPE_GRASS = 28
+TERRAIN_COBBLES = 29
+TERRAIN_SAND_ROAD = 30
+TERRAIN_BAKED_CLAY = 31
+TERRAIN_ASTROTURF = 32
+TERRAIN_SNOWHALF = 33
+TERRAIN_SNOWFULL = 34
+TERRAIN_DAMAGED_ROAD1 = 35
+TERRAIN_TRAIN_TRACK_ROAD = 36
+TERRAIN_BUMPYCOBBLES = 37
+TERRAIN_ARIES_ONLY = 38
+TERRAIN_ORION_ONLY = 39
+TERRAIN_B1RUMBLES = 40
+TERRAIN_B2RUMBLES = 41
+TERRAIN_ROUGH_SAND_MEDIUM = 42
+TERRAIN_ROUGH_SAND_HEAVY = 43
+TERRAIN_SNOWWALLS = 44
+TERRAIN_ICE_ROAD = 45
+TERRAIN_RUNOFF_ROAD = 46
+TERRAIN_ILLEGAL_STRIP = 47
+TERRAIN_PAINT_CONCRETE = 48
+TERRAIN_PAINT_CONCRETE_ILLEGAL = 49
+TERRAIN_RALLY_TARMAC = 50
+
 # Helper types
 Vec3 = ctypes.c_float * VEC_MAX
 TyreFloat = ctypes.c_float * TYRE_MAX
@@ -0,0 +1,141 @@
+import ctypes
+import math
+import mmap
+from ams2_structs import SharedMemory
+from ams2_reader import SEQUENCE_STEP
+
+# Synthetic AMS2 frames for offline use (benchmarks, tests, simulated rigs).
+# A single car drives laps around a circular track; the values are plausible
+# enough to exercise every code path without the game running.
+
+class SyntheticSession:
+    def __init__(self, car="Formula Vee", track="Interlagos", variation="GP",
+                 lap_time=90.0, rate_hz=60.0, track_length=4300.0):
+        self.car = car
+        self.track = track
+        self.variation = variation
+        self.lap_time = lap_time
+        self.rate_hz = rate_hz
+        self.track_length = track_length
+        self.frame_index = 0
+
+        # One preallocated structure that is updated in place for every frame
+        self.data = SharedMemory()
+        self._init_static()
+
+    def _init_static(self):
+        d = self.data
+        d.mVersion = 14
+        d.mBuildVersionNumber = 1
+        d.mGameState = 2 # Playing
+        d.mSessionState = 1 # Practice
+        d.mRaceState = 2
+        d.mViewedParticipantIndex = 0
+        d.mNumParticipants = 1
+        d.mParticipantInfo[0].mIsActive = True
+        d.mParticipantInfo[0].mName = b"Driver"
+        d.mCarName = self.car.encode('utf-8')
+        d.mCarClassName = b"F-Vee"
+        d.mTrackLocation = self.track.encode('utf-8')
+        d.mTrackVariation = self.variation.encode('utf-8')
+        d.mTrackLength = self.track_length
+        d.mNumSectors = 3
+        d.mMaxRPM = 7000.0
+        d.mNumGears = 4
+        d.mFuelCapacity = 40.0
+        d.mAmbientTemperature = 24.0
+        d.mTrackTemperature = 32.0
+        d.mWindSpeed = 2.0
+        for i in range(4):
+            d.mTyreCompound[i].value = b"Slick"
+
+    def advance(self):
+        # Moves the simulation one frame forward and returns the shared structure
+        d = self.data
+        i = self.frame_index
+        self.frame_index += 1
+
+        t = i / self.rate_hz
+        lap_fraction = (t % self.lap_time) / self.lap_time
+        laps_done = int(t // self.lap_time)
+        angle = lap_fraction * 2.0 * math.pi
+        radius = self.track_length / (2.0 * math.pi)
+        wave = math.sin(angle * 8.0) # eight "corners" per lap
+
+        d.mSequenceNumber = (i + 1) * SEQUENCE_STEP
+
+        p = d.mParticipantInfo[0]
+        p.mWorldPosition[0] = radius * math.cos(angle)
+        p.mWorldPosition[1] = 0.0
+        p.mWorldPosition[2] = radius * math.sin(angle)
+        p.mCurrentLapDistance = lap_fraction * self.track_length
+        p.mCurrentLap = laps_done + 1
+        p.mLapsCompleted = laps_done
+        p.mCurrentSector = min(2, int(lap_fraction * 3))
+        p.mRacePosition = 1
+
+        d.mCurrentTime = t % self.lap_time
+        d.mLastLapTime = self.lap_time if laps_done > 0 else -1.0
+        d.mBestLapTime = self.lap_time if laps_done > 0 else -1.0
+        d.mFuelLevel = max(0.0, 1.0 - t / 3600.0)
+
+        speed = 40.0 + 15.0 * wave
+        d.mSpeed = speed
+        d.mRpm = 4500.0 + 1500.0 * wave
+        d.mGear = 3 if wave > 0 else 2
+        d.mThrottle = max(0.0, wave)
+        d.mBrake = max(0.0, -wave)
+        d.mSteering = math.cos(angle * 8.0) * 0.3
+        d.mLocalVelocity[2] = -speed
+
+        for w in range(4):
+            base = 86.0 + w + 2.0 * math.sin(t / 30.0)
+            d.mTyreTemp[w] = base
+            d.mTyreTempLeft[w] = base - 3.0
+            d.mTyreTempCenter[w] = base
+            d.mTyreTempRight[w] = base + 3.0
+            d.mTyreTreadTemp[w] = base + 273.15
+            d.mTyreLayerTemp[w] = base + 271.15
+            d.mTyreCarcassTemp[w] = base + 268.15
+            d.mTyreRimTemp[w] = base + 240.15
+            d.mTyreInternalAirTemp[w] = base + 250.15
+            d.mAirPressure[w] = 26.0 + 0.05 * (base - 86.0)
+            d.mTyreRPS[w] = speed / (2.0 * math.pi * 0.3)
+            d.mTyreWear[w] = min(1.0, t / 7200.0)
+            d.mBrakeTempCelsius[w] = 300.0 + 200.0 * max(0.0, -wave)
+            d.mRideHeight[w] = 0.05 + 0.005 * wave
+            d.mSuspensionTravel[w] = 0.02 + 0.01 * wave
+            d.mSuspensionVelocity[w] = 0.1 * math.cos(angle * 8.0)
+
+        return d
+
+    def frame_bytes(self):
+        # Raw bytes of the next frame, as they would appear in shared memory
+        return bytes(self.advance())
+
+class SyntheticReader:
+    # Drop-in replacement for AMS2Reader that serves frames of a SyntheticSession
+    # from an anonymous mmap, so AMS2Reader.read can be exercised as-is.
+    def __init__(self, session=None):
+        self.session = session or SyntheticSession()
+        self.mm = None
+
+    def connect(self):
+        self.mm = mmap.mmap(-1, ctypes.sizeof(SharedMemory))
+        return True
+
+    def publish(self):
+        # Writes the next synthetic frame into the mapped buffer
+        self.mm.seek(0)
+        self.mm.write(self.session.frame_bytes())
+
+    def read(self):
+        if not self.mm:
+            return None
+        self.publish()
+        return SharedMemory.from_buffer_copy(self.mm)
+
+    def close(self):
+        if self.mm:
+            self.mm.close()
+            self.mm = None
@@ -0,0 +1,340 @@
+import bisect
+import json
+import math
+import os
+import re
+from array import array
+from ams2_channels import viewed_participant
+from ams2_recorder import decode_string, iter_lap_columns, load_metadata
+
+# Track map built from the world positions of clean laps.
+#
+# The centre line is stored as one averaged point every few metres of lap
+# distance. Corners are found from its curvature and split the lap into
+# numbered segments (straight, corner, straight, ...). A uniform grid over
+# the x/z plane maps any world position to the nearest centre line point, so
+# locating a car costs a few distance checks regardless of track length:
+#
+#   track_map = TrackMap.load(track_map_path("Interlagos", "GP"))
+#   distance, corner, segment = track_map.locate(x, y, z)
+#
+# Maps are saved per track and variation in track_maps/ and are either built
+# live (TrackMapper) or from recordings (build_track_map).
+
+DEFAULT_DIRECTORY = "track_maps"
+MAP_VERSION = 1
+
+CORNER_RADIUS = 250.0  # metres; tighter than this counts as a corner
+MIN_CORNER_LENGTH = 15.0
+MERGE_GAP = 30.0       # corners closer than this are one corner
+HEADING_SPAN = 10.0    # metres either side used for the heading
+GRID_CELL = 20.0       # metres
+MAX_OFFSET = 40.0      # positions farther from the centre line are off the map
+MAX_FILL_BINS = 10     # gaps between samples interpolated when building
+
+def track_map_path(track, variation, directory=DEFAULT_DIRECTORY):
+    name = re.sub(r"[^\w\-]+", "_", f"{track}_{variation}").strip("_")
+    return os.path.join(directory, f"{name}.json")
+
+class TrackMapBuilder:
+    # Averages the positions of clean laps per distance bin
+    def __init__(self, track_length, resolution=5.0):
+        self.track_length = track_length
+        self.resolution = resolution
+        self.bins = int(track_length / resolution) + 1
+        n = self.bins
+        self.sums = [array('d', bytes(8 * n)) for _ in range(3)]
+        self.counts = array('I', bytes(4 * n))
+        self.lap_points = [array('d', bytes(8 * n)) for _ in range(3)]
+        self.lap_seen = bytearray(n)
+        self.laps = 0
+        self.lap = None
+        self.lap_valid = True
+        self.last = None
+
+    def add(self, lap, distance, x, y, z, invalidated=False):
+        if lap != self.lap:
+            if self.lap is not None:
+                self._finish_lap()
+            self.lap = lap
+            self.lap_valid = True
+            self.lap_seen[:] = bytes(self.bins)
+            self.last = None
+        if invalidated:
+            self.lap_valid = False
+        if not 0 <= distance <= self.track_length:
+            return
+        b = min(int(distance / self.resolution), self.bins - 1)
+        if self.last is not None and 1 < b - self.last[0] <= MAX_FILL_BINS:
+            # Interpolate bins skipped between two samples (low sample rates)
+            lb, lx, ly, lz = self.last
+            for k in range(lb + 1, b):
+                f = (k - lb) / (b - lb)
+                self._set(k, lx + (x - lx) * f, ly + (y - ly) * f, lz + (z - lz) * f)
+        self._set(b, x, y, z)
+        self.last = (b, x, y, z)
+
+    def _set(self, b, x, y, z):
+        self.lap_points[0][b] = x
+        self.lap_points[1][b] = y
+        self.lap_points[2][b] = z
+        self.lap_seen[b] = 1
+
+    def _finish_lap(self):
+        # Only valid laps that cover (almost) every bin, i.e. seen from the line
+        if not self.lap_valid or self.lap_seen.count(1) < 0.95 * self.bins:
+            return
+        for b in range(self.bins):
+            if self.lap_seen[b]:
+                for axis in range(3):
+                    self.sums[axis][b] += self.lap_points[axis][b]
+                self.counts[b] += 1
+        self.laps += 1
+
+    def build(self):
+        if self.laps == 0:
+            return None
+        points = [array('d') for _ in range(3)]
+        for b in range(self.bins):
+            n = self.counts[b]
+            for axis in range(3):
+                if n:
+                    points[axis].append(self.sums[axis][b] / n)
+                elif points[axis]:
+                    points[axis].append(points[axis][-1]) # bin never hit: hold
+                else:
+                    points[axis].append(0.0)
+        return TrackMap(self.track_length, self.resolution, *points, laps=self.laps)
+
+class TrackMap:
+    def __init__(self, track_length, resolution, xs, ys, zs, laps=0, corners=None):
+        self.track_length = track_length
+        self.resolution = resolution
+        self.xs = array('d', xs)
+        self.ys = array('d', ys)
+        self.zs = array('d', zs)
+        self.laps = laps
+        self.corners = corners if corners is not None else self._find_corners()
+        self._build_segments()
+        self._build_grid()
+
+    # --- Corners and segments ------------------------------------------------
+
+    def _find_corners(self):
+        n = len(self.xs)
+        span = max(1, int(HEADING_SPAN / self.resolution))
+        curvature = [0.0] * n
+        for i in range(span, n - span):
+            h1 = math.atan2(self.zs[i] - self.zs[i - span], self.xs[i] - self.xs[i - span])
+            h2 = math.atan2(self.zs[i + span] - self.zs[i], self.xs[i + span] - self.xs[i])
+            turn = (h2 - h1 + math.pi) % (2 * math.pi) - math.pi
+            curvature[i] = turn / (span * self.resolution)
+
+        threshold = 1.0 / CORNER_RADIUS
+        runs = []
+        start = None
+        for i in range(n + 1):
+            inside = i < n and abs(curvature[i]) > threshold
+            if inside and start is None:
+                start = i
+            elif not inside and start is not None:
+                if runs and (start - runs[-1][1]) * self.resolution < MERGE_GAP:
+                    runs[-1] = (runs[-1][0], i)
+                else:
+                    runs.append((start, i))
+                start = None
+
+        corners = []
+        for first, end in runs:
+            if (end - first) * self.resolution < MIN_CORNER_LENGTH:
+                continue
+            apex = max(range(first, end), key=lambda i: abs(curvature[i]))
+            corners.append({
+                'id': len(corners) + 1,
+                'start': round(first * self.resolution, 1),
+                'apex': round(apex * self.resolution, 1),
+                'end': round(end * self.resolution, 1),
+                # Direction in the x/z plane; which one is "left" depends on the
+                # game's axis convention
+                'direction': "L" if curvature[apex] > 0 else "R",
+            })
+        return corners
+
+    def _build_segments(self):
+        # Alternating straights and corners covering the whole lap
+        self.segments = []
+        position = 0.0
+        for corner in self.corners:
+            if corner['start'] > position:
+                self.segments.append({'start': position, 'end': corner['start'], 'corner': None})
+            self.segments.append({'start': corner['start'], 'end': corner['end'], 'corner': corner['id']})
+            position = corner['end']
+        if position < self.track_length or not self.segments:
+            self.segments.append({'start': position, 'end': self.track_length, 'corner': None})
+        self.segment_starts = [s['start'] for s in self.segments]
+
+    def segment_at(self, distance):
+        # (segment index, corner id or None) for a lap distance
+        i = max(bisect.bisect_right(self.segment_starts, distance) - 1, 0)
+        return i, self.segments[i]['corner']
+
+    # --- Spatial index -------------------------------------------------------
+
+    def _cell(self, x, z):
+        return int(math.floor(x / GRID_CELL)), int(math.floor(z / GRID_CELL))
+
+    def _build_grid(self):
+        self.grid = {}
+        for i in range(len(self.xs)):
+            self.grid.setdefault(self._cell(self.xs[i], self.zs[i]), []).append(i)
+
+    def nearest_point(self, x, y, z):
+        # Index of the nearest centre line point within MAX_OFFSET, else None.
+        # Searches rings of cells outwards and stops once no farther ring can
+        # hold a closer point.
+        cx, cz = self._cell(x, z)
+        reach = int(math.ceil(MAX_OFFSET / GRID_CELL))
+        best = None
+        best_d2 = MAX_OFFSET * MAX_OFFSET
+        for r in range(reach + 1):
+            for gx in range(cx - r, cx + r + 1):
+                edge = gx == cx - r or gx == cx + r
+                for gz in (range(cz - r, cz + r + 1) if edge else (cz - r, cz + r)):
+                    for i in self.grid.get((gx, gz), ()):
+                        # Height counts too, so bridges over the track are told apart
+                        d2 = (self.xs[i] - x) ** 2 + (self.ys[i] - y) ** 2 + (self.zs[i] - z) ** 2
+                        if d2 < best_d2:
+                            best = i
+                            best_d2 = d2
+            if best is not None and best_d2 <= (r * GRID_CELL) ** 2:
+                break
+        return best
+
+    def locate(self, x, y, z):
+        # (lap distance, corner id or None, segment index) for a world
+        # position, or None when it is off the map (e.g. in the pit lane)
+        i = self.nearest_point(x, y, z)
+        if i is None:
+            return None
+        # Project onto the centre line towards the next point for a distance
+        # finer than the map resolution
+        j = (i + 1) % len(self.xs)
+        dx, dz = self.xs[j] - self.xs[i], self.zs[j] - self.zs[i]
+        length2 = dx * dx + dz * dz
+        t = 0.0
+        if length2 > 0:
+            t = ((x - self.xs[i]) * dx + (z - self.zs[i]) * dz) / length2
+            t = min(max(t, -0.5), 1.0)
+        distance = (i + t) * self.resolution % self.track_length
+        segment, corner = self.segment_at(distance)
+        return distance, corner, segment
+
+    def locate_participants(self, data):
+        # locate() for every active participant, indexed like mParticipantInfo
+        result = []
+        for i in range(data.mNumParticipants):
+            p = data.mParticipantInfo[i]
+            result.append(self.locate(*p.mWorldPosition) if p.mIsActive else None)
+        return result
+
+    # --- Persistence ---------------------------------------------------------
+
+    def to_dict(self):
+        return {
+            'version': MAP_VERSION,
+            'track_length': self.track_length,
+            'resolution': self.resolution,
+            'laps': self.laps,
+            'corners': self.corners,
+            'x': [round(v, 2) for v in self.xs],
+            'y': [round(v, 2) for v in self.ys],
+            'z': [round(v, 2) for v in self.zs],
+        }
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                d = json.load(f)
+            if d.get('version') != MAP_VERSION:
+                return None
+            return cls(d['track_length'], d['resolution'], d['x'], d['y'], d['z'],
+                       laps=d.get('laps', 0), corners=d['corners'])
+        except Exception as e:
+            print(f"Error loading track map {path}: {e}")
+            return None
+
+class TrackMapper:
+    # Live use: loads the map of the current track, or builds and saves one
+    # from the first clean laps driven there
+    def __init__(self, directory=DEFAULT_DIRECTORY, min_laps=2):
+        self.directory = directory
+        self.min_laps = min_laps
+        self.key = None
+        self.track_map = None
+        self.builder = None
+
+    def update(self, data):
+        # Returns locate() of the viewed car, or None
+        key = (data.mTrackLocation, data.mTrackVariation)
+        if key != self.key:
+            self.key = key
+            self.track_map = TrackMap.load(self._path())
+            self.builder = None
+            if self.track_map is None and data.mTrackLength > 0:
+                self.builder = TrackMapBuilder(data.mTrackLength)
+
+        p = viewed_participant(data)
+        if p is None:
+            return None
+        if self.builder is not None:
+            self.builder.add(p.mCurrentLap, p.mCurrentLapDistance, *p.mWorldPosition,
+                             invalidated=data.mLapInvalidated)
+            if self.builder.laps >= self.min_laps:
+                self.track_map = self.builder.build()
+                self.builder = None
+                try:
+                    self.track_map.save(self._path())
+                except Exception as e:
+                    print(f"Error saving track map: {e}")
+        if self.track_map is None:
+            return None
+        return self.track_map.locate(*p.mWorldPosition)
+
+    def _path(self):
+        return track_map_path(decode_string(self.key[0]), decode_string(self.key[1]), self.directory)
+
+def build_track_map(filenames, track_length=None, resolution=5.0):
+    # Builds a map from recordings of the same track and variation
+    builder = None
+    for filename in filenames:
+        length = track_length or load_metadata(filename).get('track_length')
+        if not length:
+            print(f"Skipping {filename}: unknown track length")
+            continue
+        if builder is None:
+            builder = TrackMapBuilder(length, resolution)
+        columns = ["Lap", "LapDistance", "PosX", "PosY", "PosZ", "LapInvalidated"]
+        for lap, chunk in iter_lap_columns(filename, columns):
+            if "PosX" not in chunk:
+                break # recorded before positions were added
+            rows = zip(chunk["LapDistance"], chunk["PosX"], chunk["PosY"], chunk["PosZ"],
+                       chunk.get("LapInvalidated", [False] * len(chunk["PosX"])))
+            for distance, x, y, z, invalid in rows:
+                builder.add(lap, distance, x, y, z, invalid)
+        # Laps of different files never continue each other
+        if builder.lap is not None:
+            builder._finish_lap()
+            builder.lap = None
+    return builder.build() if builder else None
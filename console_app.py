@@ -1,13 +1,27 @@
 import time
 import os
-import msvcrt
 import sys
 from ams2_reader import AMS2Reader
 from ams2_tyre_analyzer import TyreAnalyzer
 from ams2_lap_manager import LapTimeManager
+from ams2_metrics import LoopMetrics
+from ams2_poller import AdaptivePoller
+from ams2_changes import ChangeDetector, LAP_TIME
+from ams2_lap_buffer import BEST, LapBuffer
+from ams2_lap_compare import LapComparator, biggest_losses
+from ams2_track_map import TrackMapper
+from ams2_sector_tracker import SectorTracker
+from ams2_events import DrivingEventDetector
+
+try:
+    import msvcrt # Windows only; without it the keyboard shortcuts are disabled
+except ImportError:
+    msvcrt = None
 
 import ctypes
 
+RENDER_INTERVAL = 0.1 # seconds between screen refreshes
+
 def clear_screen():
     # Use ctypes to move cursor to (0,0) on Windows to avoid flickering and scrolling
     try:
@@ -34,13 +48,254 @@ def print_header():
     print("==================================================")
     print("       AMS2 TELEMETRY MONITOR (Standalone)        ")
     print("==================================================")
-    print("Press 'Ctrl+C' to exit.")
+    print("Press 'Ctrl+C' to exit, 'd' for debug screen, 'm' to dump metrics.")
     print("--------------------------------------------------")
 
+def get_viewed_lap(data):
+    # mCurrentLap is in ParticipantInfo, not top-level
+    viewed_idx = data.mViewedParticipantIndex
+    if 0 <= viewed_idx < data.mNumParticipants:
+        return data.mParticipantInfo[viewed_idx].mCurrentLap
+    return 0
+
+def handle_events(data, events, analyzer, lap_manager):
+    # Reacts to changes reported by the ChangeDetector instead of checking the
+    # same fields on every frame. Pit entry is handled by TyreAnalyzer itself.
+    for event in events:
+        if event.kind == LAP_TIME and event.new > 0 and data.mGameState in (2, 4):
+            car_name = data.mCarName.decode('utf-8', errors='ignore').strip()
+            track_name = data.mTrackLocation.decode('utf-8', errors='ignore').strip()
+            lap_manager.save_best_lap(car_name, track_name, event.new)
+
+def analyze_frame(data, analyzer, lap_manager):
+    # Feeds the analyzers with one frame and returns the tyre analysis (or None).
+    # Split from render_frame so analysis and rendering can be timed separately.
+    if data.mGameState == 2 or data.mGameState == 4:
+        # Update Analyzer with Lap Count
+        # Note: mCurrentLap is 1-based. Completed laps = mCurrentLap - 1 (roughly)
+        # But AMS2 mCurrentLap starts at 1. So if we are in lap 1, we completed 0.
+        current_lap = get_viewed_lap(data)
+        laps_completed = current_lap - 1 if current_lap > 0 else 0
+        analyzer.update_context(data)
+        analyzer.update(data, laps_completed)
+    if data.mGameState in (2, 3, 4):
+        return analyzer.get_analysis()
+    return None
+
+def format_delta(delta):
+    if delta is None: return "--"
+    return f"{delta:+.3f}"
+
+def compare_to_best(comparator, lap_buffer, lap, track_map=None):
+    # Segments of the track map when there is one, fixed 200 m pieces otherwise
+    segments = track_map.segments if track_map else None
+    if segments is not comparator.segments:
+        comparator.set_segments(segments)
+    comparator.add_from_buffer("last", lap_buffer, lap)
+    comparator.add_from_buffer("best", lap_buffer, BEST)
+    return comparator.compare("last", "best")
+
+EVENT_LABELS = {
+    "lockup": "Blockieren",
+    "wheelspin": "Durchdrehen",
+    "off_track": "Neben der Strecke",
+    "impact": "Kontakt",
+}
+
+def render_frame(data, analyzer, lap_manager, analysis, lap_buffer=None, location=None, sector_tracker=None,
+                 driving_events=None, lap_comparison=None):
+    # Renders one frame of the monitor. Kept free of screen handling so it can
+    # be driven with synthetic frames (see ams2_benchmark.py).
+    if data.mGameState == 2 or data.mGameState == 4: # 2 = Playing, 4 = In Menu/Pit
+        print_header()
+        
+        # Debug Info
+        print(f"DEBUG: Version={data.mVersion} | Build={data.mBuildVersionNumber}")
+        print(f"DEBUG: ViewedPartIdx={data.mViewedParticipantIndex} | NumPart={data.mNumParticipants}")
+        
+        # Basic Info
+        state_desc = "Playing" if data.mGameState == 2 else "In Menu/Pit (Time Ticking)"
+        print(f"SESSION STATE: {data.mSessionState} | GAME STATE: {data.mGameState} ({state_desc})")
+        
+        # Strings (Check if these are readable)
+        car_name = data.mCarName.decode('utf-8', errors='ignore').strip()
+        track_name = data.mTrackLocation.decode('utf-8', errors='ignore').strip()
+        print(f"CAR:   '{car_name}'")
+        print(f"TRACK: '{track_name}'")
+        
+        # Weather & Track Info
+        print(f"COND:  Air: {data.mAmbientTemperature:.1f}C | Track: {data.mTrackTemperature:.1f}C | Rain: {data.mRainDensity:.2f}")
+        
+        # Lap Times
+        current_lap = get_viewed_lap(data)
+
+        last_lap_time = data.mLastLapTime
+        
+        best_lap_record = lap_manager.get_best_lap(car_name, track_name)
+        best_lap_str = f"{format_time(best_lap_record[0])} ({best_lap_record[1]})" if best_lap_record else "Noch keine"
+        
+        print("\n--- RUNDENZEITEN ---")
+        print(f"Aktuelle Runde: {current_lap}")
+        print(f"Letzte Runde:   {format_time(last_lap_time)}")
+        print(f"Beste Runde:    {best_lap_str}")
+        if lap_buffer is not None and 0 <= data.mViewedParticipantIndex < data.mNumParticipants:
+            # Live delta from the in-memory lap buffer (best lap of this session)
+            distance = data.mParticipantInfo[data.mViewedParticipantIndex].mCurrentLapDistance
+            print(f"Delta Best:     {format_delta(lap_buffer.time_delta(distance))} | "
+                  f"Delta Vorrunde: {format_delta(lap_buffer.time_delta(distance, reference=current_lap - 1))}")
+        if sector_tracker is not None:
+            sectors = []
+            for i, entry in enumerate(sector_tracker.current_lap()):
+                sectors.append(f"S{i + 1} {entry[0]:.3f} ({format_delta(entry[1])})" if entry else f"S{i + 1} --")
+            print(f"Sektoren:       {' | '.join(sectors)}")
+            theoretical = sector_tracker.get_theoretical_best(car_name, track_name)
+            print(f"Theor. Best:    {format_time(theoretical) if theoretical else 'Noch keine'}")
+        if location:
+            # From the track map: lap distance, corner id, segment index
+            section = f"Kurve {location[1]}" if location[1] else "Gerade"
+            print(f"Abschnitt:      {section} (Segment {location[2] + 1}, {location[0]:.0f} m)")
+        if lap_comparison:
+            # Last lap vs best lap, where the time was lost
+            losses = []
+            for segment in biggest_losses(lap_comparison):
+                section = f"Kurve {segment['corner']}" if segment['corner'] else f"{segment['start']:.0f}-{segment['end']:.0f} m"
+                losses.append(f"{section} +{segment['time_loss']:.3f}")
+            print(f"Verlust Vorrunde: {' | '.join(losses) if losses else '--'}")
+        if driving_events:
+            print("\n--- EREIGNISSE ---")
+            for event in reversed(driving_events):
+                wheel = f" {event.wheel}" if event.wheel else ""
+                print(f"Runde {event.lap} @ {event.distance:.0f} m: {EVENT_LABELS.get(event.kind, event.kind)}{wheel} ({event.duration:.2f}s)")
+        
+        print("\n--- DRIVING DATA ---")
+        print(f"SPEED:    {data.mSpeed * 3.6:6.1f} km/h")
+        print(f"RPM:      {data.mRpm:6.0f}")
+        print(f"GEAR:     {data.mGear}")
+        
+        # Pedals
+        print(f"THROTTLE: {data.mThrottle*100:5.1f}%")
+        print(f"BRAKE:    {data.mBrake*100:5.1f}%")
+        
+        # Tyres
+        temps = [t for t in data.mTyreTemp]
+        print("\n--- TYRE TEMPS (C) ---")
+        print(f"FL: {temps[0]:3.0f} | FR: {temps[1]:3.0f}")
+        print(f"RL: {temps[2]:3.0f} | RR: {temps[3]:3.0f}")
+
+        # Print Analyzer Output
+        print("\n--- REIFEN INGENIEUR ---")
+        print(f"Status: {analyzer.get_status()}")
+        
+        if analysis:
+            print(f"{'Reifen':<6} | {'Temp':<6} | {'Druck-Status':<12} | {'Druck-Action':<22} | {'Sturz-Action':<25}")
+            print("-" * 85)
+            for tyre in ["FL", "FR", "RL", "RR"]:
+                info = analysis[tyre]
+                print(f"{tyre:<6} | {info['temp']:5.1f}C | {info['status']:<12} | {info['action']:<22} | {info['camber_action']:<25}")
+                if info['details']:
+                    print(f"       -> {info['details']}")
+        
+        if data.mSpeed == 0 and data.mRpm == 0:
+            print("\n[WARNING] All values are ZERO? Checking raw bytes...")
+            # If we could inspect raw memory here it would be good, but for now let's rely on the strings.
+            if not car_name:
+                print("-> Car Name is empty. Struct might be completely misaligned or empty.")
+
+    elif data.mGameState == 3:
+        # PAUSE MODE
+        print("==================================================")
+        print("       PAUSE - SETUP EMPFEHLUNGEN                 ")
+        print("==================================================")
+        
+        if analysis:
+            print("\n--- REIFEN & STURZ ANALYSE ---")
+            print(f"{'Reifen':<6} | {'Temp':<6} | {'Druck-Status':<12} | {'Druck-Action':<22} | {'Sturz-Action':<25}")
+            print("-" * 85)
+            for tyre in ["FL", "FR", "RL", "RR"]:
+                info = analysis[tyre]
+                print(f"{tyre:<6} | {info['temp']:5.1f}C | {info['status']:<12} | {info['action']:<22} | {info['camber_action']:<25}")
+                
+                # Detailed reasoning for Pause Mode
+                if info['details']:
+                    print(f"       -> {info['details']}")
+                if 'layers' in info:
+                    layers = info['layers']
+                    print(f"       -> Lauffläche {layers['tread']:.1f}C | Karkasse {layers['carcass']:.1f}C | "
+                          f"Felge {layers['rim']:.1f}C | Luft {layers['air']:.1f}C | Druck {info['pressure']:.2f}")
+                
+                # Camber reasoning
+                if "VERRINGERN" in info['camber_action']:
+                    diff = info['temp_inner'] - info['temp_outer']
+                    print(f"       -> GRUND: Innen zu kalt (Delta: {diff:.1f}C). Kontaktfläche muss nach innen.")
+                elif "ERHÖHEN" in info['camber_action']:
+                    diff = info['temp_inner'] - info['temp_outer']
+                    print(f"       -> GRUND: Innen zu heiß (Delta: {diff:.1f}C). Kontaktfläche muss nach außen.")
+                    
+            print("\n[HINWEIS] Ändere diese Einstellungen im Setup-Menü.")
+        else:
+            print("\nNoch nicht genügend Daten für eine Analyse gesammelt.")
+            print(f"Status: {analyzer.get_status()}")
+
+    else:
+        # Game is running but not in a race/driving state
+        print_header()
+        print("Game is running but not in driving mode.")
+        print(f"GameState: {data.mGameState} (1=Menu, 2=Playing, 3=Paused)")
+        print("Waiting for race to start...")
+
+class ConsolePipeline:
+    # Everything the console does with a frame: analysis of every new frame
+    # (process) and the main screen (render). Shared with the console_loop
+    # benchmark, so it measures the real per-frame work.
+    def __init__(self, analyzer=None, lap_manager=None, sector_tracker=None):
+        self.analyzer = analyzer or TyreAnalyzer(full_rate=True)
+        self.lap_manager = lap_manager or LapTimeManager()
+        self.sector_tracker = sector_tracker or SectorTracker()
+        self.detector = ChangeDetector()
+        self.lap_buffer = LapBuffer()
+        self.track_mapper = TrackMapper()
+        self.event_detector = DrivingEventDetector()
+        self.comparator = LapComparator()
+        self.lap_comparison = None
+        self.location = None
+        self.analysis = None
+
+    def process(self, data):
+        handle_events(data, self.detector.update(data), self.analyzer, self.lap_manager)
+        finished = self.lap_buffer.update(data)
+        self.location = self.track_mapper.update(data)
+        if finished and self.lap_buffer.lap_info(BEST):
+            self.lap_comparison = compare_to_best(self.comparator, self.lap_buffer, finished['lap'],
+                                                  self.track_mapper.track_map)
+        self.sector_tracker.update(data)
+        self.event_detector.update(data)
+        self.analysis = analyze_frame(data, self.analyzer, self.lap_manager)
+
+    def render(self, data):
+        render_frame(data, self.analyzer, self.lap_manager, self.analysis, self.lap_buffer, self.location,
+                     self.sector_tracker, self.event_detector.recent, self.lap_comparison)
+
+    def close(self):
+        self.analyzer.save_state()
+        self.sector_tracker.close()
+
+def render_debug(metrics):
+    print("==================================================")
+    print("       DEBUG - LOOP METRICS                       ")
+    print("==================================================")
+    print("Press 'd' to return, 'm' to dump metrics to a file.")
+    print("--------------------------------------------------")
+    for line in metrics.format_lines():
+        print(line)
+
 def main():
     reader = AMS2Reader()
-    analyzer = TyreAnalyzer()
-    lap_manager = LapTimeManager()
+    # Warm start from the last run with this car/track/compound
+    pipeline = ConsolePipeline(TyreAnalyzer(full_rate=True, state_file="tyre_state.json", recording_dir="data"))
+    metrics = LoopMetrics()
+    poller = AdaptivePoller()
+    show_debug = False
+    last_render = 0.0
     
     print_header()
     print("Connecting to AMS2 Shared Memory ($pcars2$)...")
@@ -57,137 +312,43 @@ def main():
 
     try:
         while True:
+            if msvcrt and msvcrt.kbhit():
+                key = msvcrt.getch().lower()
+                if key == b'd':
+                    show_debug = not show_debug
+                elif key == b'm':
+                    dumped = metrics.dump()
+                    if dumped:
+                        print(f"\nMetrics written to {dumped}")
+
+            poller.wait()
+            frame_start = time.perf_counter_ns()
             data = reader.read()
+            mark = metrics.lap("read", frame_start)
+            is_new = poller.observe(data)
             
-            if data and (data.mGameState == 2 or data.mGameState == 4): # 2 = Playing, 4 = In Menu/Pit
-                clear_screen()
-                print_header()
-                
-                # Debug Info
-                print(f"DEBUG: Version={data.mVersion} | Build={data.mBuildVersionNumber}")
-                print(f"DEBUG: ViewedPartIdx={data.mViewedParticipantIndex} | NumPart={data.mNumParticipants}")
-                
-                # Basic Info
-                state_desc = "Playing" if data.mGameState == 2 else "In Menu/Pit (Time Ticking)"
-                print(f"SESSION STATE: {data.mSessionState} | GAME STATE: {data.mGameState} ({state_desc})")
-                
-                # Strings (Check if these are readable)
-                car_name = data.mCarName.decode('utf-8', errors='ignore').strip()
-                track_name = data.mTrackLocation.decode('utf-8', errors='ignore').strip()
-                print(f"CAR:   '{car_name}'")
-                print(f"TRACK: '{track_name}'")
-                
-                # Weather & Track Info
-                print(f"COND:  Air: {data.mAmbientTemperature:.1f}C | Track: {data.mTrackTemperature:.1f}C | Rain: {data.mRainDensity:.2f}")
-                
-                # Lap Times
-                # mCurrentLap is in ParticipantInfo, not top-level
-                viewed_idx = data.mViewedParticipantIndex
-                current_lap = 0
-                if 0 <= viewed_idx < data.mNumParticipants:
-                     current_lap = data.mParticipantInfo[viewed_idx].mCurrentLap
-
-                last_lap_time = data.mLastLapTime
-                
-                # Save best lap if valid
-                if last_lap_time > 0:
-                    lap_manager.save_best_lap(car_name, track_name, last_lap_time)
-                
-                best_lap_record = lap_manager.get_best_lap(car_name, track_name)
-                best_lap_str = f"{format_time(best_lap_record[0])} ({best_lap_record[1]})" if best_lap_record else "Noch keine"
-                
-                print("\n--- RUNDENZEITEN ---")
-                print(f"Aktuelle Runde: {current_lap}")
-                print(f"Letzte Runde:   {format_time(last_lap_time)}")
-                print(f"Beste Runde:    {best_lap_str}")
-                
-                print("\n--- DRIVING DATA ---")
-                print(f"SPEED:    {data.mSpeed * 3.6:6.1f} km/h")
-                print(f"RPM:      {data.mRpm:6.0f}")
-                print(f"GEAR:     {data.mGear}")
-                
-                # Pedals
-                print(f"THROTTLE: {data.mThrottle*100:5.1f}%")
-                print(f"BRAKE:    {data.mBrake*100:5.1f}%")
-                
-                # Tyres
-                temps = [t for t in data.mTyreTemp]
-                print("\n--- TYRE TEMPS (C) ---")
-                print(f"FL: {temps[0]:3.0f} | FR: {temps[1]:3.0f}")
-                print(f"RL: {temps[2]:3.0f} | RR: {temps[3]:3.0f}")
-
-                # Update Analyzer with Lap Count
-                # Note: mCurrentLap is 1-based. Completed laps = mCurrentLap - 1 (roughly)
-                # But AMS2 mCurrentLap starts at 1. So if we are in lap 1, we completed 0.
-                laps_completed = current_lap - 1 if current_lap > 0 else 0
-                analyzer.update(data, laps_completed)
-                
-                # Print Analyzer Output
-                print("\n--- REIFEN INGENIEUR ---")
-                print(f"Status: {analyzer.get_status()}")
-                
-                analysis = analyzer.get_analysis()
-                if analysis:
-                    print(f"{'Reifen':<6} | {'Temp':<6} | {'Druck-Status':<12} | {'Druck-Action':<22} | {'Sturz-Action':<25}")
-                    print("-" * 85)
-                    for tyre in ["FL", "FR", "RL", "RR"]:
-                        info = analysis[tyre]
-                        print(f"{tyre:<6} | {info['temp']:5.1f}C | {info['status']:<12} | {info['action']:<22} | {info['camber_action']:<25}")
-                        if info['details']:
-                            print(f"       -> {info['details']}")
-                
-                if data.mSpeed == 0 and data.mRpm == 0:
-                    print("\n[WARNING] All values are ZERO? Checking raw bytes...")
-                    # If we could inspect raw memory here it would be good, but for now let's rely on the strings.
-                    if not car_name:
-                        print("-> Car Name is empty. Struct might be completely misaligned or empty.")
-
-            elif data and data.mGameState == 3:
-                # PAUSE MODE
-                clear_screen()
-                print("==================================================")
-                print("       PAUSE - SETUP EMPFEHLUNGEN                 ")
-                print("==================================================")
-                
-                analysis = analyzer.get_analysis()
-                if analysis:
-                    print("\n--- REIFEN & STURZ ANALYSE ---")
-                    print(f"{'Reifen':<6} | {'Temp':<6} | {'Druck-Status':<12} | {'Druck-Action':<22} | {'Sturz-Action':<25}")
-                    print("-" * 85)
-                    for tyre in ["FL", "FR", "RL", "RR"]:
-                        info = analysis[tyre]
-                        print(f"{tyre:<6} | {info['temp']:5.1f}C | {info['status']:<12} | {info['action']:<22} | {info['camber_action']:<25}")
-                        
-                        # Detailed reasoning for Pause Mode
-                        if info['details']:
-                            print(f"       -> {info['details']}")
-                        
-                        # Camber reasoning
-                        if "VERRINGERN" in info['camber_action']:
-                            diff = info['temp_inner'] - info['temp_outer']
-                            print(f"       -> GRUND: Innen zu kalt (Delta: {diff:.1f}C). Kontaktfläche muss nach innen.")
-                        elif "ERHÖHEN" in info['camber_action']:
-                            diff = info['temp_inner'] - info['temp_outer']
-                            print(f"       -> GRUND: Innen zu heiß (Delta: {diff:.1f}C). Kontaktfläche muss nach außen.")
-                            
-                    print("\n[HINWEIS] Ändere diese Einstellungen im Setup-Menü.")
-                else:
-                    print("\nNoch nicht genügend Daten für eine Analyse gesammelt.")
-                    print(f"Status: {analyzer.get_status()}")
-
-            elif data:
-                # Game is running but not in a race/driving state
-                clear_screen()
-                print_header()
-                print("Game is running but not in driving mode.")
-                print(f"GameState: {data.mGameState} (1=Menu, 2=Playing, 3=Paused)")
-                print("Waiting for race to start...")
-            
+            if data:
+                metrics.observe_frame(data)
+                if is_new:
+                    pipeline.process(data)
+                    mark = metrics.lap("analysis", mark)
+
+                # Frames are analyzed at the game's rate, the screen is redrawn
+                # at most every RENDER_INTERVAL seconds
+                now = time.perf_counter()
+                if now - last_render >= RENDER_INTERVAL:
+                    last_render = now
+                    metrics.set_gauge("publish_rate_hz", round(poller.publish_rate(), 1))
+                    clear_screen()
+                    if show_debug:
+                        render_debug(metrics)
+                    else:
+                        pipeline.render(data)
+                    mark = metrics.lap("render", mark)
+                metrics.record("frame", mark - frame_start)
             else:
                 print("Lost connection to shared memory?", end="\r")
 
-            time.sleep(0.1)
-
     except KeyboardInterrupt:
         print("\nExiting...")
     except Exception as e:
@@ -197,6 +358,7 @@ def main():
         print(f"\nError: {e}")
         input("\nPress Enter to exit...")
     finally:
+        pipeline.close()
         reader.close()
         print("Disconnected.")
 
@@ -0,0 +1,52 @@
+import unittest
+import json
+import shutil
+import tempfile
+from ams2_batch import derived_path, is_up_to_date, run_batch, tyre_recommendation
+from ams2_tyre_analyzer import TyreAnalyzer
+from ams2_recorder import DataRecorder
+from ams2_synthetic import SyntheticSession
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp(prefix="test_batch_")
+        self.files = []
+        for lap_time in (1.0, 1.5):
+            session = SyntheticSession(lap_time=lap_time)
+            recorder = DataRecorder(self.output_dir)
+            recorder.start()
+            for _ in range(200):
+                recorder.record_frame(session.advance())
+            recorder.stop()
+            self.files.append(recorder.filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def test_batch_and_resume(self):
+        self.assertEqual(run_batch(self.output_dir, workers=2), 2)
+        for filename in self.files:
+            self.assertTrue(is_up_to_date(filename))
+        with open(derived_path(self.files[0]), encoding='utf-8') as f:
+            derived = json.load(f)
+        self.assertEqual([l['lap'] for l in derived['laps']], [1, 2, 3, 4])
+        self.assertEqual(derived['summary']['frames'], 200)
+        self.assertAlmostEqual(derived['best_lap']['lap_time'], 1.0, places=1)
+        self.assertEqual(set(derived['tyres']), {"FL", "FR", "RL", "RR"})
+
+        # Nothing left to do; a changed recording is picked up again
+        self.assertEqual(run_batch(self.output_dir, workers=2), 0)
+        with open(self.files[1], 'a') as f:
+            f.write("\n")
+        self.assertFalse(is_up_to_date(self.files[1]))
+        self.assertEqual(run_batch(self.output_dir, workers=2), 1)
+
+    def test_tyre_recommendation_matches_analyzer(self):
+        advice = tyre_recommendation({"TyreTemp_FL_twmean": 80.0, "TyreTemp_FR_twmean": 95.0})
+        self.assertEqual(sorted(advice), ["FL", "FR"])
+        live = TyreAnalyzer()._tyre_result(0, 80.0, 80.0, 80.0, 80.0, 80.0, 85.0, 90.0)
+        self.assertEqual((advice['FL']['status'], advice['FL']['action']), (live['status'], live['action']))
+        self.assertEqual(advice['FR']['status'], "Zu HEISS")
+
+if __name__ == '__main__':
+    unittest.main()
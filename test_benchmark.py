@@ -0,0 +1,20 @@
+import unittest
+from ams2_benchmark import run_all, compare, BENCHMARKS
+
+class TestBenchmark(unittest.TestCase):
+    def test_all_benchmarks_run(self):
+        # Tiny iteration counts: this only checks that every benchmark still works
+        report = run_all(scale=0.001, repeat=1)
+        self.assertEqual(set(report['results']), set(BENCHMARKS))
+        for result in report['results'].values():
+            self.assertGreater(result['median_ns_per_op'], 0)
+
+    def test_compare_flags_regression(self):
+        old = {'results': {'a': {'median_ns_per_op': 100.0}, 'b': {'median_ns_per_op': 100.0}}}
+        new = {'results': {'a': {'median_ns_per_op': 150.0}, 'b': {'median_ns_per_op': 101.0}}}
+        rows = {r[0]: r for r in compare(new, old, threshold=0.10)}
+        self.assertTrue(rows['a'][4])
+        self.assertFalse(rows['b'][4])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import csv
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+from ams2_blocks import BlockWriter, journal_path, read_journal, recover
+from ams2_recorder import DataRecorder, HEADER
+from ams2_synthetic import SyntheticSession
+
+class TestBlocks(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="test_blocks_")
+        self.filename = os.path.join(self.directory, "telemetry_test.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write_blocks(self, blocks=3, rows=10):
+        writer = BlockWriter(self.filename, sync_interval=3600, sync_bytes=10**9)
+        csv_writer = csv.writer(writer)
+        for b in range(blocks):
+            for r in range(rows):
+                csv_writer.writerow([b, r, "x" * 20])
+            writer.commit()
+        writer.close()
+        return os.path.getsize(self.filename)
+
+    def test_clean_file(self):
+        size = self.write_blocks()
+        self.assertEqual(len(read_journal(journal_path(self.filename))), 3)
+        self.assertEqual(recover(self.filename, verify_all=True), (size, 0))
+
+    def test_truncates_unjournaled_tail_and_corrupt_block(self):
+        size = self.write_blocks()
+        with open(self.filename, 'ab') as f:
+            f.write(b"3,0,xxxx\r\n3,1,xx") # written but never committed
+        with open(journal_path(self.filename), 'ab') as f:
+            f.write(b"\x01\x02\x03") # torn journal record
+        self.assertEqual(recover(self.filename), (size, 16))
+        self.assertEqual(os.path.getsize(self.filename), size)
+
+        # A damaged last block is dropped, the blocks before it stay
+        block_size = size // 3
+        with open(self.filename, 'r+b') as f:
+            f.seek(size - 5)
+            f.write(b"?")
+        kept, dropped = recover(self.filename)
+        self.assertEqual(kept, 2 * block_size)
+        with open(self.filename, newline='') as f:
+            self.assertEqual(len(list(csv.reader(f))), 20)
+        self.assertEqual(len(read_journal(journal_path(self.filename))), 2)
+
+    def test_without_journal_cuts_partial_row(self):
+        with open(self.filename, 'wb') as f:
+            f.write(b"a,b\r\n1,2\r\n3,")
+        self.assertEqual(recover(self.filename), (10, 2))
+        with open(self.filename, 'rb') as f:
+            self.assertEqual(f.read(), b"a,b\r\n1,2\r\n")
+
+    def test_crash_safe_recorder(self):
+        session = SyntheticSession()
+        recorder = DataRecorder(self.directory, crash_safe=True, sync_bytes=4096)
+        recorder.start()
+        for _ in range(200):
+            recorder.record_frame(session.advance())
+        recorder.stop()
+        with open(recorder.filename, newline='') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], HEADER)
+        self.assertEqual(len(rows), 201)
+        self.assertGreater(len(read_journal(journal_path(recorder.filename))), 3)
+        self.assertEqual(recover(recorder.filename, verify_all=True)[1], 0)
+
+    def test_idle_commit_error_keeps_writer(self):
+        recorder = DataRecorder(self.directory, crash_safe=True, sync_interval=0.01)
+        recorder.start()
+        with mock.patch.object(recorder.file_handle, 'commit_due', side_effect=OSError("disk full")):
+            time.sleep(0.05) # idle: the writer tries to commit and fails
+        self.assertTrue(recorder.writer_thread.is_alive())
+        session = SyntheticSession()
+        for _ in range(20):
+            recorder.record_frame(session.advance())
+        recorder.stop()
+        with open(recorder.filename, newline='') as f:
+            self.assertEqual(len(list(csv.reader(f))), 21)
+
+    def test_sync_bytes_counts_bytes(self):
+        writer = BlockWriter(self.filename, sync_interval=3600, sync_bytes=1000)
+        writer.write("ä" * 600) # 600 characters, 1200 bytes
+        self.assertEqual(writer.blocks, 1)
+        writer.close()
+
+    def test_failed_commit_keeps_rows(self):
+        writer = BlockWriter(self.filename, sync_interval=3600, sync_bytes=10**9)
+        writer.write("a,b\r\n")
+        writer.commit()
+        writer.write("1,2\r\n")
+        with mock.patch.object(writer, '_sync', side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                writer.commit()
+        self.assertEqual(writer.pending_size, 5)
+        writer.close() # retried, this time successfully
+        self.assertEqual(len(read_journal(journal_path(self.filename))), 2)
+        self.assertEqual(recover(self.filename, verify_all=True), (10, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import os
+import shutil
+import tempfile
+from ams2_catalog import SessionCatalog, summarize_recording
+from ams2_recorder import DataRecorder, metadata_path
+from ams2_synthetic import SyntheticSession
+
+class TestSessionCatalog(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp(prefix="test_catalog_")
+        self.catalog = SessionCatalog(os.path.join(self.output_dir, "catalog.sqlite"))
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def record(self, car, track, frames=350):
+        # 10 s laps at 10 Hz
+        session = SyntheticSession(car=car, track=track, lap_time=10.0, rate_hz=10.0)
+        recorder = DataRecorder(self.output_dir)
+        recorder.file_closed_callbacks.append(self.catalog.add_recording)
+        recorder.start()
+        for _ in range(frames):
+            recorder.record_frame(session.advance())
+        recorder.stop()
+        return recorder.filename
+
+    def test_incremental_add_on_stop(self):
+        self.record("GT3 Car", "Interlagos")
+        self.record("Formula Vee", "Interlagos")
+        self.record("GT3 Car", "Spa")
+
+        rows = self.catalog.query(track="Interlagos", car="GT3 Car")
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['laps'], 3)
+        self.assertAlmostEqual(rows[0]['best_lap'], 10.0, places=2)
+        self.assertEqual(rows[0]['frames'], 350)
+        self.assertEqual(len(self.catalog.query(track="Interlagos")), 2)
+
+    def test_scan_matches_recorder_summary(self):
+        filename = self.record("GT3 Car", "Interlagos")
+        from_metadata = summarize_recording(filename)
+        os.remove(metadata_path(filename))
+        scanned = summarize_recording(filename)
+        for key in ('laps', 'best_lap', 'frames', 'track_temp_avg', 'rain_max'):
+            self.assertEqual(scanned[key], from_metadata[key], key)
+
+    def test_rebuild_and_prune(self):
+        first = self.record("GT3 Car", "Interlagos")
+        self.record("GT3 Car", "Spa")
+        catalog = SessionCatalog(os.path.join(self.output_dir, "rebuilt.sqlite"))
+        self.assertEqual(catalog.rebuild(self.output_dir, workers=2), 2)
+        self.assertEqual(catalog.rebuild(self.output_dir, workers=2), 0) # nothing changed
+        os.remove(first)
+        self.assertEqual(catalog.prune(), 1)
+        self.assertEqual([r['track'] for r in catalog.query()], ["Spa"])
+
+if __name__ == '__main__':
+    unittest.main()
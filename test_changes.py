@@ -0,0 +1,51 @@
+import unittest
+from ams2_changes import ChangeDetector, DAMAGE, FLAG, LAP, PIT_MODE, TYRE_COMPOUND
+from ams2_structs import FLAG_COLOUR_YELLOW, PIT_MODE_IN_PIT
+from ams2_synthetic import SyntheticSession
+
+class TestChangeDetector(unittest.TestCase):
+    def setUp(self):
+        self.session = SyntheticSession(lap_time=1.0)
+        self.detector = ChangeDetector()
+
+    def test_first_frame_reports_everything(self):
+        events = self.detector.update(self.session.advance())
+        kinds = {e.kind for e in events}
+        self.assertIn(PIT_MODE, kinds)
+        self.assertIn(LAP, kinds)
+        self.assertTrue(all(e.old is None for e in events))
+        compound = next(e for e in events if e.kind == TYRE_COMPOUND)
+        self.assertEqual(compound.new, ("Slick",) * 4)
+
+    def test_only_changed_fields(self):
+        self.detector.update(self.session.advance())
+        # Speed, temperatures etc. change every frame but are not watched
+        self.assertEqual(self.detector.update(self.session.advance()), [])
+
+        data = self.session.advance()
+        data.mHighestFlagColour = FLAG_COLOUR_YELLOW
+        data.mBrakeDamage[1] = 0.25
+        events = self.detector.update(data)
+        self.assertEqual(sorted(e.kind for e in events), [DAMAGE, FLAG])
+        flag = next(e for e in events if e.kind == FLAG)
+        self.assertEqual((flag.old, flag.new), (0, FLAG_COLOUR_YELLOW))
+        damage = next(e for e in events if e.kind == DAMAGE)
+        self.assertEqual(damage.new['mBrakeDamage'][1], 0.25)
+
+    def test_subscribe_and_lap(self):
+        seen = []
+        self.detector.subscribe(PIT_MODE, seen.append)
+        laps = []
+        self.detector.subscribe(LAP, lambda e: laps.append(e.new))
+        self.detector.update(self.session.advance())
+        data = self.session.advance()
+        data.mPitMode = PIT_MODE_IN_PIT
+        self.detector.update(data)
+        for _ in range(70): # one lap at 60 Hz
+            self.detector.update(self.session.advance())
+
+        self.assertEqual([(e.old, e.new) for e in seen], [(None, 0), (0, PIT_MODE_IN_PIT)])
+        self.assertEqual(laps, [1, 2])
+
+if __name__ == '__main__':
+    unittest.main()
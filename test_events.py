@@ -0,0 +1,140 @@
+import unittest
+import os
+import csv
+import shutil
+import tempfile
+from ams2_events import (DrivingEventDetector, LOCKUP, WHEELSPIN, OFF_TRACK, IMPACT,
+                         RADIUS_MIN_SAMPLES)
+from ams2_recorder import DataRecorder, EVENT_FIELDS
+from ams2_structs import (
+    TERRAIN_GRASS, TERRAIN_ROAD, TERRAIN_RUNOFF_ROAD, TERRAIN_PAINT_CONCRETE, TERRAIN_RALLY_TARMAC,
+)
+from ams2_synthetic import SyntheticSession
+
+class TestDrivingEvents(unittest.TestCase):
+    def setUp(self):
+        self.session = SyntheticSession(lap_time=30.0)
+        self.detector = DrivingEventDetector()
+        self.t = 0.0
+
+    def frame(self, **overrides):
+        # One synthetic frame at 60 Hz, optionally with inputs overridden
+        data = self.session.advance()
+        self.t += 1.0 / 60
+        for name, value in overrides.items():
+            setattr(data, name, value)
+        return data
+
+    def drive(self, frames, tweak=None, **overrides):
+        events = []
+        for _ in range(frames):
+            data = self.frame(**overrides)
+            if tweak:
+                tweak(data)
+            events += self.detector.update(data, self.t)
+        return events
+
+    def warm_up(self):
+        # Roll freely so every wheel has learned its radius
+        events = self.drive(2 * RADIUS_MIN_SAMPLES, mThrottle=0.3, mBrake=0.0, mSteering=0.0)
+        self.assertEqual(events, [])
+        for r in self.detector.radius:
+            self.assertAlmostEqual(r, 0.3, places=3)
+
+    def test_steady_driving_is_quiet(self):
+        self.warm_up()
+        self.assertEqual(self.drive(600), [])
+
+    def test_lockup_with_hysteresis(self):
+        self.warm_up()
+
+        def lock_front_left(data):
+            data.mTyreRPS[0] *= 0.5 # slip -0.5
+        events = self.drive(30, lock_front_left, mBrake=0.8, mThrottle=0.0)
+        self.assertEqual(events, []) # still locked
+
+        def recovering(data):
+            data.mTyreRPS[0] *= 0.85 # slip -0.15, between the thresholds
+        self.assertEqual(self.drive(10, recovering, mBrake=0.8, mThrottle=0.0), [])
+
+        events = self.drive(1, mBrake=0.0)
+        self.assertEqual(len(events), 1)
+        event = events[0]
+        self.assertEqual((event.kind, event.wheel), (LOCKUP, "FL"))
+        self.assertAlmostEqual(event.duration, 40 / 60, places=2)
+        self.assertAlmostEqual(event.peak, -0.5, places=2)
+        self.assertEqual(event.lap, 1)
+        self.assertGreater(event.distance, 0)
+
+    def test_wheelspin_needs_throttle(self):
+        self.warm_up()
+
+        def spin_rears(data):
+            data.mTyreRPS[2] *= 1.5
+            data.mTyreRPS[3] *= 1.5
+        self.drive(20, spin_rears, mBrake=0.0, mThrottle=0.0) # coasting: no wheelspin
+        self.assertEqual(self.drive(1), [])
+        self.drive(20, spin_rears, mBrake=0.0, mThrottle=1.0)
+        events = self.drive(1, mBrake=0.0, mThrottle=1.0)
+        self.assertEqual(sorted((e.kind, e.wheel) for e in events), [(WHEELSPIN, "RL"), (WHEELSPIN, "RR")])
+
+    def test_off_track_and_impact(self):
+        def grass(count):
+            def tweak(data):
+                for w in range(4):
+                    data.mTerrain[w] = TERRAIN_GRASS if w < count else TERRAIN_ROAD
+            return tweak
+        self.assertEqual(self.drive(10, grass(2)), []) # two wheels off is fine
+        self.drive(10, grass(4))
+        self.assertEqual(self.drive(10, grass(2)), []) # hysteresis
+        events = self.drive(1, grass(0))
+        self.assertEqual([(e.kind, e.peak) for e in events], [(OFF_TRACK, 4)])
+        self.assertAlmostEqual(events[0].duration, 20 / 60, places=2)
+
+        self.assertEqual(self.drive(5, mLastOpponentCollisionMagnitude=50.0), []) # too light
+        events = self.drive(5, mLastOpponentCollisionMagnitude=800.0)
+        self.assertEqual([(e.kind, e.peak) for e in events], [(IMPACT, 800.0)])
+        # Same magnitude, other opponent: a second collision
+        events = self.drive(5, mLastOpponentCollisionIndex=3, mLastOpponentCollisionMagnitude=800.0)
+        self.assertEqual([e.kind for e in events], [IMPACT])
+
+    def test_runoff_is_off_track(self):
+        def surface(terrain):
+            def tweak(data):
+                data.mTerrain[:] = [terrain] * 4
+            return tweak
+        self.drive(10, surface(TERRAIN_PAINT_CONCRETE))
+        self.drive(10, surface(TERRAIN_RALLY_TARMAC))
+        self.assertEqual(self.drive(1, surface(TERRAIN_ROAD)), [])
+        self.drive(10, surface(TERRAIN_RUNOFF_ROAD))
+        events = self.drive(1, surface(TERRAIN_ROAD))
+        self.assertEqual([e.kind for e in events], [OFF_TRACK])
+
+    def test_impact_in_first_frame(self):
+        events = self.drive(3, mLastOpponentCollisionIndex=2, mLastOpponentCollisionMagnitude=500.0)
+        self.assertEqual([(e.kind, e.peak) for e in events], [(IMPACT, 500.0)])
+
+    def test_recorder_writes_events(self):
+        output_dir = tempfile.mkdtemp(prefix="test_events_")
+        try:
+            recorder = DataRecorder(output_dir)
+            recorder.start()
+            def set_terrain(terrain):
+                def tweak(data):
+                    data.mTerrain[:] = [terrain] * 4
+                    recorder.record_frame(data)
+                return tweak
+            self.drive(30, set_terrain(TERRAIN_GRASS))
+            for event in self.drive(1, set_terrain(TERRAIN_ROAD)):
+                recorder.record_event(event)
+            recorder.stop()
+            with open(os.path.splitext(recorder.filename)[0] + ".events.csv", newline='') as f:
+                rows = list(csv.DictReader(f))
+            self.assertEqual(len(rows), 1)
+            self.assertEqual(list(rows[0].keys()), EVENT_FIELDS)
+            self.assertEqual(rows[0]['kind'], OFF_TRACK)
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import shutil
+import tempfile
+from ams2_recorder import DataRecorder, iter_lap_columns
+from ams2_synthetic import SyntheticSession
+
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+    from ams2_export import export_recording, read_session_metadata, read_season
+except ImportError:
+    pyarrow = None
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp(prefix="test_export_")
+        # Three short laps at 10 Hz
+        session = SyntheticSession(lap_time=10.0, rate_hz=10.0)
+        self.recorder = DataRecorder(self.output_dir)
+        self.recorder.start()
+        for _ in range(300):
+            self.recorder.record_frame(session.advance())
+        self.recorder.stop()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def test_iter_lap_columns(self):
+        laps = list(iter_lap_columns(self.recorder.filename, ["Lap", "Speed_Kmh", "LapInvalidated"]))
+        self.assertEqual([lap for lap, _ in laps], [1, 2, 3])
+        lap, columns = laps[0]
+        self.assertEqual(len(columns["Speed_Kmh"]), 100)
+        self.assertIsInstance(columns["Speed_Kmh"][0], float)
+        self.assertIs(columns["LapInvalidated"][0], False)
+
+    @unittest.skipUnless(pyarrow, "pyarrow not installed")
+    def test_parquet_row_group_per_lap(self):
+        path = export_recording(self.recorder.filename)
+        parquet = pq.ParquetFile(path)
+        self.assertEqual(parquet.metadata.num_row_groups, 3)
+        table = pq.read_table(path, columns=["Track", "Gear", "Speed_Kmh"])
+        self.assertEqual(table.num_rows, 300)
+        self.assertTrue(pyarrow.types.is_dictionary(table.schema.field("Track").type))
+        self.assertEqual(table.schema.field("Gear").type, pyarrow.int64())
+        self.assertEqual(table.column("Track")[0].as_py(), "Interlagos")
+        self.assertEqual(read_session_metadata(path)['car'], "Formula Vee")
+        self.assertEqual(read_season(self.output_dir, columns=["Lap"]).num_rows, 300)
+
+    @unittest.skipUnless(pyarrow, "pyarrow not installed")
+    def test_arrow_ipc(self):
+        path = export_recording(self.recorder.filename, fmt="arrow")
+        with pyarrow.memory_map(path) as source:
+            reader = pyarrow.ipc.open_file(source)
+            self.assertEqual(reader.num_record_batches, 3)
+            self.assertEqual(reader.read_all().num_rows, 300)
+        self.assertEqual(read_session_metadata(path)['track'], "Interlagos")
+
+if __name__ == '__main__':
+    unittest.main()
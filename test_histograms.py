@@ -0,0 +1,62 @@
+import unittest
+import shutil
+import tempfile
+from ams2_histograms import HistogramSet, LapHistograms, load_histograms
+from ams2_recorder import DataRecorder
+from ams2_synthetic import SyntheticSession
+
+class FakeFrame:
+    def __init__(self, throttle):
+        self.mThrottle = throttle
+
+CHANNELS = [("Throttle", "mThrottle", 1.0, 0.0, 1.0, 10)]
+
+class TestHistograms(unittest.TestCase):
+    def test_bins_and_percentiles(self):
+        histograms = HistogramSet(CHANNELS)
+        for i in range(100):
+            histograms.update(FakeFrame(i / 100))
+        histograms.update(FakeFrame(-0.5)) # clamped into the first bin
+        histograms.update(FakeFrame(1.0))  # upper edge goes into the last bin
+        counts = list(histograms.channel("Throttle"))
+        self.assertEqual(counts, [11] + [10] * 8 + [11])
+        self.assertEqual(histograms.samples, 102)
+        self.assertAlmostEqual(histograms.percentile("Throttle", 0.5), 0.5, places=2)
+
+        other = histograms.copy()
+        other.merge(histograms)
+        self.assertEqual(sum(other.channel("Throttle")), 204)
+        histograms.clear()
+        self.assertEqual(sum(histograms.channel("Throttle")), 0)
+
+    def test_non_finite_values(self):
+        histograms = HistogramSet(CHANNELS)
+        for value in (float('nan'), float('inf'), float('-inf')):
+            histograms.update(FakeFrame(value))
+        counts = list(histograms.channel("Throttle"))
+        self.assertEqual(counts, [1] + [0] * 8 + [1]) # inf clamped, NaN skipped
+
+    def test_recorder_writes_per_lap_histograms(self):
+        session = SyntheticSession(lap_time=2.0)
+        output_dir = tempfile.mkdtemp(prefix="test_hist_")
+        try:
+            recorder = DataRecorder(output_dir, histograms=LapHistograms())
+            recorder.start()
+            for _ in range(int(2.5 * 2.0 * session.rate_hz)):
+                recorder.record_frame(session.advance())
+            recorder.stop()
+
+            stint, laps = load_histograms(recorder.filename)
+            self.assertEqual(sorted(laps), [1, 2, 3])
+            self.assertEqual(stint.samples, 300)
+            self.assertEqual(laps[1].samples + laps[2].samples + laps[3].samples, 300)
+            # Synthetic ride height is 50 +- 5 mm
+            self.assertAlmostEqual(stint.percentile("RideHeight_FL", 0.5), 50.0, delta=2.0)
+            self.assertGreaterEqual(stint.percentile("RideHeight_FL", 0.02), 44.0)
+            self.assertLessEqual(stint.percentile("RideHeight_FL", 0.98), 56.0)
+            self.assertEqual(len(stint.channel("Brake")), 20)
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    unittest.main()
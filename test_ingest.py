@@ -0,0 +1,125 @@
+import unittest
+import asyncio
+import csv
+import os
+import shutil
+import tempfile
+from ams2_ingest import IngestServer, RigClient, rig_directory, simulate
+from ams2_recorder import list_recordings
+from ams2_synthetic import SyntheticReader, SyntheticSession
+
+def count_rows(directory):
+    rows = 0
+    for filename in list_recordings(directory):
+        with open(filename, newline='') as f:
+            rows += sum(1 for _ in csv.reader(f)) - 1
+    return rows
+
+class TestIngest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="test_ingest_")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_simulated_rigs(self):
+        # Small backlog limit so the backpressure path is exercised too
+        stats = asyncio.run(simulate(rigs=3, frames=300, directory=self.directory, max_backlog=20))
+        self.assertEqual(stats['frames'], 900)
+        self.assertGreater(stats['frames_per_core_second'], 0)
+        for i in range(3):
+            name = f"rig{i + 1}"
+            self.assertEqual(stats['rigs'][name]['frames'], 300)
+            self.assertEqual(count_rows(rig_directory(self.directory, name)), 300)
+
+    def test_reconnect_keeps_recording(self):
+        async def scenario():
+            server = IngestServer(self.directory, host="127.0.0.1", port=0)
+            await server.start()
+            reader = SyntheticReader(SyntheticSession())
+            reader.connect()
+            client = RigClient("car 1", port=server.port, reader=reader, retry_interval=0.05)
+            task = asyncio.create_task(client.run(max_frames=400))
+            while server.stats()['frames'] < 100:
+                await asyncio.sleep(0.001)
+            server.disconnect("car 1")
+            await task
+            while server.stats()['rigs']['car 1']['connected']:
+                await asyncio.sleep(0.01)
+            stats = server.stats()
+            await server.stop()
+            reader.close()
+            return client, stats
+
+        client, stats = asyncio.run(scenario())
+        self.assertEqual(client.connections, 2)
+        self.assertEqual(stats['rigs']['car 1']['connections'], 2)
+        # Frames in flight when the connection dropped are lost, the rest is in one file
+        rig_dir = rig_directory(self.directory, "car 1")
+        self.assertEqual(len(list_recordings(rig_dir)), 1)
+        self.assertGreater(stats['rigs']['car 1']['frames'], 200)
+        self.assertEqual(count_rows(rig_dir), stats['rigs']['car 1']['frames'])
+
+    def test_rejects_wrong_frame_size(self):
+        async def scenario():
+            server = IngestServer(self.directory, host="127.0.0.1", port=0)
+            await server.start()
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            writer.write(RigClient("old")._hello()[:-4] + (1234).to_bytes(4, "little"))
+            await writer.drain()
+            closed = await reader.read() == b""
+            writer.close()
+            await server.stop()
+            return closed, server.rigs
+
+        closed, rigs = asyncio.run(scenario())
+        self.assertTrue(closed)
+        self.assertEqual(rigs, {})
+
+    def test_rejects_wrong_frame_length(self):
+        async def scenario():
+            server = IngestServer(self.directory, host="127.0.0.1", port=0)
+            await server.start()
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            writer.write(RigClient("bad")._hello() + (2**31).to_bytes(4, "little"))
+            await writer.drain()
+            closed = await asyncio.wait_for(reader.read(), 5.0) == b""
+            writer.close()
+            stats = server.stats()
+            await server.stop()
+            return closed, stats
+
+        closed, stats = asyncio.run(scenario())
+        self.assertTrue(closed)
+        self.assertEqual(stats['rigs']['bad']['frames'], 0)
+
+    def test_rig_directory_stays_inside(self):
+        for name in ("..", ".", "../x", "a/../../b"):
+            path = os.path.normpath(rig_directory(self.directory, name))
+            self.assertEqual(os.path.dirname(path), os.path.normpath(self.directory))
+        self.assertEqual(rig_directory("rigs", ".."), os.path.join("rigs", "rig"))
+
+    def test_max_rigs(self):
+        async def scenario():
+            server = IngestServer(self.directory, host="127.0.0.1", port=0, max_rigs=1)
+            await server.start()
+            connections = []
+            for name in ("car1", "car2"):
+                reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+                writer.write(RigClient(name)._hello())
+                await writer.drain()
+                connections.append((reader, writer))
+                while not server.rigs:
+                    await asyncio.sleep(0.001)
+            closed = await asyncio.wait_for(connections[1][0].read(), 5.0) == b""
+            for _, writer in connections:
+                writer.close()
+            await server.stop()
+            return closed, list(server.rigs)
+
+        closed, rigs = asyncio.run(scenario())
+        self.assertTrue(closed)
+        self.assertEqual(rigs, ["car1"])
+
+if __name__ == '__main__':
+    unittest.main()
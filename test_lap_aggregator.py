@@ -0,0 +1,85 @@
+import unittest
+import csv
+import os
+import shutil
+import tempfile
+from ams2_channels import channel_getter, expand_spec
+from ams2_lap_aggregator import ChannelStats, LapAggregator
+from ams2_recorder import DataRecorder, list_recordings
+from ams2_synthetic import SyntheticSession
+
+class TestChannelStats(unittest.TestCase):
+    def test_stats(self):
+        stats = ChannelStats()
+        # 10 for 1 s, then 20 for 3 s, then 0
+        for value, dt in ((10.0, 0.0), (20.0, 1.0), (0.0, 3.0)):
+            stats.add(value, dt)
+        low, high, mean, total, twmean, delta = stats.values()
+        self.assertEqual((low, high, total), (0.0, 20.0, 30.0))
+        self.assertAlmostEqual(mean, 10.0)
+        self.assertAlmostEqual(twmean, 17.5)
+        self.assertEqual(delta, -10.0)
+
+class TestLapAggregator(unittest.TestCase):
+    def test_channel_getter(self):
+        data = SyntheticSession().advance()
+        self.assertAlmostEqual(channel_getter("mSpeed", 3.6)(data), data.mSpeed * 3.6, places=4)
+        self.assertEqual(channel_getter("mTyreWear[2]")(data), data.mTyreWear[2])
+        self.assertEqual(channel_getter("participant.mCurrentLap")(data), 1)
+        self.assertEqual(channel_getter("participants[0].mCurrentLap")(data), 1)
+        with self.assertRaises(ValueError):
+            channel_getter("speed")
+        with self.assertRaises(ValueError):
+            channel_getter("mTyreWear[0:4]") # slices need expand_spec
+
+    def test_expand_spec(self):
+        self.assertEqual(expand_spec("Wear_{tyre}", "mTyreWear[0:2]"),
+                         [("Wear_FL", "mTyreWear[0]"), ("Wear_FR", "mTyreWear[1]")])
+        self.assertEqual(expand_spec("Lap_{i}", "participants[1:3].mCurrentLap"),
+                         [("Lap_1", "participants[1].mCurrentLap"), ("Lap_2", "participants[2].mCurrentLap")])
+        self.assertEqual(expand_spec("Speed", "mSpeed"), [("Speed", "mSpeed")])
+        with self.assertRaises(ValueError):
+            expand_spec("Wear", "mTyreWear[0:4]")
+
+    def test_lap_boundaries(self):
+        aggregator = LapAggregator([("Speed", "mSpeed", 1.0)])
+        summaries = []
+        for lap in (1, 2, 3):
+            for i in range(10):
+                t = (lap - 1) * 10 + i
+                summary = aggregator.add(lap, t, [float(i)], lap_clock=float(i))
+                if summary:
+                    summaries.append(summary)
+        summaries.append(aggregator.flush())
+
+        self.assertEqual([s['lap'] for s in summaries], [1, 2, 3])
+        # Only lap 2 was seen from start to finish
+        self.assertEqual([s['complete'] for s in summaries], [False, True, False])
+        self.assertEqual(summaries[1]['lap_time'], 9.0)
+        self.assertEqual(summaries[1]['samples'], 10)
+        self.assertEqual(summaries[1]['Speed_max'], 9.0)
+        self.assertEqual(summaries[1]['Speed_mean'], 4.5)
+        self.assertIsNone(aggregator.flush())
+
+    def test_recorder_writes_lap_summaries(self):
+        output_dir = tempfile.mkdtemp(prefix="test_laps_")
+        try:
+            session = SyntheticSession(lap_time=1.0)
+            recorder = DataRecorder(output_dir, lap_aggregator=LapAggregator())
+            recorder.start()
+            for _ in range(150): # 2.5 laps at 60 Hz
+                recorder.record_frame(session.advance())
+            recorder.stop()
+
+            self.assertEqual(list_recordings(output_dir), [recorder.filename])
+            with open(os.path.splitext(recorder.filename)[0] + ".laps.csv", newline='') as f:
+                laps = list(csv.DictReader(f))
+            self.assertEqual([r['lap'] for r in laps], ["1", "2", "3"])
+            self.assertEqual(laps[1]['complete'], "True")
+            self.assertEqual(int(laps[1]['samples']), 60)
+            self.assertGreater(float(laps[1]['Speed_Kmh_max']), float(laps[1]['Speed_Kmh_min']))
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+from ams2_lap_buffer import BEST, LapBuffer
+from ams2_synthetic import SyntheticSession
+
+CHANNELS = [("Speed", "mSpeed", 1.0)]
+
+class TestLapBuffer(unittest.TestCase):
+    def drive(self, buffer, lap, lap_time, invalid=False, speed=50.0):
+        # 100 m lap sampled every metre
+        for d in range(100):
+            buffer.add(lap, float(d), [speed], invalid, lap_time * d / 100)
+
+    def test_recycles_slots_and_pins_best(self):
+        buffer = LapBuffer(laps=2, channels=CHANNELS, resolution=1.0)
+        buffer.allocate(100.0)
+        self.drive(buffer, 1, 10.0, speed=1.0) # best
+        self.drive(buffer, 2, 12.0)
+        self.drive(buffer, 3, 9.0, invalid=True) # faster but invalid
+        self.drive(buffer, 4, 11.0)
+        self.drive(buffer, 5, 11.5)
+
+        self.assertEqual(buffer.laps(), [4, 3])
+        self.assertIsNone(buffer.get(1, "Speed"))
+        self.assertEqual(buffer.lap_info(BEST)['lap'], 1)
+        self.assertEqual(buffer.value_at(BEST, "Speed", 50.0), 1.0)
+        self.assertAlmostEqual(buffer.time_delta(50.0, lap=4), 0.5, places=4)
+        self.assertAlmostEqual(buffer.time_delta(50.0, lap=5, reference=4), 0.25, places=4)
+
+    def test_gap_fill_and_incomplete_lap(self):
+        buffer = LapBuffer(laps=2, channels=CHANNELS, resolution=1.0)
+        buffer.allocate(100.0)
+        buffer.add(1, 60.0, [5.0], False, 1.0) # joined mid-lap
+        buffer.add(1, 64.0, [6.0], False, 1.1)
+        buffer.add(2, 0.0, [7.0], False, 0.0)
+        self.assertFalse(buffer.lap_info(1)['complete'])
+        self.assertIsNone(buffer.lap_info(BEST))
+        speeds = buffer.get(1, "Speed")
+        self.assertEqual(speeds[62], 6.0)
+        self.assertIsNone(buffer.value_at(1, "Speed", 10.0))
+
+    def test_live_update(self):
+        session = SyntheticSession(lap_time=1.0)
+        buffer = LapBuffer(laps=3)
+        for _ in range(200):
+            buffer.update(session.advance())
+        self.assertEqual(buffer.laps(), [3, 2, 1])
+        self.assertEqual(buffer.lap_info(BEST)['lap'], 1) # session starts on the line
+        self.assertIsNotNone(buffer.time_delta(2000.0, lap=3, reference=BEST))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import shutil
+import tempfile
+from ams2_lap_buffer import BEST, LapBuffer
+from ams2_lap_compare import LapComparator, LapTrace, compare, load_laps
+from ams2_recorder import DataRecorder
+from ams2_synthetic import SyntheticSession
+
+def make_lap(slow_from=None, slow_to=None):
+    # 1000 m at 50 m/s, 40 m/s between slow_from and slow_to; a sample every metre
+    trace = LapTrace(500, resolution=2.0)
+    t = 0.0
+    distances, times, speeds = [], [], []
+    for d in range(1000):
+        speed = 40.0 if slow_from is not None and slow_from <= d < slow_to else 50.0
+        distances.append(float(d))
+        times.append(t)
+        speeds.append(speed * 3.6)
+        t += 1.0 / speed
+    trace.add_samples(distances, {"Time": times, "Speed_Kmh": speeds})
+    return trace
+
+class TestLapCompare(unittest.TestCase):
+    def test_time_loss_per_segment(self):
+        result = compare(make_lap(400, 600), make_lap())
+        self.assertAlmostEqual(result['total'], 1.0, places=2)
+        losses = [s['time_loss'] for s in result['segments']]
+        self.assertEqual(len(losses), 5)
+        self.assertAlmostEqual(losses[2], 1.0, places=2)
+        for i in (0, 1, 3, 4):
+            self.assertAlmostEqual(losses[i], 0.0, places=2)
+        self.assertAlmostEqual(sum(losses), result['total'], places=4)
+        self.assertAlmostEqual(result['segments'][2]['Speed_Kmh'], -36.0, places=3)
+        self.assertIsNone(result['segments'][2]['Brake']) # not recorded
+        self.assertAlmostEqual(result['delta'][250], 0.5, places=2) # half way through the slow part
+
+    def test_cache(self):
+        comparator = LapComparator(cache_size=2)
+        comparator.add("best", make_lap())
+        comparator.add("a", make_lap(0, 200))
+        comparator.add("b", make_lap(800, 1000))
+        first = comparator.compare("a", "best")
+        self.assertIs(comparator.compare("a", "best"), first)
+        comparator.compare("b", "best")
+        comparator.compare("a", "best")
+        comparator.compare("best", "a") # evicts the least recently used
+        self.assertNotIn(("b", "best"), comparator.cache)
+        self.assertIn(("a", "best"), comparator.cache)
+
+        comparator.add("a", make_lap(200, 400)) # new data under the same id
+        result = comparator.compare("a", "best")
+        self.assertIsNot(result, first)
+        self.assertAlmostEqual(result['segments'][1]['time_loss'], 1.0, places=2)
+
+    def test_live_and_recorded_laps(self):
+        session = SyntheticSession(lap_time=5.0, track_length=1000.0)
+        buffer = LapBuffer(laps=3)
+        output_dir = tempfile.mkdtemp(prefix="test_compare_")
+        try:
+            recorder = DataRecorder(output_dir)
+            recorder.start()
+            for _ in range(int(2.5 * 5 * session.rate_hz)):
+                data = session.advance()
+                buffer.update(data)
+                recorder.record_frame(data)
+            recorder.stop()
+
+            comparator = LapComparator()
+            comparator.add_from_buffer("live", buffer, 2)
+            comparator.add_from_buffer("best", buffer, BEST)
+            self.assertAlmostEqual(comparator.compare("live", "best")['total'], 0.0, places=2)
+
+            laps = load_laps(recorder.filename)
+            self.assertEqual(sorted(laps), [1, 2, 3])
+            self.assertAlmostEqual(laps[1].lap_time(), 5.0, delta=0.05)
+            ids = comparator.add_recording(recorder.filename)
+            result = comparator.compare(ids[1], ids[0])
+            self.assertAlmostEqual(result['total'], 0.0, places=2)
+            self.assertEqual(len(result['segments']), 5)
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import os
+import shutil
+import tempfile
+from ams2_lod import LodBuilder, LodFile, build_lod, lod_path
+from ams2_recorder import DataRecorder
+from ams2_synthetic import SyntheticSession
+
+class TestLod(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp(prefix="test_lod_")
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def build(self, samples):
+        path = os.path.join(self.output_dir, "test.lod")
+        builder = LodBuilder(path, ["A", "B"])
+        for i in range(samples):
+            builder.add(100.0 + i * 0.01, [float(i), float(-i)])
+        return builder.close()
+
+    def test_levels(self):
+        path = self.build(1000)
+        with LodFile(path) as lod:
+            self.assertEqual([level['count'] for level in lod.levels], [1000, 63, 4])
+            self.assertEqual(lod.t0, 100.0)
+
+            full = lod.query("A", pixels=5000)
+            self.assertEqual(full['factor'], 1)
+            self.assertEqual(list(full['mean'][:3]), [0.0, 1.0, 2.0])
+
+            coarse = lod.query("A", pixels=4)
+            self.assertEqual(coarse['factor'], 256)
+            self.assertEqual(list(coarse['min']), [0.0, 256.0, 512.0, 768.0])
+            self.assertEqual(coarse['max'][-1], 999.0)
+            self.assertAlmostEqual(coarse['mean'][0], 127.5)
+            # Partial last bucket: samples 768..999
+            self.assertAlmostEqual(coarse['mean'][-1], (768 + 999) / 2)
+
+            mid = lod.query("B", pixels=50)
+            self.assertEqual(mid['factor'], 16)
+            self.assertEqual(mid['min'][0], -15.0)
+
+    def test_time_range(self):
+        path = self.build(10000)
+        with LodFile(path) as lod:
+            result = lod.query("A", t_start=50.0, t_end=60.0, pixels=50)
+            self.assertEqual(result['factor'], 16)
+            self.assertLessEqual(result['time'][0], 50.0)
+            self.assertGreaterEqual(result['time'][-1], 59.0)
+            self.assertLess(len(result['time']), 100)
+            with self.assertRaises(KeyError):
+                lod.query("C")
+
+    def test_recorder_and_csv_builds_match(self):
+        session = SyntheticSession()
+        recorder = DataRecorder(self.output_dir, lod=True)
+        recorder.start()
+        for _ in range(300):
+            recorder.record_frame(session.advance())
+        recorder.stop()
+
+        live_path = lod_path(recorder.filename)
+        offline_path = build_lod(recorder.filename, output=os.path.join(self.output_dir, "offline.lod"))
+        with LodFile(live_path) as live, LodFile(offline_path) as offline:
+            self.assertEqual(live.levels[0]['count'], 300)
+            self.assertEqual(list(live.query("Speed_Kmh", pixels=20)['max']),
+                             list(offline.query("Speed_Kmh", pixels=20)['max']))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from ams2_metrics import LatencyHistogram, LoopMetrics
+
+class MockFrame:
+    def __init__(self, seq):
+        self.mSequenceNumber = seq
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_percentiles_within_bucket_error(self):
+        hist = LatencyHistogram()
+        for ns in range(1, 10001):
+            hist.record(ns * 1000) # 1 us .. 10 ms
+        self.assertEqual(hist.count, 10000)
+        self.assertEqual(hist.max, 10000 * 1000)
+        for p, expected in ((50, 5000e3), (95, 9500e3), (99, 9900e3)):
+            value = hist.percentile(p)
+            self.assertGreaterEqual(value, expected)
+            self.assertLessEqual(value, expected * 1.125)
+
+    def test_bucket_bounds_are_monotonic(self):
+        previous = -1
+        for ns in list(range(0, 100)) + [10**k for k in range(3, 12)]:
+            index = LatencyHistogram.bucket_index(ns)
+            self.assertGreaterEqual(LatencyHistogram.bucket_upper_bound(index), ns)
+            self.assertGreaterEqual(index, previous)
+            previous = index
+
+class TestLoopMetrics(unittest.TestCase):
+    def test_sequence_counters(self):
+        metrics = LoopMetrics()
+        for seq in (10, 12, 12, 18, 19, 4):
+            metrics.observe_frame(MockFrame(seq))
+        c = metrics.counters
+        self.assertEqual(c['frames_read'], 6)
+        self.assertEqual(c['frames_duplicate'], 1)
+        self.assertEqual(c['frames_skipped'], 2) # 14 and 16 were never seen
+        self.assertEqual(c['frames_torn'], 1)
+        self.assertEqual(metrics.last_sequence, 4) # counter restart
+
+    def test_stage_summary(self):
+        metrics = LoopMetrics()
+        metrics.record("read", 2000)
+        metrics.record("read", 4000)
+        summary = metrics.summary()
+        self.assertEqual(summary['stages']['read']['count'], 2)
+        self.assertAlmostEqual(summary['stages']['read']['max_us'], 4.0)
+        self.assertTrue(any(line.startswith("read") for line in metrics.format_lines()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+from ams2_poller import AdaptivePoller
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+class MockData:
+    def __init__(self, seq, game_state=2):
+        self.mSequenceNumber = seq
+        self.mGameState = game_state
+
+class TestAdaptivePoller(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.poller = AdaptivePoller(clock=self.clock, sleep=self.clock.sleep, cpu_budget=0.0)
+
+    def feed(self, frames, interval, game_state=2, start_seq=2):
+        seq = start_seq
+        for _ in range(frames):
+            self.poller.observe(MockData(seq, game_state))
+            self.clock.now += interval
+            seq += 2
+        return seq
+
+    def test_estimates_publish_rate(self):
+        self.feed(200, 1.0 / 60.0)
+        self.assertAlmostEqual(self.poller.publish_rate(), 60.0, delta=1.0)
+
+    def test_schedules_read_after_expected_update(self):
+        seq = self.feed(200, 1.0 / 60.0)
+        self.poller.observe(MockData(seq))
+        target = self.poller.next_read_time()
+        self.assertGreater(target, self.clock.now + 1.0 / 60.0 - 0.001)
+        self.assertLess(target, self.clock.now + 1.0 / 60.0 + 0.002)
+
+    def test_duplicates_and_torn_reads_are_not_new(self):
+        self.assertTrue(self.poller.observe(MockData(2)))
+        self.assertFalse(self.poller.observe(MockData(2)))
+        self.assertFalse(self.poller.observe(MockData(3)))
+        self.assertTrue(self.poller.observe(MockData(4)))
+
+    def test_backs_off_when_paused(self):
+        self.feed(50, 1.0 / 60.0)
+        self.feed(5, 0.1, game_state=3, start_seq=1000)
+        self.assertGreater(self.poller.backoff, self.poller.max_interval)
+        self.assertLessEqual(self.poller.backoff, self.poller.idle_interval)
+        # Back to driving resets the back-off
+        self.poller.observe(MockData(2000, 2))
+        self.assertEqual(self.poller.backoff, 0.0)
+
+    def test_backs_off_when_sequence_stalls(self):
+        self.feed(50, 1.0 / 60.0)
+        for _ in range(5):
+            self.clock.now += 0.3
+            self.poller.observe(MockData(500))
+        self.assertGreater(self.poller.backoff, 0.0)
+
+    def test_wait_sleeps_until_target(self):
+        seq = self.feed(50, 1.0 / 60.0)
+        self.poller.observe(MockData(seq))
+        target = self.poller.next_read_time()
+        self.poller.wait()
+        self.assertGreaterEqual(self.clock.now, target)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,66 +1,127 @@
 import time
 import os
-import msvcrt
 from ams2_reader import AMS2Reader
 from ams2_recorder import DataRecorder
+from ams2_catalog import SessionCatalog
+from ams2_lap_aggregator import LapAggregator
+from ams2_events import DrivingEventDetector
+from ams2_histograms import LapHistograms
+from ams2_metrics import LoopMetrics
+from ams2_poller import AdaptivePoller
+
+try:
+    import msvcrt # Windows only; without it the keyboard shortcuts are disabled
+except ImportError:
+    msvcrt = None
 
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
 
 def main():
     reader = AMS2Reader()
-    recorder = DataRecorder()
+    # Split files at 256 MB and keep at most 10 GB of recordings on disk
+    recorder = DataRecorder(max_file_bytes=256 * 1024**2, max_total_bytes=10 * 1024**3,
+                            lap_aggregator=LapAggregator(), histograms=LapHistograms())
+    # Every closed recording is added to the session catalog
+    catalog = SessionCatalog()
+    recorder.file_closed_callbacks.append(catalog.add_recording)
+    event_detector = DrivingEventDetector()
+    metrics = LoopMetrics()
+    poller = AdaptivePoller()
+    show_debug = False
+    last_render = 0.0
     print("Connecting to AMS2 Shared Memory...")
     
     if reader.connect():
-        print("Connected! Press 'r' to toggle recording, Ctrl+C to stop.", flush=True)
+        print("Connected! Press 'r' to toggle recording, 'h' for high-rate capture, 'd' for debug screen, 'm' to dump metrics, Ctrl+C to stop.", flush=True)
         try:
             while True:
                 # Check for key press
-                if msvcrt.kbhit():
+                if msvcrt and msvcrt.kbhit():
                     key = msvcrt.getch()
                     if key.lower() == b'r':
                         if recorder.recording:
                             recorder.stop()
                         else:
                             recorder.start()
+                    elif key.lower() == b'h':
+                        # Switch capture mode for the next recording; a running
+                        # recording keeps the mode of its header
+                        if recorder.recording:
+                            print("Stop the recording ('r') before switching high-rate capture")
+                        else:
+                            recorder.high_rate = not recorder.high_rate
+                            print(f"High-rate capture: {'ON' if recorder.high_rate else 'OFF'}")
+                    elif key.lower() == b'd':
+                        show_debug = not show_debug
+                    elif key.lower() == b'm':
+                        dumped = metrics.dump()
+                        if dumped:
+                            print(f"Metrics written to {dumped}")
 
-                data = reader.read()
+                poller.wait()
+                frame_start = time.perf_counter_ns()
+                if recorder.high_rate:
+                    data = reader.read_consistent()
+                else:
+                    data = reader.read()
+                mark = metrics.lap("read", frame_start)
+                is_new = poller.observe(data)
                 if data:
-                    recorder.record_frame(data)
-                    
-                    # clear_screen()
-                    print("=== AMS2 Telemetry Debug ===")
-                    print(f"Version: {data.mVersion} | Build: {data.mBuildVersionNumber}")
-                    print(f"Session State: {data.mSessionState} | Game State: {data.mGameState}")
-                    print(f"Recording: {'[ON]' if recorder.recording else '[OFF]'}")
+                    metrics.observe_frame(data)
+                    if is_new:
+                        recorder.record_frame(data)
+                        for event in event_detector.update(data):
+                            recorder.record_event(event)
+                        mark = metrics.lap("record", mark)
+                    metrics.set_gauge("recorder_backlog", recorder.backlog)
+
+                    # Print at most 10 times per second, record every frame
+                    now = time.perf_counter()
+                    if now - last_render < 0.1:
+                        metrics.record("frame", mark - frame_start)
+                        continue
+                    last_render = now
+                    metrics.set_gauge("publish_rate_hz", round(poller.publish_rate(), 1))
+
+                    if show_debug:
+                        print("=== AMS2 Loop Metrics ===")
+                        for line in metrics.format_lines():
+                            print(line)
+                        print("", flush=True)
+                    else:
+                        # clear_screen()
+                        print("=== AMS2 Telemetry Debug ===")
+                        print(f"Version: {data.mVersion} | Build: {data.mBuildVersionNumber}")
+                        print(f"Session State: {data.mSessionState} | Game State: {data.mGameState}")
+                        print(f"Recording: {'[ON]' if recorder.recording else '[OFF]'}{' (high-rate)' if recorder.high_rate else ''}")
                     
-                    print("\n--- Session Info ---")
-                    print(f"Car: {data.mCarName.decode('utf-8', errors='ignore')}")
-                    print(f"Class: {data.mCarClassName.decode('utf-8', errors='ignore')}")
-                    print(f"Track: {data.mTrackLocation.decode('utf-8', errors='ignore')} ({data.mTrackVariation.decode('utf-8', errors='ignore')})")
+                        print("\n--- Session Info ---")
+                        print(f"Car: {data.mCarName.decode('utf-8', errors='ignore')}")
+                        print(f"Class: {data.mCarClassName.decode('utf-8', errors='ignore')}")
+                        print(f"Track: {data.mTrackLocation.decode('utf-8', errors='ignore')} ({data.mTrackVariation.decode('utf-8', errors='ignore')})")
                     
-                    print("\n--- Weather ---")
-                    print(f"Ambient Temp: {data.mAmbientTemperature:.1f}°C")
-                    print(f"Track Temp:   {data.mTrackTemperature:.1f}°C")
-                    print(f"Rain Density: {data.mRainDensity:.2f}")
-                    print(f"Wind Speed:   {data.mWindSpeed:.1f} m/s")
+                        print("\n--- Weather ---")
+                        print(f"Ambient Temp: {data.mAmbientTemperature:.1f}°C")
+                        print(f"Track Temp:   {data.mTrackTemperature:.1f}°C")
+                        print(f"Rain Density: {data.mRainDensity:.2f}")
+                        print(f"Wind Speed:   {data.mWindSpeed:.1f} m/s")
                     
-                    print("\n--- Physics ---")
-                    print(f"Speed:    {data.mSpeed*3.6:.1f} km/h")
-                    print(f"RPM:      {data.mRpm:.0f}")
-                    print(f"Gear:     {data.mGear}")
-                    print(f"Throttle: {data.mThrottle:.2f}")
-                    print(f"Brake:    {data.mBrake:.2f}")
-                    print(f"Steering: {data.mSteering:.2f}")
+                        print("\n--- Physics ---")
+                        print(f"Speed:    {data.mSpeed*3.6:.1f} km/h")
+                        print(f"RPM:      {data.mRpm:.0f}")
+                        print(f"Gear:     {data.mGear}")
+                        print(f"Throttle: {data.mThrottle:.2f}")
+                        print(f"Brake:    {data.mBrake:.2f}")
+                        print(f"Steering: {data.mSteering:.2f}")
                     
-                    print("\n--- Tyres (FL, FR, RL, RR) ---")
-                    temps = [t for t in data.mTyreTemp]
-                    print(f"Temps: {temps[0]:.0f}°C, {temps[1]:.0f}°C, {temps[2]:.0f}°C, {temps[3]:.0f}°C", flush=True)
+                        print("\n--- Tyres (FL, FR, RL, RR) ---")
+                        temps = [t for t in data.mTyreTemp]
+                        print(f"Temps: {temps[0]:.0f}°C, {temps[1]:.0f}°C, {temps[2]:.0f}°C, {temps[3]:.0f}°C", flush=True)
+                    mark = metrics.lap("render", mark)
+                    metrics.record("frame", mark - frame_start)
                 else:
                     print("Waiting for data...", end="\r", flush=True)
-                    
-                time.sleep(0.1)
         except KeyboardInterrupt:
             print("\nStopped.")
         finally:
@@ -0,0 +1,157 @@
+import unittest
+import csv
+import glob
+import os
+import time
+import shutil
+import tempfile
+from ams2_recorder import DataRecorder, load_metadata
+from ams2_channels import Channel
+from ams2_schema import compile_schema
+from ams2_synthetic import SyntheticSession
+
+class TestDataRecorder(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp(prefix="test_recorder_")
+        self.session = SyntheticSession()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def read_rows(self, filename):
+        with open(filename, newline='') as f:
+            return list(csv.DictReader(f))
+
+    def test_high_rate_frames(self):
+        recorder = DataRecorder(self.output_dir, high_rate=True)
+        recorder.start()
+        for _ in range(3):
+            data = self.session.advance()
+            recorder.record_frame(data)
+            recorder.record_frame(data) # duplicate read of the same frame
+        data.mSequenceNumber += 1 # game is writing
+        recorder.record_frame(data)
+        recorder.stop()
+
+        rows = self.read_rows(recorder.filename)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual([r['FrameIdentifier'] for r in rows], ["2", "4", "6"])
+        stamps = [int(r['TimestampNs']) for r in rows]
+        self.assertEqual(stamps, sorted(stamps))
+        x = self.session.data.mParticipantInfo[0].mWorldPosition[0]
+        self.assertAlmostEqual(float(rows[-1]['PosX']), x, places=1)
+
+    def test_mode_switch_waits_for_next_recording(self):
+        recorder = DataRecorder(self.output_dir)
+        recorder.start()
+        recorder.record_frame(self.session.advance())
+        recorder.high_rate = True # the header says Timestamp until the next start()
+        for _ in range(3):
+            recorder.record_frame(self.session.advance())
+        recorder.stop()
+        rows = self.read_rows(recorder.filename)
+        self.assertEqual(len(rows), 4)
+        for row in rows:
+            self.assertLess(abs(float(row['Timestamp']) - time.time()), 60)
+        self.assertFalse(load_metadata(recorder.filename)['high_rate'])
+
+    def test_default_mode_keeps_every_call(self):
+        recorder = DataRecorder(self.output_dir)
+        recorder.start()
+        data = self.session.advance()
+        recorder.record_frame(data)
+        recorder.record_frame(data)
+        recorder.stop()
+
+        rows = self.read_rows(recorder.filename)
+        self.assertEqual(len(rows), 2)
+        self.assertIn('Timestamp', rows[0])
+        self.assertEqual(rows[0]['FrameIdentifier'], "2")
+
+    def csv_files(self):
+        return sorted(glob.glob(os.path.join(self.output_dir, "telemetry_*.csv")))
+
+    def test_rotation_on_session_change(self):
+        recorder = DataRecorder(self.output_dir)
+        recorder.start()
+        for _ in range(5):
+            recorder.record_frame(self.session.advance())
+        self.session.data.mSessionState = 3 # Practice -> Qualify
+        for _ in range(7):
+            recorder.record_frame(self.session.advance())
+        recorder.stop()
+
+        files = self.csv_files()
+        self.assertEqual(len(files), 2)
+        self.assertEqual([len(self.read_rows(f)) for f in files], [5, 7])
+        meta = load_metadata(files[1])
+        self.assertEqual(meta['session_state'], 3)
+        self.assertEqual(meta['opened_by'], "session")
+        self.assertEqual(meta['frames'], 7)
+
+    def test_rotation_by_size(self):
+        recorder = DataRecorder(self.output_dir, max_file_bytes=1000)
+        recorder.start()
+        for _ in range(600):
+            recorder.record_frame(self.session.advance())
+        recorder.stop()
+
+        files = self.csv_files()
+        self.assertEqual(len(files), 3)
+        self.assertEqual(sum(len(self.read_rows(f)) for f in files), 600)
+        self.assertEqual(load_metadata(files[1])['car'], "Formula Vee")
+
+    def test_retention(self):
+        old = time.time() - 10 * 86400
+        for i in range(3):
+            for ext in (".csv", ".json"):
+                path = os.path.join(self.output_dir, f"telemetry_2020010{i}_120000{ext}")
+                with open(path, 'w') as f:
+                    f.write("x" * 1000)
+                os.utime(path, (old + i, old + i))
+
+        recorder = DataRecorder(self.output_dir, max_age_days=30, max_total_bytes=4500)
+        deleted = recorder.enforce_retention()
+        self.assertEqual(deleted, ["telemetry_20200100_120000"])
+        self.assertEqual(len(os.listdir(self.output_dir)), 4)
+
+        recorder.max_age_days = 5
+        recorder.enforce_retention()
+        self.assertEqual(os.listdir(self.output_dir), [])
+
+    def test_custom_schema(self):
+        schema = [
+            Channel("Speed_Kmh", "mSpeed", 3.6, ".1f", "km/h"),
+            Channel("TyreTemp_{tyre}", "mTyreTemp[0:4]", fmt=".1f", unit="C"),
+            ("Lap", "participant.mCurrentLap", 1.0), # plain channel tuples work too
+            Channel("Lap_{i}", "participants[0:2].mCurrentLap"),
+            Channel("Fuel_L", lambda data: data.mFuelLevel * data.mFuelCapacity, fmt=".2f"),
+        ]
+        recorder = DataRecorder(self.output_dir, schema=schema)
+        recorder.start()
+        for _ in range(5):
+            data = self.session.advance()
+            recorder.record_frame(data)
+        recorder.stop()
+
+        rows = self.read_rows(recorder.filename)
+        self.assertEqual(list(rows[0]), ["Timestamp", "Speed_Kmh", "TyreTemp_FL", "TyreTemp_FR",
+                                         "TyreTemp_RL", "TyreTemp_RR", "Lap", "Lap_0", "Lap_1", "Fuel_L"])
+        self.assertAlmostEqual(float(rows[-1]['Speed_Kmh']), data.mSpeed * 3.6, places=1)
+        self.assertEqual(rows[-1]['Lap'], str(data.mParticipantInfo[0].mCurrentLap))
+        self.assertAlmostEqual(float(rows[-1]['Fuel_L']), data.mFuelLevel * data.mFuelCapacity, places=2)
+        metadata = load_metadata(recorder.filename)
+        self.assertEqual(metadata['units']['TyreTemp_RR'], "C")
+        self.assertEqual(metadata['frames'], 5)
+        self.assertNotIn('laps', metadata) # no summary columns in this schema
+
+    def test_schema_errors(self):
+        with self.assertRaises(ValueError):
+            compile_schema([Channel("X", "mSpeed[")])
+        with self.assertRaises(ValueError):
+            compile_schema([Channel("X_{i}", "participants[0:2].mWorldPosition[0:3]")])
+        with self.assertRaises(ValueError): # slice without a placeholder: duplicate columns
+            compile_schema([Channel("TyreTemp", "mTyreTemp[0:4]")])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import os
+from ams2_sector_tracker import SectorTracker
+from ams2_synthetic import SyntheticSession
+
+class TestSectorTracker(unittest.TestCase):
+    def setUp(self):
+        self.best_file = "test_best_sectors.csv"
+        self.log_file = "test_sector_times.csv"
+        self.tearDown()
+        self.tracker = SectorTracker(self.best_file, self.log_file)
+
+    def tearDown(self):
+        if hasattr(self, 'tracker'):
+            self.tracker.close()
+        for filename in (self.best_file, self.log_file):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def test_best_and_theoretical(self):
+        for times in ((30.0, 31.0, 32.0), (29.5, 31.5, 31.8)):
+            for i, t in enumerate(times):
+                self.tracker.record_sector("CarA", "TrackA", i, t)
+        delta, is_best = self.tracker.record_sector("CarA", "TrackA", 1, 30.9, valid=False)
+        self.assertFalse(is_best) # invalid laps never count
+        self.assertAlmostEqual(delta, -0.1)
+
+        self.assertEqual(self.tracker.get_best_sectors("CarA", "TrackA"), [29.5, 31.0, 31.8])
+        self.assertAlmostEqual(self.tracker.get_theoretical_best("CarA", "TrackA"), 92.3)
+
+        # Reload from disk; the log holds every sector once it is closed
+        self.tracker.close()
+        reloaded = SectorTracker(self.best_file, self.log_file)
+        self.assertEqual(reloaded.get_best_sectors("CarA", "TrackA"), [29.5, 31.0, 31.8])
+        with open(self.log_file) as f:
+            self.assertEqual(len(f.readlines()), 1 + 7)
+
+    def test_live_sectors(self):
+        session = SyntheticSession(lap_time=3.0)
+        completed = []
+        for _ in range(int(2.5 * 180)):
+            completed += self.tracker.update(session.advance())
+        # Lap 1 from the start, lap 2, and the first sector of lap 3
+        self.assertEqual([c[0] for c in completed], [0, 1, 2, 0, 1, 2, 0])
+        for sector, sector_time, _, _ in completed:
+            self.assertAlmostEqual(sector_time, 1.0, delta=0.05)
+        theoretical = self.tracker.get_theoretical_best("Formula Vee", "Interlagos")
+        self.assertAlmostEqual(theoretical, 3.0, delta=0.1)
+        current = self.tracker.current_lap()
+        self.assertIsNotNone(current[0])
+        self.assertIsNone(current[1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import math
+import os
+import shutil
+import tempfile
+from ams2_track_map import TrackMap, TrackMapper, track_map_path
+from ams2_synthetic import SyntheticSession
+
+def stadium(resolution=5.0, straight=400.0, radius=50.0):
+    # Two straights joined by two hairpins, driven anti-clockwise
+    bend = math.pi * radius
+    length = 2 * straight + 2 * bend
+    xs, ys, zs = [], [], []
+    d = 0.0
+    while d < length:
+        if d < straight:
+            x, z = d, -radius
+        elif d < straight + bend:
+            a = (d - straight) / radius - math.pi / 2
+            x, z = straight + radius * math.cos(a), radius * math.sin(a)
+        elif d < 2 * straight + bend:
+            x, z = straight - (d - straight - bend), radius
+        else:
+            a = (d - 2 * straight - bend) / radius + math.pi / 2
+            x, z = radius * math.cos(a), radius * math.sin(a)
+        xs.append(x)
+        ys.append(0.0)
+        zs.append(z)
+        d += resolution
+    return length, xs, ys, zs
+
+class TestTrackMap(unittest.TestCase):
+    def test_corners_and_locate(self):
+        length, xs, ys, zs = stadium()
+        track_map = TrackMap(length, 5.0, xs, ys, zs)
+        self.assertEqual(len(track_map.corners), 2)
+        self.assertEqual([s['corner'] for s in track_map.segments], [None, 1, None, 2, None])
+        apex = track_map.corners[0]['apex']
+        self.assertAlmostEqual(apex, 400 + math.pi * 50 / 2, delta=25)
+
+        distance, corner, segment = track_map.locate(200.0, 0.0, -48.0)
+        self.assertAlmostEqual(distance, 200.0, delta=1.0)
+        self.assertIsNone(corner)
+        self.assertEqual(segment, 0)
+        # Apex of the first hairpin
+        distance, corner, _ = track_map.locate(450.0, 0.0, 0.0)
+        self.assertEqual(corner, 1)
+        # Far away: pit building, other track
+        self.assertIsNone(track_map.locate(200.0, 0.0, 500.0))
+
+    def test_save_and_load(self):
+        directory = tempfile.mkdtemp(prefix="test_track_map_")
+        try:
+            length, xs, ys, zs = stadium()
+            path = track_map_path("Test Track", "GP / Short", directory)
+            TrackMap(length, 5.0, xs, ys, zs, laps=3).save(path)
+            loaded = TrackMap.load(path)
+            self.assertEqual(loaded.laps, 3)
+            self.assertEqual(len(loaded.corners), 2)
+            self.assertEqual(os.path.basename(path), "Test_Track_GP_Short.json")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def test_mapper_builds_from_live_laps(self):
+        directory = tempfile.mkdtemp(prefix="test_track_map_")
+        try:
+            session = SyntheticSession(lap_time=10.0, track_length=2000.0)
+            mapper = TrackMapper(directory, min_laps=2)
+            result = None
+            for _ in range(int(3.5 * 600)):
+                data = session.advance()
+                result = mapper.update(data)
+            self.assertIsNotNone(mapper.track_map)
+            self.assertTrue(os.path.exists(track_map_path("Interlagos", "GP", directory)))
+            distance, corner, _ = result
+            self.assertAlmostEqual(distance, data.mParticipantInfo[0].mCurrentLapDistance, delta=2.0)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,13 @@
 import unittest
-from ams2_tyre_analyzer import TyreAnalyzer
+import itertools
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+from ams2_recorder import DataRecorder
+from ams2_tyre_analyzer import TyreAnalyzer, FULL_RATE_CHANNELS
+from ams2_synthetic import SyntheticSession
 import time
 
 class MockData:
@@ -196,5 +204,170 @@ class TestTyreAnalyzer(unittest.TestCase):
         # Should be checking now
         self.assertEqual(self.analyzer.current_state, self.analyzer.STATE_CHECKING)
 
+class TestFullRateTyreAnalyzer(unittest.TestCase):
+    def setUp(self):
+        self.analyzer = TyreAnalyzer(full_rate=True)
+        self.session = SyntheticSession()
+
+    def feed(self, seconds, start=0.0):
+        # Every frame at 60 Hz with explicit timestamps
+        for i in range(int(seconds * 60)):
+            self.analyzer.update(self.session.advance(), 5, t=start + i / 60)
+
+    def test_adjacent_channels_are_one_block(self):
+        # tread..air are adjacent in the struct, as are left/center/right
+        self.assertEqual(len(self.analyzer.window.blocks), 4)
+        self.assertEqual(self.analyzer.window.width, len(FULL_RATE_CHANNELS) * 4)
+
+    def test_layer_stats_and_analysis(self):
+        self.feed(40.0)
+        self.assertAlmostEqual(self.analyzer.window.span(), 30.0, delta=0.1)
+        stats = self.analyzer.layer_stats()
+        mean, low, high, stdev = stats['carcass'][0]
+        self.assertAlmostEqual(mean, stats['temp'][0][0] - 5.0, places=2) # Kelvin -> Celsius
+        self.assertLessEqual(low, mean)
+        self.assertGreaterEqual(high, mean)
+        self.assertGreater(stdev, 0.0)
+        self.assertAlmostEqual(stats['pressure'][0][0], 26.0, delta=0.2)
+
+        self.assertEqual(self.analyzer.current_state, self.analyzer.STATE_STABLE)
+        analysis = self.analyzer.get_analysis()
+        self.assertEqual(analysis['FL']['status'], "OK") # carcass within 80-86
+        self.assertIn('tread', analysis['FL']['layers'])
+
+        self.analyzer.carcass_target_max = 78.0
+        self.analyzer.target_pressure = (27.0, 28.0)
+        analysis = self.analyzer.get_analysis()
+        self.assertEqual(analysis['FL']['status'], "Zu HEISS")
+        self.assertTrue(analysis['FL']['action'].startswith("Druck ERHÖHEN (+"))
+
+    def test_pit_resets_window(self):
+        self.feed(5.0)
+        data = self.session.advance()
+        data.mPitMode = 2
+        self.analyzer.update(data, 5, t=6.0)
+        self.assertIsNone(self.analyzer.layer_stats())
+        self.assertEqual(self.analyzer.current_state, self.analyzer.STATE_GATHERING)
+
+class TestWarmStart(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="test_warm_start_")
+        self.state_file = os.path.join(self.directory, "tyre_state.json")
+        self.session = SyntheticSession()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def feed(self, analyzer, seconds, start=0.0):
+        # 60 Hz, one lap every 10 seconds
+        for i in range(int(seconds * 60)):
+            data = self.session.advance()
+            analyzer.update_context(data)
+            analyzer.update(data, 5 + int(i / 600), t=start + i / 60)
+
+    def test_restart_skips_gathering(self):
+        analyzer = TyreAnalyzer(full_rate=True, state_file=self.state_file)
+        self.feed(analyzer, 40.0)
+        self.assertEqual(analyzer.current_state, analyzer.STATE_STABLE)
+        analyzer.save_state()
+
+        # A new process with the same car/track/compound continues where it stopped
+        restarted = TyreAnalyzer(full_rate=True, state_file=self.state_file)
+        self.feed(restarted, 1.0, start=100.0)
+        self.assertEqual(restarted.current_state, restarted.STATE_STABLE)
+        self.assertAlmostEqual(restarted.window.span(), 30.0, delta=1.1)
+        saved = analyzer.layer_stats()['carcass'][0][0]
+        self.assertAlmostEqual(restarted.layer_stats()['carcass'][0][0], saved, delta=0.5)
+        self.assertEqual(restarted.get_analysis()['FL']['status'], "OK")
+
+        # Other compound: nothing learned yet
+        restarted.set_context(self.session.car, self.session.track, "Wet")
+        self.assertEqual(restarted.current_state, restarted.STATE_GATHERING)
+        self.assertIsNone(restarted.seed)
+
+    def test_pit_stop_saves_state(self):
+        analyzer = TyreAnalyzer(state_file=self.state_file)
+        self.feed(analyzer, 30.0)
+        data = self.session.advance()
+        data.mPitMode = 2
+        analyzer.update(data, 8, t=31.0)
+        self.assertTrue(os.path.exists(self.state_file))
+        # Warm-started again from what was saved at pit entry
+        self.assertEqual(analyzer.current_state, analyzer.STATE_CHECKING)
+        self.assertIsNotNone(analyzer.seed)
+        data = self.session.advance()
+        data.mPitMode = 0
+        analyzer.update(data, 8, t=40.0)
+        self.assertGreater(len(analyzer.history[0]), 15)
+
+    def test_seed_from_recording(self):
+        # Recorded at 60 Hz on a fake clock
+        clock = itertools.count(time.time() - 60, 1 / 60)
+        with mock.patch('ams2_recorder.time.time', lambda: next(clock)):
+            recorder = DataRecorder(self.directory)
+            recorder.start()
+            for _ in range(1200):
+                recorder.record_frame(self.session.advance())
+            recorder.stop()
+
+        analyzer = TyreAnalyzer(recording_dir=self.directory)
+        data = self.session.advance()
+        analyzer.update_context(data)
+        self.assertIsNotNone(analyzer.seed)
+        analyzer.update(data, 0, t=10.0)
+        self.assertGreater(len(analyzer.history[0]), 5)
+        self.assertIsNone(analyzer.history[0][0]['l'])
+        self.assertAlmostEqual(analyzer.history[0][-2]['avg'], data.mTyreTemp[0], delta=1.0)
+        # Left/centre/right come from the live samples only
+        analyzer.current_state = analyzer.STATE_STABLE
+        analysis = analyzer.get_analysis()
+        self.assertAlmostEqual(analysis['FL']['temp_outer'], data.mTyreTempLeft[0], places=3)
+
+    def test_pit_lane_resets_once(self):
+        analyzer = TyreAnalyzer(full_rate=True, recording_dir=self.directory)
+        self.feed(analyzer, 5.0)
+        with mock.patch.object(analyzer, 'reset', wraps=analyzer.reset) as reset:
+            for i in range(120):
+                data = self.session.advance()
+                data.mPitMode = 2
+                analyzer.update(data, 5, t=10.0 + i / 60)
+            data.mPitMode = 0
+        self.assertEqual(reset.call_count, 1)
+
+    def test_recording_tail(self):
+        filename = os.path.join(self.directory, "telemetry_small.csv")
+        with open(filename, 'w', newline='') as f:
+            f.write("Timestamp,TyreTemp_FL,TyreTemp_FR,TyreTemp_RL,TyreTemp_RR\r\n")
+            f.write("1.0,80,81,82,83\r\n2.0,84,85,86,87\r\n")
+        analyzer = TyreAnalyzer()
+        rows = analyzer._read_recording_tail(filename)
+        self.assertEqual([row[0] for row in rows], [80.0, 84.0]) # first row kept
+
+        with open(filename, 'w', newline='') as f:
+            f.write("Timestamp,Speed_Kmh\r\n1.0,100\r\n")
+        self.assertEqual(analyzer._read_recording_tail(filename), [])
+
+    def test_full_rate_ignores_recordings(self):
+        # Recordings have no layer temperatures: no seed, and no laps credited
+        filename = os.path.join(self.directory, "telemetry_20260101_000000.csv")
+        with open(filename, 'w', newline='') as f:
+            f.write("Timestamp,TyreTemp_FL,TyreTemp_FR,TyreTemp_RL,TyreTemp_RR\r\n1.0,80,81,82,83\r\n")
+        with open(os.path.join(self.directory, "telemetry_20260101_000000.json"), 'w') as f:
+            json.dump({'car': self.session.car, 'track': self.session.track, 'laps': 12}, f)
+        analyzer = TyreAnalyzer(full_rate=True, recording_dir=self.directory)
+        with mock.patch.object(analyzer, '_read_recording_tail') as read_tail:
+            analyzer.update_context(self.session.advance())
+        read_tail.assert_not_called()
+        self.assertIsNone(analyzer.seed)
+        self.assertEqual(analyzer.warm_laps, 0)
+        self.assertEqual(analyzer.current_state, analyzer.STATE_GATHERING)
+
+        # The same recording seeds a 1 Hz analyzer
+        analyzer = TyreAnalyzer(recording_dir=self.directory)
+        analyzer.update_context(self.session.advance())
+        self.assertEqual(analyzer.seed, [[80.0, None, None, None, 81.0, None, None, None,
+                                          82.0, None, None, None, 83.0, None, None, None]])
+        self.assertEqual(analyzer.current_state, analyzer.STATE_CHECKING)
+
 if __name__ == '__main__':
     unittest.main()